@@ -2,5 +2,6 @@
 
 from .book_analyzer import BookAnalyzer
 from .models import BookDNAResponse, BookDNA, DNAPillar
+from .prefetch import DNAPrefetcher
 
-__all__ = ["BookAnalyzer", "BookDNAResponse", "BookDNA", "DNAPillar"]
\ No newline at end of file
+__all__ = ["BookAnalyzer", "BookDNAResponse", "BookDNA", "DNAPillar", "DNAPrefetcher"]
\ No newline at end of file
@@ -1,10 +1,23 @@
 import logging
+from contextlib import aclosing
 from pathlib import Path
+from typing import Any, AsyncIterator
+from pydantic import TypeAdapter, ValidationError
 from strands import Agent
 from strands.types.exceptions import StructuredOutputException
-from .models import BookDNAResponse
+from .models import PILLAR_NAMES, BookDNAResponse, merge_partial_dna, partial_dna_model
 from .exa_tool import search_book_analysis, search_book_analysis_parallel
-from ..shared.ai.gemini_client import create_gemini_model
+from ..shared.ai.gemini_client import FAST_MODEL_ID, create_gemini_model
+from ..shared.ai.agent_pool import AgentPool
+from ..shared.ai.invocation import invoke_agent, stream_agent
+from ..shared.ai.partial_json import PartialObjectParser
+from ..shared.cache.ttl_cache import TTLCache
+from ..shared.config.settings import get_float_setting, get_int_setting
+from ..shared.resilience.circuit_breaker import provider_available
+from ..shared.resilience.deadline import Deadline
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.exceptions import DeadlineExceededError, ProviderUnavailableError
+from ..shared.works import works
 
 logger = logging.getLogger("librarian")
 
@@ -21,54 +34,186 @@ class BookAnalyzer:
         """Load the task prompt template from external file."""
         prompt_path = Path(__file__).parent / "prompts" / "book_analyzer_task.md"
         return prompt_path.read_text(encoding='utf-8').strip()
+
+    def _load_offline_task_prompt(self) -> str:
+        """Load the knowledge-only task prompt used while Exa is unavailable."""
+        prompt_path = Path(__file__).parent / "prompts" / "book_analyzer_offline_task.md"
+        return prompt_path.read_text(encoding='utf-8').strip()
+
+    def _load_partial_scope_prompt(self) -> str:
+        """Load the instructions appended for pillar-scoped analyses."""
+        prompt_path = Path(__file__).parent / "prompts" / "book_analyzer_partial_scope.md"
+        return prompt_path.read_text(encoding='utf-8').strip()
     
     def __init__(self):
         self.system_prompt = self._load_system_prompt()
         self.task_prompt_template = self._load_task_prompt()
+        self.offline_task_prompt_template = self._load_offline_task_prompt()
+        self.partial_scope_template = self._load_partial_scope_prompt()
         
         self.model = create_gemini_model(
             model_id="gemini-2.5-flash",
             temperature=0.3,
             max_output_tokens=4096  # Increased from 2048 to handle nested structure
         )
-        self.agent = Agent(
+        self.agent = self._create_agent()
+        self.agents = AgentPool(self._create_agent, seed=self.agent)
+        # Tool-less agents for analysis from the LLM's own knowledge
+        self.offline_agents = AgentPool(self._create_offline_agent)
+        # Smaller model without search, for requests short on time
+        self.fast_model = create_gemini_model(
+            model_id=FAST_MODEL_ID,
+            temperature=0.3,
+            max_output_tokens=4096
+        )
+        self.fast_agents = AgentPool(self._create_fast_agent)
+
+        # Searched analyses per work (shared by its editions), reused by later requests and the ranker's funnel
+        self.dna_cache: TTLCache[BookDNAResponse] = TTLCache(
+            "book DNA",
+            ttl_seconds=get_float_setting("LIBRARIAN_DNA_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_DNA_CACHE_MAX_ENTRIES", 5000),
+        )
+
+    @staticmethod
+    def _dna_key(title: str, author: str, book_id: str | None = None) -> str:
+        return works.key(title, author, book_id)
+
+    def cached_dna(
+        self,
+        title: str,
+        author: str,
+        pillars: list[str] | None = None,
+        book_id: str | None = None
+    ) -> BookDNAResponse | None:
+        """DNA from an earlier analysis of this book, or another edition of it, without calling the LLM.
+
+        With ``pillars``, a pillar-scoped analysis covering them is enough;
+        otherwise only a full analysis is returned.
+        """
+        dna = self.dna_cache.get(self._dna_key(title, author, book_id))
+        return dna if dna is not None and dna.covers(pillars) else None
+
+    def _create_agent(self) -> Agent:
+        """Create an analysis agent (the pool creates extras for concurrent calls)."""
+        return Agent(
             model=self.model,
             system_prompt=self.system_prompt,
             tools=[search_book_analysis, search_book_analysis_parallel]
         )
+
+    def _create_offline_agent(self) -> Agent:
+        """Create a tool-less analysis agent for when Exa is unavailable."""
+        return Agent(model=self.model, system_prompt=self.system_prompt, tools=[])
+
+    def _create_fast_agent(self) -> Agent:
+        """Create a tool-less agent on the smaller model for short deadlines."""
+        return Agent(model=self.fast_model, system_prompt=self.system_prompt, tools=[])
     
-    async def analyze(self, title: str, author: str, book_id: str = None) -> BookDNAResponse | None:
-        """Analyze a book and extract its DNA pillars."""
+    def _plan_analysis(
+        self,
+        title: str,
+        author: str,
+        deadline: Deadline | None
+    ) -> tuple[str, AgentPool, str, bool]:
+        """Pick the prompt, agents and latency stage for a full analysis.
+
+        Returns ``(prompt, agents, stage, degraded)``; ``degraded`` is True
+        when the book is analyzed from model knowledge only (short on time,
+        or Exa unavailable), so the result is not worth caching.
+        """
+        short_on_time = deadline is not None and not deadline.can_afford("analysis", 30.0)
+        if short_on_time:
+            logger.warning(f"Deadline short ({deadline.remaining():.0f}s left) - fast analysis of '{title}'")
+            prompt = self.offline_task_prompt_template.format(title=title, author=author)
+            # Tracked apart so it doesn't skew full-analysis latency
+            return prompt, self.fast_agents, "analysis_fast", True
+        # Skip Exa entirely while its breaker is open rather than waiting out timeouts
+        if provider_available("exa"):
+            return self.task_prompt_template.format(title=title, author=author), self.agents, "analysis", False
+        logger.warning(f"Exa unavailable - analyzing '{title}' from model knowledge only")
+        return self.offline_task_prompt_template.format(title=title, author=author), self.offline_agents, "analysis", True
+
+    async def analyze(
+        self,
+        title: str,
+        author: str,
+        book_id: str = None,
+        priority: Priority = Priority.INTERACTIVE,
+        deadline: Deadline | None = None,
+        pillars: list[str] | None = None
+    ) -> BookDNAResponse | None:
+        """Analyze a book and extract its DNA pillars.
+
+        Seed analyses run at interactive priority; bulk callers such as the
+        ranker pass ``Priority.BULK`` so they queue behind user-facing calls.
+        When the deadline is too short for a searched analysis, the book is
+        analyzed from model knowledge on the smaller model instead. Only
+        searched analyses are cached (per work); knowledge-only ones, short
+        on time or while Exa is unavailable, are not.
+
+        With ``pillars``, only those pillars (plus genre and dealbreakers)
+        are generated and the rest are left empty. Pillar-scoped results are
+        merged into the cached entry until a full analysis replaces it.
+
+        Raises:
+            ProviderUnavailableError: If the Gemini breaker is open
+            DeadlineExceededError: If the deadline passes mid-analysis
+        """
         try:
             # Generate temp ID for candidates if no book_id provided
             analysis_id = book_id or f"candidate_{title.replace(' ', '_').lower()}"
 
+            cached = self.cached_dna(title, author, pillars, book_id)
+            if cached is not None:
+                logger.info(f"Using cached DNA for '{title}' by {author}", extra={'response': True})
+                return cached.model_copy(update={'book_id': analysis_id, 'title': title, 'author': author})
+
+            # A pillar-scoped analysis only generates pillars not cached yet
+            base = None
+            missing_pillars = None
+            if pillars:
+                base = self.dna_cache.get(self._dna_key(title, author, book_id))
+                missing_pillars = tuple(p for p in dict.fromkeys(pillars) if base is None or not base.covers([p]))
+            output_model = partial_dna_model(missing_pillars) if missing_pillars else BookDNAResponse
+
             # Major step logging with progress indicators
             logger.info(f"BOOK DNA ANALYSIS: {title} by {author} (ID: {analysis_id})", extra={'step': True})
             logger.info("Step 1/3: Preparing analysis prompt...", extra={'query': True})
 
-            prompt = self.task_prompt_template.format(title=title, author=author)
+            prompt, agents, stage, degraded = self._plan_analysis(title, author, deadline)
+            if missing_pillars:
+                if stage == "analysis":
+                    stage = "analysis_partial"  # Much shorter output than a full analysis
+                pillar_list = ', '.join(p.replace('_', ' ') for p in missing_pillars)
+                prompt = f"{prompt}\n\n{self.partial_scope_template.format(pillar_list=pillar_list)}"
             logger.info(f"Agent prompt: {prompt}", extra={'query': True})
 
             logger.info("Step 2/3: Executing agent analysis (search + DNA extraction)...", extra={'query': True})
 
-            result = await self.agent.invoke_async(
-                prompt,
-                structured_output_model=BookDNAResponse
+            result = await invoke_agent(
+                agents, prompt, output_model, stage=stage, priority=priority, deadline=deadline
             )
 
             logger.info("Step 3/3: Processing and validating results...", extra={'query': True})
 
             # Log the structured output
             dna = result.structured_output
+            if missing_pillars:
+                dna = merge_partial_dna(dna, analysis_id, title, base)
             logger.info(f"✓ DNA analysis completed successfully", extra={'response': True})
             logger.info(f"DNA extracted - Genre: {dna.genre}", extra={'response': True})
             logger.info(f"DNA extracted - Setting: {dna.setting.summary} ({dna.setting.time}, {dna.setting.place})", extra={'response': True})
             logger.info(f"DNA extracted - Engine: {dna.narrative_engine.summary}, Theme: {dna.theme.summary}", extra={'response': True})
 
-            # Ensure the response has the correct book_id and title
+            # Ensure the response has the correct book_id, title and author
             dna.book_id = analysis_id
             dna.title = title
+            dna.author = author
+
+            # Knowledge-only DNA isn't kept, so the book is analyzed with search once it is affordable again
+            if not degraded:
+                self.dna_cache.set(self._dna_key(title, author, book_id), dna)
 
             logger.info(f"DNA analysis completed successfully", extra={'response': True})
             return dna
@@ -76,6 +221,101 @@ class BookAnalyzer:
         except StructuredOutputException as e:
             logger.error(f"Structured output failed for {title}: {e}")
             return None
+        except (ProviderUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             logger.error(f"Book analysis failed for {title}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    async def stream_analysis(
+        self,
+        title: str,
+        author: str,
+        book_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+        deadline: Deadline | None = None
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Analyze a book, yielding each DNA field as soon as the model has written it.
+
+        Yields ``(field, value)`` for the genre, each pillar and the
+        dealbreakers, in the order they are generated, then ``("dna", dna)``
+        once the full analysis has validated. Nothing more is yielded if the
+        analysis fails. Cached DNA is replayed field by field, and a finished
+        analysis is cached as in ``analyze``.
+
+        Raises:
+            ProviderUnavailableError: If the Gemini breaker is open
+            DeadlineExceededError: If the deadline passes mid-analysis
+        """
+        cached = self.cached_dna(title, author, book_id=book_id)
+        if cached is not None:
+            logger.info(f"Using cached DNA for '{title}' by {author}", extra={'response': True})
+            dna = cached.model_copy(update={'book_id': book_id, 'title': title, 'author': author})
+            for field in _STREAMED_FIELDS:
+                yield field, getattr(dna, field)
+            yield "dna", dna
+            return
+
+        logger.info(f"BOOK DNA ANALYSIS (streamed): {title} by {author} (ID: {book_id})", extra={'step': True})
+        prompt, agents, stage, degraded = self._plan_analysis(title, author, deadline)
+
+        dna = None
+        streamed: set[str] = set()
+        parser, tool_use_id = PartialObjectParser(), None
+        events = stream_agent(
+            agents, prompt, stage, priority=priority, deadline=deadline, structured_output_model=BookDNAResponse
+        )
+        try:
+            async with aclosing(events):
+                async for event in events:
+                    if "result" in event:
+                        dna = event["result"].structured_output
+                        continue
+                    tool_use = event.get("current_tool_use") or {}
+                    if event.get("type") != "tool_use_stream" or tool_use.get("name") != BookDNAResponse.__name__:
+                        continue
+                    # A retried output call starts a fresh object
+                    if tool_use.get("toolUseId") != tool_use_id:
+                        parser, tool_use_id = PartialObjectParser(), tool_use.get("toolUseId")
+                    for field, raw in parser.feed(event["delta"].get("toolUse", {}).get("input", "")).items():
+                        value = _parse_field(field, raw)
+                        if value is not None:
+                            streamed.add(field)
+                            yield field, value
+        except StructuredOutputException as e:
+            logger.error(f"Structured output failed for {title}: {e}")
+            return
+        except (ProviderUnavailableError, DeadlineExceededError):
+            raise
+        except Exception as e:
+            logger.error(f"Book analysis failed for {title}: {e}")
+            return
+        if dna is None:
+            logger.error(f"Streamed analysis of {title} produced no DNA")
+            return
+
+        dna.book_id = book_id
+        dna.title = title
+        dna.author = author
+        if not degraded:
+            self.dna_cache.set(self._dna_key(title, author, book_id), dna)
+        logger.info(f"✓ Streamed DNA analysis completed", extra={'response': True})
+        # Fields the model didn't stream (or streamed unparseably) come from the validated output
+        for field in _STREAMED_FIELDS:
+            if field not in streamed:
+                yield field, getattr(dna, field)
+        yield "dna", dna
+
+
+# DNA fields sent to the page as they are generated
+_STREAMED_FIELDS = ("genre", *PILLAR_NAMES, "dealbreakers")
+
+
+def _parse_field(field: str, raw: Any) -> Any:
+    """A streamed DNA field validated against its type (None if it isn't one or is invalid)."""
+    if field not in _STREAMED_FIELDS:
+        return None
+    try:
+        return TypeAdapter(BookDNAResponse.model_fields[field].annotation).validate_python(raw)
+    except ValidationError:
+        return None
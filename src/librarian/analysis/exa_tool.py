@@ -1,9 +1,13 @@
 import logging
 import asyncio
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
 from exa_py import Exa
 from strands.tools import tool
 from ..shared.config.api_keys import get_exa_api_key
+from ..shared.resilience.circuit_breaker import provider_available
+from ..shared.resilience.deadline import current_deadline
+from ..shared.resilience.provider_calls import call_provider
 
 logger = logging.getLogger("librarian")
 
@@ -18,18 +22,18 @@ def _sync_exa_search(query: str, num_results: int = 3) -> str:
         exa = Exa(api_key=exa_api_key)
         
         # Search with include_domains for better book content
-        results = exa.search(
+        results = call_provider("exa", lambda: exa.search(
             query,
             num_results=num_results,
             include_domains=["goodreads.com", "reddit.com", "bookish.com", "theguardian.com", "nytimes.com"]
-        )
+        ))
         
         logger.info(f"Exa found {len(results.results)} results for: {query[:50]}...", extra={'response': True})
         
         # Get content using URLs from search results
         if results.results:
             urls = [result.url for result in results.results]
-            content_results = exa.get_contents(urls)
+            content_results = call_provider("exa", lambda: exa.get_contents(urls))
             
             # Combine all results into one text block with 5K char limit per source
             combined_content = []
@@ -66,18 +70,35 @@ async def search_book_analysis_parallel(queries: list[str], num_results: int = 3
     """
     if not queries:
         return "No search queries provided"
+
+    if not provider_available("exa"):
+        logger.warning("Exa unavailable - skipping parallel searches")
+        return "Error: Exa search is temporarily unavailable. Continue using your own knowledge of the book."
     
     logger.info(f"Running {len(queries)} parallel Exa searches", extra={'query': True})
     
-    # Run searches in parallel using thread pool
+    # Run searches in parallel using thread pool, carrying the caller's
+    # context (e.g. admission priority, deadline) into each worker
     loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor(max_workers=3) as executor:
+    deadline = current_deadline()
+    executor = ThreadPoolExecutor(max_workers=3)
+    try:
         tasks = [
-            loop.run_in_executor(executor, _sync_exa_search, query, num_results)
+            loop.run_in_executor(executor, contextvars.copy_context().run, _sync_exa_search, query, num_results)
             for query in queries
         ]
 
-        results = await asyncio.gather(*tasks)
+        if deadline is None:
+            results = await asyncio.gather(*tasks)
+        else:
+            # Use whichever searches finish within the deadline
+            done, pending = await asyncio.wait(tasks, timeout=deadline.remaining())
+            if pending:
+                logger.warning(f"Deadline reached - using {len(done)}/{len(tasks)} Exa searches")
+            results = [task.result() if task in done else None for task in tasks]
+    finally:
+        # Don't block on searches still running past the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Combine all results
     combined_content = []
@@ -115,11 +136,11 @@ def search_book_analysis(query: str, num_results: int = 3) -> str:
         exa = Exa(api_key=exa_api_key)
         
         # Search with include_domains for better book content
-        results = exa.search(
+        results = call_provider("exa", lambda: exa.search(
             query,
             num_results=num_results,
             include_domains=["goodreads.com", "reddit.com", "bookish.com", "theguardian.com", "nytimes.com"]
-        )
+        ))
         
         logger.info(f"Exa found {len(results.results)} results", extra={'response': True})
         
@@ -128,7 +149,7 @@ def search_book_analysis(query: str, num_results: int = 3) -> str:
             urls = [result.url for result in results.results]
             logger.info(f"Fetching content from URLs: {urls}", extra={'query': True})
             
-            content_results = exa.get_contents(urls)
+            content_results = call_provider("exa", lambda: exa.get_contents(urls))
             
             # Combine all results into one text block with 5K char limit per source
             combined_content = []
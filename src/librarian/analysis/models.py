@@ -1,5 +1,11 @@
-from pydantic import BaseModel, Field
-from typing import Literal
+from functools import lru_cache
+from typing import Iterable, Literal
+
+from pydantic import BaseModel, Field, create_model
+from pydantic.json_schema import SkipJsonSchema
+
+# The six DNA pillars, in display order
+PILLAR_NAMES = ("setting", "narrative_engine", "prose_texture", "emotional_profile", "structural_quirks", "theme")
 
 
 class DNAPillar(BaseModel):
@@ -51,4 +57,64 @@ class BookDNAResponse(BaseModel):
     structural_quirks: DNAPillar
     theme: DNAPillar
     
-    dealbreakers: list[str] = Field(description="4 common polarizing tropes")
\ No newline at end of file
+    dealbreakers: list[str] = Field(description="4 common polarizing tropes")
+
+    # Set by the analyzer, not the LLM: the book's author, for keying the seed's caches by work
+    author: SkipJsonSchema[str | None] = Field(default=None, description="Author of the analyzed book")
+
+    # Set by the analyzer, not the LLM: pillars filled in by a pillar-scoped analysis
+    analyzed_pillars: SkipJsonSchema[list[str] | None] = Field(
+        default=None, description="Pillars actually analyzed (None for a full analysis)"
+    )
+
+    def covers(self, pillars: Iterable[str] | None) -> bool:
+        """Whether this DNA has the given pillars analyzed (None means all of them)."""
+        if self.analyzed_pillars is None:
+            return True
+        if pillars is None:
+            return False
+        return set(pillars) <= set(self.analyzed_pillars)
+
+
+@lru_cache(maxsize=64)
+def partial_dna_model(pillars: tuple[str, ...]) -> type[BaseModel]:
+    """Structured-output schema with only the given pillars, genre and dealbreakers."""
+    fields = {"genre": (str, BookDNAResponse.model_fields["genre"])}
+    for pillar in pillars:
+        fields[pillar] = (BookDNAResponse.model_fields[pillar].annotation, BookDNAResponse.model_fields[pillar])
+    fields["dealbreakers"] = (list[str], BookDNAResponse.model_fields["dealbreakers"])
+    return create_model("PartialBookDNA", __doc__="Book DNA limited to the requested pillars.", **fields)
+
+
+def merge_partial_dna(
+    partial: BaseModel,
+    book_id: str,
+    title: str,
+    base: BookDNAResponse | None = None
+) -> BookDNAResponse:
+    """Build a BookDNAResponse from a pillar-scoped analysis.
+
+    Pillars not in ``partial`` come from ``base`` (an earlier partial
+    analysis of the same book) or are left empty.
+    """
+    analyzed = [p for p in PILLAR_NAMES if p in type(partial).model_fields]
+    if base is not None and base.analyzed_pillars:
+        analyzed = [p for p in PILLAR_NAMES if p in analyzed or p in base.analyzed_pillars]
+    data = {}
+    for pillar in PILLAR_NAMES:
+        if pillar in type(partial).model_fields:
+            data[pillar] = getattr(partial, pillar)
+        elif base is not None:
+            data[pillar] = getattr(base, pillar)
+        elif pillar == "setting":
+            data[pillar] = DNASettingPillar(time="", place="", vibe="", full_text="", summary="")
+        else:
+            data[pillar] = DNAPillar(full_text="", summary="")
+    return BookDNAResponse(
+        book_id=book_id,
+        title=title,
+        genre=partial.genre,
+        dealbreakers=partial.dealbreakers,
+        analyzed_pillars=analyzed,
+        **data
+    )
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+
+from .book_analyzer import BookAnalyzer
+from ..shared.config.settings import get_int_setting
+from ..shared.models.book_metadata import BookMetadata
+from ..shared.resilience.deadline import Deadline, expected_seconds
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.resilience.speculation import Speculator, speculator
+
+logger = logging.getLogger("librarian")
+
+
+class DNAPrefetcher:
+    """Warms the DNA cache for the search results a user is most likely to open.
+
+    Analyses run as speculative work, so they are capped, yield to real
+    traffic and are cancelled when the user moves on. Opening a book joins
+    its in-flight warm-up instead of starting a second analysis.
+    """
+
+    def __init__(self, book_analyzer: BookAnalyzer, speculation: Speculator = speculator):
+        self.book_analyzer = book_analyzer
+        self.speculation = speculation
+        self.top_n = get_int_setting("LIBRARIAN_PREFETCH_TOP_N", 3)
+
+    def _key(self, title: str, author: str, book_id: str | None = None) -> tuple:
+        return ("dna", self.book_analyzer._dna_key(title, author, book_id))
+
+    def _schedule(self, title: str, author: str, book_id: str | None, group: str) -> bool:
+        """Start a warm-up for one book unless its DNA is cached; returns whether one is running."""
+        if self.book_analyzer.cached_dna(title, author, book_id=book_id) is not None:
+            return False
+
+        async def warm(deadline: Deadline) -> None:
+            await self.book_analyzer.analyze(title, author, book_id, priority=Priority.SPECULATIVE, deadline=deadline)
+
+        return self.speculation.schedule(self._key(title, author, book_id), group, warm)
+
+    def prefetch(self, books: list[BookMetadata], group: str) -> int:
+        """Start warm-ups for the top results not analyzed yet; returns how many are running."""
+        scheduled = sum(self._schedule(book.title, book.author, book.book_id, group) for book in books[:self.top_n])
+        if scheduled:
+            logger.info(f"Prefetching DNA for {scheduled} search result(s)", extra={'query': True})
+        return scheduled
+
+    def prefetch_candidates(self, candidates: list[tuple[str, str]], group: str, limit: int) -> int:
+        """Start warm-ups for the first ``limit`` (title, author) candidates not analyzed yet."""
+        scheduled = sum(self._schedule(title, author, None, group) for title, author in candidates[:limit])
+        if scheduled:
+            logger.info(f"Prefetching DNA for {scheduled} likely candidate(s)", extra={'query': True})
+        return scheduled
+
+    async def join(self, book: BookMetadata, group: str | None = None, deadline: Deadline | None = None) -> None:
+        """Wait for this book's warm-up, if one is running, after cancelling the group's others.
+
+        The warm-up queues behind all other Gemini traffic, so with a
+        deadline the wait ends once only the time for an analysis of its own
+        is left. The warm-up is then cancelled, and the caller analyzes the
+        book at its own priority.
+        """
+        key = self._key(book.title, book.author, book.book_id)
+        if group:
+            self.speculation.cancel_group(group, keep=key)
+        task = self.speculation.running(key)
+        if task is not None:
+            timeout = max(0.0, deadline.remaining() - expected_seconds("analysis", 30.0)) if deadline else None
+            logger.info(f"Joining DNA prefetch for '{book.title}'", extra={'query': True})
+            # Not cancelled with the wait: if this page request goes away, the warm-up still fills the cache
+            done, _ = await asyncio.wait([task], timeout=timeout)
+            if not done:
+                logger.warning(f"DNA prefetch for '{book.title}' still running - analyzing it in the foreground")
+                self.speculation.cancel(key)
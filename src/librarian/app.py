@@ -1,27 +1,49 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import aclosing, asynccontextmanager
 import logging
-from fastapi import FastAPI, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+import uuid
+from typing import AsyncIterator, TypeVar
+from fastapi import FastAPI, Request, Response, Query, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
+from markupsafe import escape
+from pydantic import BaseModel
 
 from .seed import BooksAPI
-from .analysis import BookAnalyzer, BookDNAResponse
-from .ranking import BookRanker, CandidatesFinder, CandidateList, RankingResponse
+from .analysis import BookAnalyzer, BookDNAResponse, DNAPrefetcher
+from .analysis.models import PILLAR_NAMES
+from .ranking import BookRanker, CandidatePrefetcher, CandidatesFinder, CandidateList, RankingResponse
 from .writing import RecommendationsWriter, RecommendationResponse
+from .pipeline import RECOMMENDATION_MODES, RecommendationPipeline
 from .shared.models.book_metadata import BookMetadata
 from .shared.models.requests import (
     FindCandidatesRequest,
     RankCandidatesRequest,
     WriteRecommendationsRequest,
     RecommendationsHtmlRequest,
+    RecommendRequest,
+    RecommendMoreRequest,
 )
 from .shared.logging.colored_formatter import setup_logging
+from .shared.cache.artifact_store import ArtifactStore
+from .shared.config.settings import get_float_setting, get_int_setting
+from .shared.resilience.circuit_breaker import breaker_snapshot
+from .shared.resilience.deadline import Deadline
+from .shared.resilience.disconnect import cancel_on_disconnect
+from .shared.resilience.rate_limiter import limiter_snapshot
+from .shared.resilience.speculation import speculator
+from .shared.resilience.latency import latency_tracker
 from .shared.exceptions import (
     LibrarianError,
     BookNotFoundError,
+    ArtifactNotFoundError,
     AnalysisFailedError,
     CandidateSearchFailedError,
+    RecommendationFailedError,
+    ProviderUnavailableError,
+    DeadlineExceededError,
+    RequestCancelledError,
 )
 
 load_dotenv()
@@ -35,17 +57,43 @@ book_analyzer: BookAnalyzer | None = None
 candidates_finder: CandidatesFinder | None = None
 book_ranker: BookRanker | None = None
 recommendations_writer: RecommendationsWriter | None = None
+recommendation_pipeline: RecommendationPipeline | None = None
+artifact_store: ArtifactStore | None = None
+dna_prefetcher: DNAPrefetcher | None = None
+candidate_prefetcher: CandidatePrefetcher | None = None
+
+# Response header carrying the id of the artifact an endpoint produced
+ARTIFACT_ID_HEADER = "X-Artifact-Id"
+
+# Cookie grouping a browser's speculative work, so it can be cancelled when the user moves on
+SPECULATION_COOKIE = "librarian_speculation"
+
+# Where the DNA page shell ends and streamed pillars are flushed
+DNA_STREAM_MARKER = "<!-- dna-stream -->"
+
+M = TypeVar("M", bound=BaseModel)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global books_api, book_analyzer, candidates_finder, book_ranker, recommendations_writer
+    global books_api, book_analyzer, candidates_finder, book_ranker, recommendations_writer, recommendation_pipeline
+    global artifact_store, dna_prefetcher, candidate_prefetcher
     books_api = BooksAPI()
     book_analyzer = BookAnalyzer()
+    dna_prefetcher = DNAPrefetcher(book_analyzer)
     candidates_finder = CandidatesFinder()
-    book_ranker = BookRanker(book_analyzer=book_analyzer)
+    candidate_prefetcher = CandidatePrefetcher(candidates_finder, dna_prefetcher)
+    book_ranker = BookRanker(book_analyzer=book_analyzer, books_api=books_api)
     recommendations_writer = RecommendationsWriter()
+    recommendation_pipeline = RecommendationPipeline(
+        candidates_finder, book_ranker, recommendations_writer, render_recommendations
+    )
+    artifact_store = ArtifactStore(
+        ttl_seconds=get_float_setting("LIBRARIAN_ARTIFACT_TTL_SECONDS", 1800),
+        max_entries=get_int_setting("LIBRARIAN_ARTIFACT_MAX_ENTRIES", 5000),
+    )
     yield
+    speculator.cancel_all()
     await books_api.close()
 
 
@@ -53,6 +101,11 @@ app = FastAPI(title="The Librarian", lifespan=lifespan)
 templates = Jinja2Templates(directory="src/librarian/templates")
 
 
+def render_recommendations(recommendations: RecommendationResponse) -> str:
+    """Render the recommendations partial outside of a request (e.g. for caching)."""
+    return templates.get_template("recommendations_partial.html").render(recommendations=recommendations)
+
+
 @app.exception_handler(LibrarianError)
 async def librarian_error_handler(request: Request, exc: LibrarianError) -> JSONResponse:
     """Global exception handler for Librarian custom exceptions."""
@@ -62,10 +115,20 @@ async def librarian_error_handler(request: Request, exc: LibrarianError) -> JSON
     status_code = 500  # Default to internal server error
     if isinstance(exc, BookNotFoundError):
         status_code = 404
+    elif isinstance(exc, ArtifactNotFoundError):
+        status_code = 410  # Expired handle; the client resends the inline payload
     elif isinstance(exc, AnalysisFailedError):
         status_code = 500
     elif isinstance(exc, CandidateSearchFailedError):
         status_code = 500
+    elif isinstance(exc, RecommendationFailedError):
+        status_code = 500
+    elif isinstance(exc, ProviderUnavailableError):
+        status_code = 503
+    elif isinstance(exc, DeadlineExceededError):
+        status_code = 504
+    elif isinstance(exc, RequestCancelledError):
+        status_code = 499  # Client closed request; nobody reads this response
 
     return JSONResponse(
         status_code=status_code,
@@ -76,28 +139,47 @@ async def librarian_error_handler(request: Request, exc: LibrarianError) -> JSON
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Home page with search box."""
+    if group := request.cookies.get(SPECULATION_COOKIE):
+        speculator.cancel_group(group)  # Back to the start: earlier warm-ups won't be used
     return templates.TemplateResponse("home.html", {"request": request})
 
 
 @app.get("/search", response_class=HTMLResponse)
 async def search_page(request: Request, q: str = Query(default="")):
-    """Search results page."""
+    """Search results page.
+
+    DNA for the top results is prefetched in the background, so opening
+    one of them is usually a cache hit.
+    """
+    if group := request.cookies.get(SPECULATION_COOKIE):
+        speculator.cancel_group(group)  # A new search replaces the last one's warm-ups
+    group = uuid.uuid4().hex
+
     books = []
     if q:
         logger.info(f"Web endpoint hit: /search?q={q!r}")
         books = await books_api.search(q)
         logger.info(f"Search completed, rendering {len(books)} results", extra={'response': True})
-    return templates.TemplateResponse("search.html", {
+        dna_prefetcher.prefetch(books, group)
+    response = templates.TemplateResponse("search.html", {
         "request": request,
         "query": q,
         "books": books,
     })
+    response.set_cookie(SPECULATION_COOKIE, group, httponly=True, samesite="lax")
+    return response
 
 
 @app.get("/book/{book_id}/analyze", response_class=HTMLResponse)
-async def analyze_book_page(request: Request, book_id: str):
-    """DNA analysis page for a selected book."""
+async def analyze_book_page(request: Request, book_id: str) -> StreamingResponse:
+    """DNA analysis page for a selected book.
+
+    The page shell (cover, title, placeholder tiles) is sent as soon as the
+    book's metadata is known; each pillar is then flushed into the page as
+    the analysis writes it.
+    """
     logger.info(f"Web endpoint hit: /book/{book_id}/analyze")
+    deadline = Deadline.for_endpoint("analyze")
     
     # Get book metadata
     logger.info(f"Fetching book metadata for: {book_id}", extra={'query': True})
@@ -108,18 +190,66 @@ async def analyze_book_page(request: Request, book_id: str):
 
     logger.info(f"Book metadata retrieved: {book.title} by {book.author}", extra={'response': True})
 
-    # Analyze the book
-    dna = await book_analyzer.analyze(book.title, book.author, book_id)
-    if not dna:
-        logger.error(f"Analysis failed for: {book.title}")
-        raise AnalysisFailedError(book.title, book.author)
-    
-    logger.info(f"Rendering DNA analysis page", extra={'response': True})
-    return templates.TemplateResponse("dna_analysis.html", {
-        "request": request,
-        "book": book,
-        "dna": dna,
-    })
+    page = templates.get_template("dna_analysis.html").render(request=request, book=book, dna=None, dna_id=None)
+    head, tail = page.split(DNA_STREAM_MARKER, 1)
+    group = request.cookies.get(SPECULATION_COOKIE)
+    return StreamingResponse(_stream_dna_page(head, tail, book, group, deadline), media_type="text/html")
+
+
+async def _stream_dna_page(
+    head: str,
+    tail: str,
+    book: BookMetadata,
+    speculation_group: str | None,
+    deadline: Deadline
+) -> AsyncIterator[str]:
+    """Send the page shell, then each analyzed pillar, then the rest of the page."""
+    tiles = templates.env.get_template("dna_tiles.html").module
+    analysis = book_analyzer.stream_analysis(book.title, book.author, book.book_id, deadline=deadline)
+    dna = None
+    failure = "Book analysis failed - please reload the page to try again."
+    try:
+        yield head
+        # Reuse the search page's warm-up for this book and drop the ones for other results
+        await dna_prefetcher.join(book, speculation_group, deadline)
+        try:
+            async with aclosing(analysis):
+                async for field, value in analysis:
+                    if field in PILLAR_NAMES:
+                        yield str(tiles.fill_pillar(field, value))
+                    elif field == "dealbreakers":
+                        yield str(tiles.fill_dealbreakers(value))
+                    elif field == "dna":
+                        dna = value
+                        yield str(tiles.fill_dna(book, dna, artifact_store.put("dna", dna)))
+                        # Search and analyze likely candidates while the user picks pillars
+                        candidate_prefetcher.prefetch(dna, speculation_group or uuid.uuid4().hex)
+        except (ProviderUnavailableError, DeadlineExceededError) as e:
+            # The status code has already been sent, so the reason goes on the page
+            failure = e.detail
+        if dna is None:
+            logger.error(f"Analysis failed for: {book.title}")
+            yield str(tiles.fill_error(failure))
+        else:
+            logger.info(f"DNA analysis page streamed", extra={'response': True})
+        yield tail
+    finally:
+        if dna is None:
+            deadline.cancel()  # Stop provider calls still running in worker threads
+
+
+@app.get("/api/health/providers")
+async def api_provider_health() -> dict:
+    """API endpoint exposing circuit breaker, limiter and latency state for dashboards."""
+    return {
+        "breakers": breaker_snapshot(),
+        "limiters": limiter_snapshot(),
+        "latency": latency_tracker.snapshot(),
+        "caches": {
+            "recommendations": recommendation_pipeline.cache.snapshot() if recommendation_pipeline else {},
+        },
+        "speculation": speculator.snapshot(),
+    }
 
 
 @app.get("/api/books/search")
@@ -137,9 +267,10 @@ async def api_get_book(book_id: str) -> BookMetadata | None:
 
 
 @app.get("/api/books/{book_id}/analyze")
-async def api_analyze_book(book_id: str) -> BookDNAResponse:
+async def api_analyze_book(request: Request, response: Response, book_id: str) -> BookDNAResponse:
     """API endpoint to analyze a book and extract DNA pillars."""
     logger.info(f"API endpoint hit: /api/books/{book_id}/analyze")
+    deadline = Deadline.for_endpoint("analyze")
     
     # First get the book metadata
     book = await books_api.get_book(book_id)
@@ -147,67 +278,297 @@ async def api_analyze_book(book_id: str) -> BookDNAResponse:
         raise BookNotFoundError(book_id)
 
     # Analyze the book
-    dna = await book_analyzer.analyze(book.title, book.author, book_id)
+    dna = await cancel_on_disconnect(
+        request, deadline, book_analyzer.analyze(book.title, book.author, book_id, deadline=deadline)
+    )
     if not dna:
         raise AnalysisFailedError(book.title, book.author)
     
+    # Search and analyze likely candidates while the user picks pillars
+    candidate_prefetcher.prefetch(dna, request.cookies.get(SPECULATION_COOKIE) or uuid.uuid4().hex)
+    response.headers[ARTIFACT_ID_HEADER] = artifact_store.put("dna", dna)
     return dna
 
 
-@app.post("/api/books/{book_id}/find-candidates")
-async def api_find_candidates(
-    book_id: str,
-    request: FindCandidatesRequest
-) -> CandidateList:
-    """API endpoint to find book candidates based on selected pillars and dealbreakers."""
-    logger.info(f"API endpoint hit: /api/books/{book_id}/find-candidates")
+def _load_artifact(artifact_id: str | None, model_type: type[M]) -> M | None:
+    """Look up an artifact sent by id instead of inline (None if no id was sent)."""
+    if not artifact_id:
+        return None
+    artifact = artifact_store.get(artifact_id, model_type)
+    if artifact is None:
+        raise ArtifactNotFoundError(artifact_id)
+    return artifact
 
-    # Extract request data
-    selected_pillars = request.selected_pillars
-    selected_dealbreakers = request.dealbreakers
-    dna_data = request.dna
+
+def _resolve_write_request(request: WriteRecommendationsRequest) -> tuple[RankingResponse, BookDNAResponse]:
+    """Validate a write-recommendations request and resolve its ranking and seed DNA."""
+    if not request.ranking and not request.ranking_id:
+        raise HTTPException(status_code=400, detail="Ranking data is required")
+    
+    if not request.selected_pillars:
+        raise HTTPException(status_code=400, detail="At least one pillar must be selected")
+    
+    if not request.seed_dna and not request.seed_dna_id:
+        raise HTTPException(status_code=400, detail="Seed DNA data is required")
     
+    # Resolve stored artifacts, or convert inline data back to objects
+    ranking = _load_artifact(request.ranking_id, RankingResponse)
+    seed_dna = _load_artifact(request.seed_dna_id, BookDNAResponse)
+    try:
+        if ranking is None:
+            ranking = RankingResponse(**request.ranking)
+        if seed_dna is None:
+            seed_dna = BookDNAResponse(**request.seed_dna)
+    except Exception as e:
+        logger.error(f"Invalid request data: {e}")
+        raise HTTPException(status_code=400, detail="Invalid request data format")
+    return ranking, seed_dna
+
+
+def _validate_selection(
+    selected_pillars: list[str],
+    dna_data: dict | None,
+    dna_id: str | None = None
+) -> BookDNAResponse:
+    """Validate the user's pillar selection and resolve the seed DNA it refers to."""
     if not selected_pillars:
         raise HTTPException(status_code=400, detail="At least one pillar must be selected")
     
     if len(selected_pillars) > 3:
         raise HTTPException(status_code=400, detail="Maximum 3 pillars can be selected")
     
-    if not dna_data:
+    if not dna_data and not dna_id:
         raise HTTPException(status_code=400, detail="DNA data is required")
     
     # Validate selected pillars exist in the DNA
-    # Derive valid pillars from BookDNAResponse model (exclude metadata fields)
-    excluded_fields = {"book_id", "title", "genre", "dealbreakers"}
-    valid_pillars = [field for field in BookDNAResponse.model_fields.keys() if field not in excluded_fields]
-    invalid_pillars = [p for p in selected_pillars if p not in valid_pillars]
+    invalid_pillars = [p for p in selected_pillars if p not in PILLAR_NAMES]
     if invalid_pillars:
         raise HTTPException(status_code=400, detail=f"Invalid pillars: {invalid_pillars}")
     
+    stored_dna = _load_artifact(dna_id, BookDNAResponse)
+    if stored_dna is not None:
+        return stored_dna
+
     # Convert DNA data back to BookDNAResponse object
     try:
-        dna = BookDNAResponse(**dna_data)
+        return BookDNAResponse(**dna_data)
     except Exception as e:
         logger.error(f"Invalid DNA data: {e}")
         raise HTTPException(status_code=400, detail="Invalid DNA data format")
+
+
+def _validate_mode(mode: str | None) -> None:
+    if mode is not None and mode not in RECOMMENDATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode: {mode}. Use one of {list(RECOMMENDATION_MODES)}")
+
+
+@app.post("/api/books/{book_id}/recommend")
+async def api_recommend(
+    book_id: str,
+    request: RecommendRequest,
+    http_request: Request
+) -> RecommendationResponse:
+    """API endpoint running the full pipeline (find, rank, write), cached per seed and selection.
+
+    ``mode`` "snippet" skips candidate analysis for a quick answer, which
+    a background full run later upgrades; by default it is used under load.
+    """
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend")
+    dna = _validate_selection(request.selected_pillars, request.dna, request.dna_id)
+    _validate_mode(request.mode)
+    result = await cancel_on_disconnect(
+        http_request,
+        None,  # The run may be shared with other requests; the cache cancels it once nobody waits
+        recommendation_pipeline.recommend(book_id, dna, request.selected_pillars, request.dealbreakers, request.mode)
+    )
+    return result.recommendations
+
+
+@app.post("/api/books/{book_id}/recommend-html", response_class=HTMLResponse)
+async def api_recommend_html(
+    book_id: str,
+    request: RecommendRequest,
+    http_request: Request
+) -> HTMLResponse:
+    """API endpoint running the full pipeline and returning the rendered recommendations partial."""
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend-html")
+    dna = _validate_selection(request.selected_pillars, request.dna, request.dna_id)
+    _validate_mode(request.mode)
+    result = await cancel_on_disconnect(
+        http_request,
+        None,
+        recommendation_pipeline.recommend(book_id, dna, request.selected_pillars, request.dealbreakers, request.mode)
+    )
+    return HTMLResponse(content=result.html)
+
+
+@app.post("/api/books/{book_id}/recommend-more")
+async def api_recommend_more(
+    book_id: str,
+    request: RecommendMoreRequest,
+    http_request: Request
+) -> RecommendationResponse:
+    """API endpoint recommending the next batch of the candidate pool kept by an earlier run.
+
+    ``offset`` is the ``next_offset`` of the previous response; only that
+    batch is analyzed, ranked and written.
+    """
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend-more")
+    return await _recommend_more(book_id, request, http_request)
+
+
+@app.post("/api/books/{book_id}/recommend-more-html", response_class=HTMLResponse)
+async def api_recommend_more_html(
+    book_id: str,
+    request: RecommendMoreRequest,
+    http_request: Request
+) -> HTMLResponse:
+    """API endpoint rendering the next batch's cards, and the button for the batch after, for "load more"."""
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend-more-html")
+    recommendations = await _recommend_more(book_id, request, http_request)
+    html = templates.get_template("recommendations_more.html").render(recommendations=recommendations)
+    return HTMLResponse(content=html)
+
+
+async def _recommend_more(book_id: str, request: RecommendMoreRequest, http_request: Request) -> RecommendationResponse:
+    """Validate a "load more" request and recommend its batch of the kept pool."""
+    dna = _validate_selection(request.selected_pillars, request.dna, request.dna_id)
+    _validate_mode(request.mode)
+    if request.offset < 0:
+        raise HTTPException(status_code=400, detail="Offset must not be negative")
+
+    deadline = Deadline.for_endpoint("recommend")
+    return await cancel_on_disconnect(
+        http_request,
+        deadline,
+        recommendation_pipeline.more(
+            book_id, dna, request.selected_pillars, request.dealbreakers, request.offset, deadline, request.mode
+        )
+    )
+
+
+@app.post("/api/books/{book_id}/recommend-stream")
+async def api_recommend_stream(
+    book_id: str,
+    request: RecommendRequest,
+    http_request: Request
+) -> StreamingResponse:
+    """API endpoint streaming recommendation cards as NDJSON, one card per line in rank order.
+
+    The first card is awaited before the response starts, so search and
+    analysis failures still map to error status codes. ``mode`` works as
+    for ``/recommend``; snippet-mode cards all arrive at once.
+    """
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend-stream")
+    dna = _validate_selection(request.selected_pillars, request.dna, request.dna_id)
+    _validate_mode(request.mode)
+    cards = recommendation_pipeline.stream(
+        book_id, dna, request.selected_pillars, request.dealbreakers, mode=request.mode
+    )
+    try:
+        first = await cancel_on_disconnect(http_request, None, anext(cards))
+    except BaseException:
+        await cards.aclose()
+        raise
+
+    async def body():
+        try:
+            yield first.model_dump_json() + "\n"
+            async for card in cards:
+                yield card.model_dump_json() + "\n"
+        finally:
+            await cards.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/api/books/{book_id}/recommend-html-stream", response_class=HTMLResponse)
+async def api_recommend_html_stream(
+    book_id: str,
+    request: RecommendRequest,
+    http_request: Request
+) -> StreamingResponse:
+    """API endpoint streaming the recommendations partial, each card flushed as soon as it is written.
+
+    The first card is awaited before the response starts, so failures
+    still map to status codes. With an explicit ``mode``, or while snippet
+    mode is used under load, the whole partial from ``/recommend-html`` is
+    sent in one piece.
+    """
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommend-html-stream")
+    dna = _validate_selection(request.selected_pillars, request.dna, request.dna_id)
+    _validate_mode(request.mode)
+    if request.mode is not None or recommendation_pipeline.use_snippets(None):
+        result = await cancel_on_disconnect(
+            http_request,
+            None,
+            recommendation_pipeline.recommend(book_id, dna, request.selected_pillars, request.dealbreakers, request.mode)
+        )
+        return StreamingResponse(iter([result.html]), media_type="text/html")
+
+    summary = RecommendationResponse(recommendations=[], total_analyzed=0, failed_analyses=0)
+    cards = recommendation_pipeline.stream(book_id, dna, request.selected_pillars, request.dealbreakers, summary)
+    try:
+        first = await cancel_on_disconnect(http_request, None, anext(cards))
+    except BaseException:
+        await cards.aclose()
+        raise
+
+    async def body():
+        card = templates.env.get_template("recommendation_card.html").module
+        try:
+            # The analyzed count isn't known until the last card is out
+            yield str(card.list_open()) + str(card.card(first))
+            async for rec in cards:
+                yield str(card.card(rec))
+            yield str(card.list_close(summary.partial, summary.failed_analyses, summary.snippet_only, summary.next_offset))
+        finally:
+            await cards.aclose()
+
+    return StreamingResponse(body(), media_type="text/html")
+
+
+@app.post("/api/books/{book_id}/find-candidates")
+async def api_find_candidates(
+    book_id: str,
+    request: FindCandidatesRequest,
+    http_request: Request,
+    response: Response
+) -> CandidateList:
+    """API endpoint to find book candidates based on selected pillars and dealbreakers."""
+    logger.info(f"API endpoint hit: /api/books/{book_id}/find-candidates")
+    deadline = Deadline.for_endpoint("find_candidates")
+
+    # Extract request data
+    selected_pillars = request.selected_pillars
+    selected_dealbreakers = request.dealbreakers
+    dna = _validate_selection(selected_pillars, request.dna, request.dna_id)
     
     # Find candidates using provided DNA (no re-analysis needed)
-    candidates = await candidates_finder.find_candidates(dna, selected_pillars, selected_dealbreakers)
+    candidates = await cancel_on_disconnect(
+        http_request,
+        deadline,
+        candidates_finder.find_candidates(dna, selected_pillars, selected_dealbreakers, deadline=deadline)
+    )
     if not candidates:
         raise CandidateSearchFailedError("LLM failed to produce candidates")
 
     if len(candidates.candidates) == 0:
         raise CandidateSearchFailedError("No candidates found. Try different pillar selections or fewer dealbreakers.")
 
+    response.headers[ARTIFACT_ID_HEADER] = artifact_store.put("candidates", candidates)
     return candidates
 
 @app.post("/api/books/{book_id}/rank-candidates")
 async def api_rank_candidates(
     book_id: str,
-    request: RankCandidatesRequest
+    request: RankCandidatesRequest,
+    http_request: Request,
+    response: Response
 ) -> RankingResponse:
     """API endpoint to rank book candidates based on DNA analysis and user preferences."""
     logger.info(f"API endpoint hit: /api/books/{book_id}/rank-candidates")
+    deadline = Deadline.for_endpoint("rank_candidates")
 
     # Extract request data
     candidates_data = request.candidates
@@ -215,32 +576,43 @@ async def api_rank_candidates(
     selected_dealbreakers = request.dealbreakers
     seed_dna_data = request.seed_dna
     
-    if not candidates_data:
+    if not candidates_data and not request.candidates_id:
         raise HTTPException(status_code=400, detail="Candidates data is required")
     
     if not selected_pillars:
         raise HTTPException(status_code=400, detail="At least one pillar must be selected")
     
-    if not seed_dna_data:
+    if not seed_dna_data and not request.seed_dna_id:
         raise HTTPException(status_code=400, detail="Seed DNA data is required")
     
-    # Convert data back to objects
+    # Resolve stored artifacts, or convert inline data back to objects
+    candidates = _load_artifact(request.candidates_id, CandidateList)
+    seed_dna = _load_artifact(request.seed_dna_id, BookDNAResponse)
     try:
-        candidates = CandidateList(candidates=candidates_data)
-        seed_dna = BookDNAResponse(**seed_dna_data)
+        if candidates is None:
+            candidates = CandidateList(candidates=candidates_data)
+        if seed_dna is None:
+            seed_dna = BookDNAResponse(**seed_dna_data)
     except Exception as e:
         logger.error(f"Invalid request data: {e}")
         raise HTTPException(status_code=400, detail="Invalid request data format")
     
     # Rank candidates
     try:
-        ranking = await book_ranker.rank_candidates(seed_dna, candidates, selected_pillars, selected_dealbreakers)
+        ranking = await cancel_on_disconnect(
+            http_request,
+            deadline,
+            book_ranker.rank_candidates(seed_dna, candidates, selected_pillars, selected_dealbreakers, deadline=deadline)
+        )
         
         if not ranking.candidates:
             raise HTTPException(status_code=404, detail="No candidates could be ranked. All analyses may have failed.")
         
+        response.headers[ARTIFACT_ID_HEADER] = artifact_store.put("ranking", ranking)
         return ranking
         
+    except (RequestCancelledError, ProviderUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         logger.error(f"Ranking error: {e}")
         raise HTTPException(status_code=500, detail="Ranking failed - please try again")
@@ -248,38 +620,24 @@ async def api_rank_candidates(
 @app.post("/api/books/{book_id}/write-recommendations")
 async def api_write_recommendations(
     book_id: str,
-    request: WriteRecommendationsRequest
+    request: WriteRecommendationsRequest,
+    http_request: Request
 ) -> RecommendationResponse:
     """API endpoint to transform ranked candidates into empathetic recommendation copy."""
     logger.info(f"API endpoint hit: /api/books/{book_id}/write-recommendations")
-
-    # Extract request data
-    ranking_data = request.ranking
+    deadline = Deadline.for_endpoint("write_recommendations")
     selected_pillars = request.selected_pillars
     selected_dealbreakers = request.dealbreakers
-    seed_dna_data = request.seed_dna
-    
-    if not ranking_data:
-        raise HTTPException(status_code=400, detail="Ranking data is required")
-    
-    if not selected_pillars:
-        raise HTTPException(status_code=400, detail="At least one pillar must be selected")
-    
-    if not seed_dna_data:
-        raise HTTPException(status_code=400, detail="Seed DNA data is required")
-    
-    # Convert data back to objects
-    try:
-        ranking = RankingResponse(**ranking_data)
-        seed_dna = BookDNAResponse(**seed_dna_data)
-    except Exception as e:
-        logger.error(f"Invalid request data: {e}")
-        raise HTTPException(status_code=400, detail="Invalid request data format")
+    ranking, seed_dna = _resolve_write_request(request)
     
     # Write empathetic recommendations
     try:
-        recommendations = await recommendations_writer.write_recommendations(
-            seed_dna, ranking, selected_pillars, selected_dealbreakers
+        recommendations = await cancel_on_disconnect(
+            http_request,
+            deadline,
+            recommendations_writer.write_recommendations(
+                seed_dna, ranking, selected_pillars, selected_dealbreakers, deadline=deadline
+            )
         )
         
         if not recommendations.recommendations:
@@ -287,6 +645,8 @@ async def api_write_recommendations(
         
         return recommendations
         
+    except (RequestCancelledError, ProviderUnavailableError, DeadlineExceededError):
+        raise
     except Exception as e:
         logger.error(f"Recommendations writing error: {e}")
         raise HTTPException(status_code=500, detail="Recommendations writing failed - please try again")
@@ -303,7 +663,7 @@ async def api_recommendations_html(
     
     # Use the existing write_recommendations logic
     try:
-        recommendations = await api_write_recommendations(book_id, request_data)
+        recommendations = await api_write_recommendations(book_id, request_data, request)
         
         # Render the partial template
         html_content = templates.TemplateResponse(
@@ -313,8 +673,83 @@ async def api_recommendations_html(
         
         return HTMLResponse(content=html_content)
         
-    except HTTPException:
+    except (HTTPException, RequestCancelledError, ProviderUnavailableError, DeadlineExceededError):
         raise
     except Exception as e:
         logger.error(f"HTML recommendations error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate recommendations HTML")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate recommendations HTML")
+
+
+@app.post("/api/books/{book_id}/recommendations-html-stream", response_class=HTMLResponse)
+async def api_recommendations_html_stream(
+    book_id: str,
+    request_data: WriteRecommendationsRequest
+) -> StreamingResponse:
+    """API endpoint streaming the recommendations partial as each card's copy is written.
+
+    Every card is written concurrently; cards are sent in rank order, each
+    one's text flushed as the LLM generates it. A card whose copy can't be
+    written shows the ranking reasoning instead.
+    """
+    logger.info(f"API endpoint hit: /api/books/{book_id}/recommendations-html-stream")
+    ranking, seed_dna = _resolve_write_request(request_data)
+    if not ranking.candidates:
+        raise HTTPException(status_code=404, detail="No recommendations could be written.")
+    deadline = Deadline.for_endpoint("write_recommendations")
+    html = _stream_recommendations_html(
+        seed_dna, ranking, request_data.selected_pillars, request_data.dealbreakers, deadline
+    )
+    return StreamingResponse(html, media_type="text/html")
+
+
+async def _stream_recommendations_html(
+    seed_dna: BookDNAResponse,
+    ranking: RankingResponse,
+    selected_pillars: list[str],
+    dealbreakers: list[str],
+    deadline: Deadline
+) -> AsyncIterator[str]:
+    """Render the recommendations partial piece by piece as the cards are streamed."""
+    card = templates.env.get_template("recommendation_card.html").module
+    queues: list[asyncio.Queue] = [asyncio.Queue() for _ in ranking.candidates]
+
+    async def write(candidate, queue: asyncio.Queue) -> None:
+        try:
+            async for section, text in recommendations_writer.stream_card(
+                seed_dna, candidate, selected_pillars, dealbreakers, deadline=deadline
+            ):
+                queue.put_nowait((section, text))
+        except Exception as e:
+            logger.error(f"Streaming card '{candidate.title}' failed: {e}")
+            queue.put_nowait((None, ""))
+        finally:
+            queue.put_nowait(None)
+
+    tasks = [asyncio.ensure_future(write(c, q)) for c, q in zip(ranking.candidates, queues)]
+    partial = ranking.partial
+    try:
+        yield str(card.list_open(ranking.total_analyzed))
+        for candidate, queue in zip(ranking.candidates, queues):
+            yield str(card.card_open(candidate))
+            section = None
+            while (item := await queue.get()) is not None:
+                name, text = item
+                if name is None:  # The card failed part-way
+                    partial = True
+                    continue
+                if name != section:
+                    if section is not None:
+                        yield str(card.section_close())
+                    yield str(card.section_open(name))
+                    section = name
+                yield str(escape(text))
+            if section is None:
+                partial = True
+                yield str(card.section_open("why_it_matches")) + str(escape(candidate.reasoning))
+            yield str(card.section_close()) + str(card.card_close())
+        yield str(card.list_close(partial, ranking.failed_analyses))
+    finally:
+        if not all(task.done() for task in tasks):
+            deadline.cancel()  # Stop provider calls still running in worker threads
+            for task in tasks:
+                task.cancel()
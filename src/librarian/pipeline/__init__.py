@@ -0,0 +1,6 @@
+"""End-to-end recommendation pipeline (find, rank, write) with result caching."""
+
+from .recommendation_pipeline import PIPELINE_VERSION, RECOMMENDATION_MODES, RecommendationPipeline
+from .models import PipelineResult, RunCheckpoint
+
+__all__ = ["PIPELINE_VERSION", "RECOMMENDATION_MODES", "RecommendationPipeline", "PipelineResult", "RunCheckpoint"]
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from ..analysis.models import BookDNAResponse
+from ..ranking.models import RankingResponse
+from ..writing.models import RecommendationResponse
+
+
+class PipelineResult(BaseModel):
+    """Final output of a full pipeline run, as stored in the recommendation cache."""
+    recommendations: RecommendationResponse = Field(description="Written recommendation cards")
+    html: str = Field(description="Rendered recommendations partial")
+
+
+class RunCheckpoint(BaseModel):
+    """Stage outputs of one pipeline run, kept so a retry resumes after the last good stage.
+
+    The candidates themselves are checkpointed as the kept candidate pool.
+    """
+    analyses: dict[str, BookDNAResponse] = Field(default_factory=dict, description="Candidate DNA by candidate key")
+    ranking: RankingResponse | None = Field(default=None, description="Complete ranking, once the ranking stage succeeded")
@@ -0,0 +1,482 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+from .models import PipelineResult, RunCheckpoint
+from ..analysis.models import BookDNAResponse
+from ..ranking.book_ranker import BookRanker
+from ..ranking.candidates_finder import CandidatesFinder
+from ..ranking.models import CandidateList, RankingResponse
+from ..writing.models import RecommendationCard, RecommendationResponse
+from ..writing.recommendations_writer import RecommendationsWriter
+from ..shared.cache.ttl_cache import TTLCache
+from ..shared.config.settings import get_float_setting, get_int_setting
+from ..shared.exceptions import CandidateSearchFailedError, RecommendationFailedError
+from ..shared.resilience.deadline import Deadline, expected_seconds
+from ..shared.resilience.rate_limiter import get_limiter
+from ..shared.utils import seed_key
+
+logger = logging.getLogger("librarian")
+
+# Bump whenever prompts, models or stage logic change so cached results are not reused
+PIPELINE_VERSION = "1"
+
+# "snippet" ranks and writes from the finder's explanations, skipping candidate analysis
+RECOMMENDATION_MODES = ("full", "snippet")
+
+
+class RecommendationPipeline:
+    """Runs CandidatesFinder, BookRanker and RecommendationsWriter for a seed book.
+
+    Results are cached per (seed book, pillars, dealbreakers, pipeline version):
+    concurrent requests for the same key share one run, and stale entries are
+    served while a background run refreshes them. The retrieved candidate
+    pool is kept under the same key, so ``more`` can recommend the next batch
+    of it without searching again. Each batch's candidate analyses and
+    ranking are checkpointed until it completes, so a retry after a failed
+    stage re-runs only that stage.
+
+    In snippet mode (asked for, or chosen automatically while Gemini calls
+    are queueing) the batch is ranked and written from the finder's
+    explanations and any cached DNA, and the full run is started in the
+    background to upgrade the cached result.
+    """
+
+    def __init__(
+        self,
+        candidates_finder: CandidatesFinder,
+        book_ranker: BookRanker,
+        recommendations_writer: RecommendationsWriter,
+        render: Callable[[RecommendationResponse], str]
+    ):
+        self.candidates_finder = candidates_finder
+        self.book_ranker = book_ranker
+        self.recommendations_writer = recommendations_writer
+        self.render = render
+        self.cache: TTLCache[PipelineResult] = TTLCache(
+            "recommendations",
+            ttl_seconds=get_float_setting("LIBRARIAN_RECOMMENDATION_CACHE_TTL_SECONDS", 6 * 3600),
+            stale_seconds=get_float_setting("LIBRARIAN_RECOMMENDATION_CACHE_STALE_SECONDS", 24 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_RECOMMENDATION_CACHE_MAX_ENTRIES", 1000),
+        )
+        # Funnel-ordered candidate pools, paged through by ``more``
+        self.pools: TTLCache[CandidateList] = TTLCache(
+            "candidate pools",
+            ttl_seconds=get_float_setting("LIBRARIAN_POOL_CACHE_TTL_SECONDS", 6 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_POOL_CACHE_MAX_ENTRIES", 1000),
+        )
+        # Stage outputs of unfinished runs, per seed, selection and pool offset
+        self.checkpoints: TTLCache[RunCheckpoint] = TTLCache(
+            "run checkpoints",
+            ttl_seconds=get_float_setting("LIBRARIAN_CHECKPOINT_TTL_SECONDS", 1800),
+            max_entries=get_int_setting("LIBRARIAN_CHECKPOINT_MAX_ENTRIES", 1000),
+        )
+
+    @staticmethod
+    def seed_key(seed_dna: BookDNAResponse, book_id: str | None = None) -> str:
+        """Key of the seed book and its DNA (see ``shared.utils.seed_key``).
+
+        Shared by the cached results, candidate pool and checkpoints, and by
+        the ranker's match cache and the writer's card cache.
+        """
+        return seed_key(seed_dna, book_id)
+
+    @staticmethod
+    def cache_key(seed_key: str, selected_pillars: list[str], dealbreakers: list[str]) -> tuple:
+        """Order-insensitive key for a seed book (any edition of it, by ``seed_key``) and user selection."""
+        return (seed_key, tuple(sorted(selected_pillars)), tuple(sorted(dealbreakers)), PIPELINE_VERSION)
+
+    def use_snippets(self, mode: str | None) -> bool:
+        """Whether to skip candidate analysis: as asked, or by default when Gemini calls are queueing."""
+        if mode is not None:
+            return mode == "snippet"
+        queue_depth = get_int_setting("LIBRARIAN_SNIPPET_MODE_QUEUE_DEPTH", 8)
+        return queue_depth > 0 and get_limiter("gemini").snapshot()["queued"] >= queue_depth
+
+    async def recommend(
+        self,
+        book_id: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        mode: str | None = None
+    ) -> PipelineResult:
+        """Cached recommendations for a seed book and user selection.
+
+        Partial results (cut short by the deadline) are returned but not
+        cached. Without a cached result, snippet mode returns quick
+        recommendations and leaves the full run going in the background.
+        """
+        seed = self.seed_key(seed_dna, book_id)
+        key = self.cache_key(seed, selected_pillars, dealbreakers)
+
+        async def compute() -> PipelineResult:
+            # The run is shared between requests, so it gets its own deadline
+            deadline = Deadline.for_endpoint("recommend")
+            try:
+                return await self.run(seed_dna, selected_pillars, dealbreakers, deadline, seed)
+            except asyncio.CancelledError:
+                deadline.cancel()  # Stop provider calls still running in worker threads
+                raise
+
+        should_cache = lambda result: not result.recommendations.partial
+        if self.cache.get(key) is None and self.use_snippets(mode):
+            return await self._snippet_run(seed, seed_dna, selected_pillars, dealbreakers, compute, should_cache)
+        return await self.cache.get_or_compute(key, compute, should_cache=should_cache)
+
+    async def _snippet_run(
+        self,
+        seed: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        compute: Callable[[], Awaitable[PipelineResult]],
+        should_cache: Callable[[PipelineResult], bool]
+    ) -> PipelineResult:
+        """Snippet-only recommendations, with the full run upgrading the cache in the background.
+
+        The snippet result itself is not cached, so the next request gets
+        the full result once it is in (or joins the run still going).
+        """
+        logger.info(f"RECOMMENDATION PIPELINE (snippets): {seed_dna.title}", extra={'step': True})
+        deadline = Deadline.for_endpoint("recommend")
+        pool = await self._pool(seed, seed_dna, selected_pillars, dealbreakers, deadline)
+        # Started after the pool is kept, so the full run doesn't search again
+        if self.cache.refresh(self.cache_key(seed, selected_pillars, dealbreakers), compute, should_cache):
+            logger.info(f"Upgrading snippet recommendations in the background", extra={'step': True})
+        recommendations = await self._recommend_batch(
+            seed, seed_dna, pool, 0, selected_pillars, dealbreakers, deadline, snippet_only=True
+        )
+        logger.info(f"Snippet recommendation pipeline completed", extra={'response': True})
+        return PipelineResult(recommendations=recommendations, html=self.render(recommendations))
+
+    async def _find_candidates(
+        self,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None
+    ) -> CandidateList:
+        candidates = await self.candidates_finder.find_candidates(
+            seed_dna, selected_pillars, dealbreakers, deadline=deadline
+        )
+        if not candidates:
+            raise CandidateSearchFailedError("LLM failed to produce candidates")
+        if not candidates.candidates:
+            raise CandidateSearchFailedError("No candidates found. Try different pillar selections or fewer dealbreakers.")
+        return candidates
+
+    def _checkpoint(
+        self,
+        seed: str,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        offset: int
+    ) -> tuple[tuple, RunCheckpoint]:
+        """The checkpoint key and stage outputs kept for a batch, creating an empty checkpoint."""
+        key = (self.cache_key(seed, selected_pillars, dealbreakers), offset)
+        checkpoint = self.checkpoints.get(key)
+        if checkpoint is None:
+            checkpoint = RunCheckpoint()
+            self.checkpoints.set(key, checkpoint)
+        return key, checkpoint
+
+    async def _pool(
+        self,
+        seed: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None
+    ) -> CandidateList:
+        """The funnel-ordered candidate pool for a seed and selection, searched for if not kept."""
+        key = self.cache_key(seed, selected_pillars, dealbreakers)
+        pool = self.pools.get(key)
+        if pool is None:
+            candidates = await self._find_candidates(seed_dna, selected_pillars, dealbreakers, deadline)
+            pool = self.book_ranker.funnel_order(seed_dna, candidates, selected_pillars, dealbreakers)
+            self.pools.set(key, pool)
+        return pool
+
+    async def _recommend_batch(
+        self,
+        seed: str,
+        seed_dna: BookDNAResponse,
+        pool: CandidateList,
+        offset: int,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None,
+        snippet_only: bool = False
+    ) -> RecommendationResponse:
+        """Analyze, rank and write up the batch of the pool starting at ``offset``.
+
+        Ranks continue from ``offset``, and ``next_offset`` points at the
+        following batch (None once the pool is used up). Analyses and a
+        complete ranking are checkpointed as they finish and reused by a
+        retry; the checkpoint is dropped once the batch is written up.
+        With ``snippet_only`` the batch is ranked from search snippets
+        instead, and nothing is checkpointed.
+
+        Raises:
+            RecommendationFailedError: If no candidate could be ranked or written up
+        """
+        batch = pool.candidates[offset:offset + self.book_ranker.analysis_batch_size(deadline)]
+        checkpoint_key = None
+        if snippet_only:
+            ranking = self.book_ranker.rank_from_snippets(
+                seed_dna, CandidateList(candidates=batch), selected_pillars, dealbreakers
+            )
+        else:
+            checkpoint_key, checkpoint = self._checkpoint(seed, selected_pillars, dealbreakers, offset)
+            ranking = checkpoint.ranking
+            if ranking is not None:
+                logger.info(f"Resuming from checkpointed ranking of {len(ranking.candidates)} candidates", extra={'response': True})
+            else:
+                # Hold back time for the writer so ranking can't use up the whole budget
+                ranking_deadline = deadline.reserve(expected_seconds("writing", 20.0)) if deadline else None
+                ranking = await self.book_ranker.rank_candidates(
+                    seed_dna, CandidateList(candidates=batch), selected_pillars, dealbreakers,
+                    deadline=ranking_deadline, funnel=False, analyses=checkpoint.analyses
+                )
+                if ranking.candidates and not ranking.partial:
+                    checkpoint.ranking = ranking
+        if not ranking.candidates:
+            raise RecommendationFailedError("No candidates could be ranked. All analyses may have failed.")
+        ranking.candidates = [
+            candidate.model_copy(update={'rank': offset + i}) for i, candidate in enumerate(ranking.candidates, 1)
+        ]
+
+        recommendations = await self.recommendations_writer.write_recommendations(
+            seed_dna, ranking, selected_pillars, dealbreakers, deadline=deadline
+        )
+        if not recommendations.recommendations:
+            raise RecommendationFailedError("No recommendations could be written.")
+        if checkpoint_key is not None:
+            self.checkpoints.invalidate(checkpoint_key)
+
+        recommendations.snippet_only = snippet_only
+        next_offset = offset + len(batch)
+        recommendations.next_offset = next_offset if next_offset < len(pool.candidates) else None
+        return recommendations
+
+    async def run(
+        self,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        seed: str | None = None
+    ) -> PipelineResult:
+        """Run every stage without the cache.
+
+        ``seed`` is the seed key from ``seed_key``, derived from the DNA if not given.
+
+        Raises:
+            CandidateSearchFailedError: If no candidates were found
+            RecommendationFailedError: If no candidate could be ranked or written up
+        """
+        logger.info(f"RECOMMENDATION PIPELINE: {seed_dna.title}", extra={'step': True})
+
+        seed = seed or self.seed_key(seed_dna)
+        pool = await self._pool(seed, seed_dna, selected_pillars, dealbreakers, deadline)
+        recommendations = await self._recommend_batch(seed, seed_dna, pool, 0, selected_pillars, dealbreakers, deadline)
+
+        logger.info(f"Recommendation pipeline completed successfully", extra={'response': True})
+        return PipelineResult(recommendations=recommendations, html=self.render(recommendations))
+
+    async def more(
+        self,
+        book_id: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        offset: int,
+        deadline: Deadline | None = None,
+        mode: str | None = None
+    ) -> RecommendationResponse:
+        """Recommendations for the next batch of the candidate pool, starting at ``offset``.
+
+        The pool kept by an earlier run is reused (it is searched for again
+        only once it has expired), so only the batch itself is analyzed,
+        ranked and written; in snippet mode it is ranked from search
+        snippets instead. Past the end of the pool, no cards are returned.
+
+        Raises:
+            CandidateSearchFailedError: If the pool had to be searched for again and nothing was found
+            RecommendationFailedError: If no candidate of the batch could be ranked or written up
+        """
+        logger.info(f"RECOMMENDATION PIPELINE (more from {offset}): {seed_dna.title}", extra={'step': True})
+        seed = self.seed_key(seed_dna, book_id)
+        pool = await self._pool(seed, seed_dna, selected_pillars, dealbreakers, deadline)
+        if offset >= len(pool.candidates):
+            return RecommendationResponse(recommendations=[], total_analyzed=0, failed_analyses=0)
+        return await self._recommend_batch(
+            seed, seed_dna, pool, offset, selected_pillars, dealbreakers, deadline, snippet_only=self.use_snippets(mode)
+        )
+
+    async def stream(
+        self,
+        book_id: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        summary: RecommendationResponse | None = None,
+        mode: str | None = None
+    ) -> AsyncIterator[RecommendationCard]:
+        """Yield recommendation cards in rank order as soon as each is written.
+
+        Misses go through the result cache like ``recommend``'s, so
+        concurrent requests for the same key share one run: the request
+        that started it gets each card as soon as it is written, the others
+        get the cards once the run is complete, as for a cached result. In
+        snippet mode (asked for, or chosen under load) the cards of
+        ``recommend`` are sent instead. ``summary``, if given, is filled in
+        with the whole response once the last card is out, for callers that
+        render its notes and next offset.
+
+        Raises:
+            CandidateSearchFailedError: If no candidates were found
+            RecommendationFailedError: If no candidate could be analyzed
+        """
+        if self.use_snippets(mode):
+            result = await self.recommend(book_id, seed_dna, selected_pillars, dealbreakers, mode)
+            for card in result.recommendations.recommendations:
+                yield card
+            if summary is not None:
+                self._fill_summary(summary, result.recommendations)
+            return
+
+        seed = self.seed_key(seed_dna, book_id)
+        written: asyncio.Queue[RecommendationCard] = asyncio.Queue()
+        streamed = None  # This request's own run, if it is the one computing the result
+
+        async def compute() -> PipelineResult:
+            nonlocal streamed
+            # The run is shared between requests, so it gets its own deadline
+            deadline = Deadline.for_endpoint("recommend")
+            try:
+                streamed = await self._stream_run(
+                    seed, seed_dna, selected_pillars, dealbreakers, deadline, written.put_nowait
+                )
+                return streamed
+            except asyncio.CancelledError:
+                deadline.cancel()  # Stop provider calls still running in worker threads
+                raise
+
+        key = self.cache_key(seed, selected_pillars, dealbreakers)
+        run = asyncio.ensure_future(
+            self.cache.get_or_compute(key, compute, should_cache=lambda result: not result.recommendations.partial)
+        )
+        next_card = None
+        try:
+            while True:
+                next_card = asyncio.ensure_future(written.get())
+                await asyncio.wait([next_card, run], return_when=asyncio.FIRST_COMPLETED)
+                if not next_card.done():
+                    break
+                yield next_card.result()
+            result = await run  # Surface search and ranking failures
+        finally:
+            if next_card is not None:
+                next_card.cancel()
+            run.cancel()  # The cache keeps the run going while other requests wait for it
+
+        if result is streamed:
+            while not written.empty():
+                yield written.get_nowait()
+        else:
+            logger.info(f"Streaming cached recommendations for {seed_dna.title}", extra={'response': True})
+            for card in result.recommendations.recommendations:
+                yield card
+        if summary is not None:
+            self._fill_summary(summary, result.recommendations)
+
+    async def _stream_run(
+        self,
+        seed: str,
+        seed_dna: BookDNAResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline,
+        emit: Callable[[RecommendationCard], None]
+    ) -> PipelineResult:
+        """Run every stage for the first batch, passing each card to ``emit`` in rank order once written.
+
+        Candidate analyses feed the ranker's streaming mode, which ranks them
+        with the configured ranker; each card is written in parallel with
+        the rest as soon as its rank is settled. Analyses are checkpointed
+        as in ``run``.
+
+        Raises:
+            CandidateSearchFailedError: If no candidates were found
+            RecommendationFailedError: If no candidate could be analyzed
+        """
+        logger.info(f"RECOMMENDATION PIPELINE (streaming): {seed_dna.title}", extra={'step': True})
+        checkpoint_key, checkpoint = self._checkpoint(seed, selected_pillars, dealbreakers, 0)
+        ranking = RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+        pool = CandidateList(candidates=[])
+        card_tasks: asyncio.Queue[asyncio.Task | None] = asyncio.Queue()
+        started: list[asyncio.Task] = []
+        batch_size = 0
+
+        async def write(match) -> tuple[RecommendationCard, bool]:
+            card = await self.recommendations_writer.write_card(
+                seed_dna, match, selected_pillars, dealbreakers, deadline=deadline
+            )
+            if card is None:
+                return self.recommendations_writer.fallback_card(match), False
+            return card, True
+
+        async def produce() -> None:
+            nonlocal pool, batch_size
+            try:
+                pool = await self._pool(seed, seed_dna, selected_pillars, dealbreakers, deadline)
+                batch_size = self.book_ranker.analysis_batch_size(deadline)
+                batch = CandidateList(candidates=pool.candidates[:batch_size])
+                async for match in self.book_ranker.stream_matches(
+                    seed_dna, batch, selected_pillars, dealbreakers,
+                    deadline=deadline, ranking=ranking, funnel=False, analyses=checkpoint.analyses
+                ):
+                    task = asyncio.ensure_future(write(match))
+                    started.append(task)
+                    card_tasks.put_nowait(task)
+            finally:
+                card_tasks.put_nowait(None)
+
+        producer = asyncio.ensure_future(produce())
+        cards = []
+        all_written = True
+        try:
+            while (task := await card_tasks.get()) is not None:
+                card, written = await task
+                all_written = all_written and written
+                cards.append(card)
+                emit(card)
+            await producer  # Surface search failures
+        finally:
+            if not producer.done():
+                deadline.cancel()  # Stop provider calls still running in worker threads
+                producer.cancel()
+            for task in started:
+                task.cancel()
+
+        if not cards:
+            raise RecommendationFailedError("No candidates could be ranked. All analyses may have failed.")
+
+        recommendations = RecommendationResponse(
+            recommendations=cards,
+            total_analyzed=ranking.total_analyzed,
+            failed_analyses=ranking.failed_analyses,
+            partial=ranking.partial or not all_written,
+            next_offset=batch_size if batch_size < len(pool.candidates) else None
+        )
+        if not recommendations.partial:
+            self.checkpoints.invalidate(checkpoint_key)
+        logger.info(f"Streaming recommendation pipeline completed", extra={'response': True})
+        return PipelineResult(recommendations=recommendations, html=self.render(recommendations))
+
+    @staticmethod
+    def _fill_summary(summary: RecommendationResponse, recommendations: RecommendationResponse) -> None:
+        for field in RecommendationResponse.model_fields:
+            setattr(summary, field, getattr(recommendations, field))
@@ -2,6 +2,7 @@
 
 from .book_ranker import BookRanker
 from .candidates_finder import CandidatesFinder
+from .prefetch import CandidatePrefetcher
 from .models import RankedCandidate, RankingResponse, RankingOutput, CandidateBook, CandidateList
 
-__all__ = ["BookRanker", "CandidatesFinder", "RankedCandidate", "RankingResponse", "RankingOutput", "CandidateBook", "CandidateList"]
\ No newline at end of file
+__all__ = ["BookRanker", "CandidatesFinder", "CandidatePrefetcher", "RankedCandidate", "RankingResponse", "RankingOutput", "CandidateBook", "CandidateList"]
\ No newline at end of file
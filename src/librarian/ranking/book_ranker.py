@@ -1,18 +1,56 @@
+import asyncio
 import logging
+from contextlib import aclosing
 from pathlib import Path
+from typing import AsyncIterator
 from strands import Agent
 from strands.types.exceptions import StructuredOutputException
-from .models import RankingResponse, RankedCandidate, RankingOutput, CandidateList
+from .models import CandidateBook, CandidateList, RankingResponse, RankedCandidate, RankingOutput
+from .similarity import dealbreaker_hits, similarity_scores, snippet_scores
 from ..analysis.models import BookDNAResponse
 from ..analysis.book_analyzer import BookAnalyzer
-from ..shared.ai.gemini_client import create_gemini_model
-from ..shared.utils import build_pillar_descriptions
+from ..seed.books_api import BooksAPI
+from ..shared.ai.gemini_client import FAST_MODEL_ID, create_gemini_model
+from ..shared.ai.agent_pool import AgentPool
+from ..shared.ai.invocation import invoke_agent
+from ..shared.cache.ttl_cache import TTLCache
+from ..shared.config.settings import get_bool_setting, get_float_setting, get_int_setting, get_setting
+from ..shared.resilience.circuit_breaker import provider_available
+from ..shared.resilience.deadline import Deadline, expected_seconds
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.exceptions import DeadlineExceededError, ProviderUnavailableError
+from ..shared.models.book_metadata import BookMetadata
+from ..shared.utils import build_pillar_descriptions, format_dna_for_prompt, log_prompt_size, seed_key
+from ..shared.works import work_key, works
 
 logger = logging.getLogger("librarian")
 
+RANKING_MODES = ("llm", "fast")
+
+# What happens to candidates whose cached DNA lists one of the user's dealbreakers
+DEALBREAKER_FILTER_MODES = ("demote", "drop", "off")
+
+
+def _rescaled(scores: list[float]) -> list[float]:
+    """Scores rescaled to 0-100 against the best of them."""
+    best = max(scores, default=0.0)
+    return [100 * score / best if best > 0 else 0.0 for score in scores]
+
 
 class BookRanker:
     """Strands agent that ranks book candidates based on DNA analysis and user preferences."""
+
+    # Candidates that survive the first-stage funnel for full DNA analysis
+    DEFAULT_ANALYSIS_TOP_K = 3
+    SHORT_DEADLINE_TOP_K = 2
+
+    # Weight of the finder's own ordering in the first-stage score
+    FINDER_ORDER_WEIGHT = 0.5
+
+    # Streaming: the leading analyzed candidate is settled early once its
+    # similarity score is at least SETTLE_SCORE and ahead of the rest by SETTLE_MARGIN
+    SETTLE_SCORE = 40.0
+    SETTLE_MARGIN = 10.0
     
     def _load_system_prompt(self) -> str:
         """Load the system prompt from external file."""
@@ -24,7 +62,7 @@ class BookRanker:
         prompt_path = Path(__file__).parent / "prompts" / "book_ranker_task.md"
         return prompt_path.read_text(encoding='utf-8').strip()
     
-    def __init__(self, book_analyzer: BookAnalyzer | None = None):
+    def __init__(self, book_analyzer: BookAnalyzer | None = None, books_api: BooksAPI | None = None):
         self.system_prompt = self._load_system_prompt()
         self.task_prompt_template = self._load_task_prompt()
 
@@ -33,39 +71,702 @@ class BookRanker:
             temperature=0.3,  # Lower temperature for consistent ranking
             max_output_tokens=16384
         )
-        self.agent = Agent(
+        self.agent = self._create_agent()
+        self.agents = AgentPool(self._create_agent, seed=self.agent)
+        # Smaller model for requests short on time
+        self.fast_model = create_gemini_model(
+            model_id=FAST_MODEL_ID,
+            temperature=0.3,
+            max_output_tokens=16384
+        )
+        self.fast_agents = AgentPool(self._create_fast_agent)
+
+        # Use injected BookAnalyzer or create a new one
+        self.book_analyzer = book_analyzer or BookAnalyzer()
+        # Resolves candidates to Google Books volumes for ids and covers (skipped without one)
+        self.books_api = books_api
+        self.resolve_wait_seconds = get_float_setting("LIBRARIAN_RESOLVE_WAIT_SECONDS", 2.0)
+
+        # Scored matches (with candidate DNA) per seed, candidate and user selection
+        self.match_cache: TTLCache[RankedCandidate] = TTLCache(
+            "match scores",
+            ttl_seconds=get_float_setting("LIBRARIAN_MATCH_CACHE_TTL_SECONDS", 24 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_MATCH_CACHE_MAX_ENTRIES", 20000),
+        )
+
+        # "fast" ranks with local DNA similarity only; "llm" uses it as a pre-filter
+        self.ranking_mode = get_setting("LIBRARIAN_RANKING_MODE", "llm")
+        if self.ranking_mode not in RANKING_MODES:
+            logger.warning(f"Unknown ranking mode '{self.ranking_mode}' - using 'llm'")
+            self.ranking_mode = "llm"
+        self.analysis_top_k = get_int_setting("LIBRARIAN_ANALYSIS_TOP_K", self.DEFAULT_ANALYSIS_TOP_K)
+        # By default the locally weakest analyzed candidate is left out of the LLM ranking
+        self.prefilter_top_k = get_int_setting("LIBRARIAN_RANKING_PREFILTER_TOP_K", max(self.analysis_top_k - 1, 1))
+        # Analyze candidates for the selected pillars only, not the full six-pillar DNA
+        self.partial_analysis = get_bool_setting("LIBRARIAN_PARTIAL_CANDIDATE_ANALYSIS", True)
+        self.dealbreaker_filter = get_setting("LIBRARIAN_DEALBREAKER_FILTER", "demote")
+        if self.dealbreaker_filter not in DEALBREAKER_FILTER_MODES:
+            logger.warning(f"Unknown dealbreaker filter '{self.dealbreaker_filter}' - using 'demote'")
+            self.dealbreaker_filter = "demote"
+
+    def _create_agent(self) -> Agent:
+        """Create a ranking agent (the pool creates extras for concurrent calls)."""
+        return Agent(
             model=self.model,
             system_prompt=self.system_prompt,
             tools=[]  # No tools needed for ranking
         )
 
-        # Use injected BookAnalyzer or create a new one
-        self.book_analyzer = book_analyzer or BookAnalyzer()
+    def _create_fast_agent(self) -> Agent:
+        """Create a ranking agent on the smaller model for short deadlines."""
+        return Agent(model=self.fast_model, system_prompt=self.system_prompt, tools=[])
+
+    def _search_order_ranking(self, analyzed_candidates: list[dict], failed_count: int) -> RankingResponse:
+        """Partial ranking that keeps the finder's order when there is no time to rank."""
+        ranked_candidates = [
+            RankedCandidate(
+                title=item['candidate'].title,
+                author=item['candidate'].author,
+                rank=i,
+                confidence_score=0.0,  # Not scored
+                reasoning=item['candidate'].source_snippet,
+                dna=item['dna']
+            )
+            for i, item in enumerate(analyzed_candidates, 1)
+        ]
+        return RankingResponse(
+            candidates=ranked_candidates,
+            total_analyzed=sum(1 for item in analyzed_candidates if item['dna']),
+            failed_analyses=failed_count,
+            partial=True
+        )
     
-    async def rank_candidates(
+    def _similarity_ranking(
+        self,
+        seed_dna: BookDNAResponse,
+        analyzed_candidates: list[dict],
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        failed_count: int,
+        partial: bool
+    ) -> RankingResponse:
+        """Ranking by local DNA similarity, without an LLM call."""
+        scores = similarity_scores(
+            seed_dna, [item['dna'] for item in analyzed_candidates], selected_pillars, dealbreakers
+        )
+        scored = sorted(zip(scores, analyzed_candidates), key=lambda pair: pair[0], reverse=True)
+        ranked_candidates = [
+            RankedCandidate(
+                title=item['candidate'].title,
+                author=item['candidate'].author,
+                rank=i,
+                confidence_score=score,
+                reasoning=item['candidate'].source_snippet,
+                dna=item['dna']
+            )
+            for i, (score, item) in enumerate(scored, 1)
+        ]
+        return RankingResponse(
+            candidates=ranked_candidates,
+            total_analyzed=len(analyzed_candidates),
+            failed_analyses=failed_count,
+            partial=partial
+        )
+
+    def analysis_batch_size(self, deadline: Deadline | None = None) -> int:
+        """How many candidates get a full DNA analysis per run (fewer when time is short)."""
+        analysis_stage = "analysis_partial" if self.partial_analysis else "analysis"
+        short_on_time = deadline is not None and not deadline.can_afford(analysis_stage, 30.0)
+        return self.SHORT_DEADLINE_TOP_K if short_on_time else self.analysis_top_k
+
+    def _first_stage_scores(
+        self,
+        seed_dna: BookDNAResponse,
+        pool: list[CandidateBook],
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> list[float]:
+        """Cheap scores for a candidate pool, without any LLM call.
+
+        Candidates are scored by DNA similarity when their DNA is already
+        cached, otherwise by how well the search snippet matches the seed's
+        selected pillars, blended with the finder's own ordering. Snippet
+        scores run far lower than DNA scores, so each source is rescaled to
+        its best candidate before the two are mixed.
+        """
+        scope = selected_pillars if self.partial_analysis else None
+        cached = {i: self.book_analyzer.cached_dna(c.title, c.author, scope) for i, c in enumerate(pool)}
+        cached = {i: dna for i, dna in cached.items() if dna is not None}
+        uncached = [i for i in range(len(pool)) if i not in cached]
+
+        content_scores = [0.0] * len(pool)
+        snippets = snippet_scores(seed_dna, [pool[i].source_snippet for i in uncached], selected_pillars)
+        for i, score in zip(uncached, _rescaled(snippets)):
+            content_scores[i] = score
+        if cached:
+            logger.info(f"First-stage scores use cached DNA for {len(cached)} of {len(pool)} candidates", extra={'response': True})
+            dna_scores = similarity_scores(seed_dna, list(cached.values()), selected_pillars, dealbreakers)
+            for i, score in zip(cached, _rescaled(dna_scores)):
+                content_scores[i] = score
+
+        return [
+            self.FINDER_ORDER_WEIGHT * 100 * (1 - i / len(pool)) + (1 - self.FINDER_ORDER_WEIGHT) * content
+            for i, content in enumerate(content_scores)
+        ]
+
+    def funnel_order(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> CandidateList:
+        """The whole candidate pool, ordered best first by the first-stage score.
+
+        Consecutive batches of this order can be ranked with ``funnel=False``
+        to page through a pool without searching again.
+        """
+        pool = candidates.candidates
+        if not pool:
+            return candidates
+        return CandidateList(candidates=[candidate for candidate, _ in self._ordered_pool(seed_dna, pool, selected_pillars, dealbreakers)])
+
+    def screen_dealbreakers(self, pool: list[CandidateBook], dealbreakers: list[str]) -> tuple[list[int], list[int]]:
+        """Split a pool's indexes into candidates clear of the dealbreakers and those that hit one.
+
+        Only cached DNA is checked, so nothing is analyzed; a candidate not
+        analyzed yet counts as clear.
+        """
+        if self.dealbreaker_filter == "off" or not dealbreakers:
+            return list(range(len(pool))), []
+        clear, hit = [], []
+        for i, candidate in enumerate(pool):
+            # Every analysis lists dealbreakers, so a pillar-scoped one will do
+            dna = self.book_analyzer.cached_dna(candidate.title, candidate.author, [])
+            hits = dealbreaker_hits(dealbreakers, dna) if dna is not None else []
+            if hits:
+                logger.info(f"Dealbreaker filter: '{candidate.title}' lists {hits}", extra={'response': True})
+                hit.append(i)
+            else:
+                clear.append(i)
+        return clear, hit
+
+    def _ordered_pool(
+        self,
+        seed_dna: BookDNAResponse,
+        pool: list[CandidateBook],
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> list[tuple[CandidateBook, float]]:
+        """The pool best first by first-stage score, with its scores.
+
+        Candidates whose cached DNA hits a dealbreaker go to the back (or
+        are left out in "drop" mode, unless nothing else is left), so the
+        next candidates of the pool take their places in any batch. Other
+        editions of the seed, and of candidates ahead in the order, are
+        left out.
+        """
+        scores = self._first_stage_scores(seed_dna, pool, selected_pillars, dealbreakers)
+        clear, hit = self.screen_dealbreakers(pool, dealbreakers)
+        by_score = lambda indexes: sorted(indexes, key=lambda i: scores[i], reverse=True)
+        order = by_score(clear)
+        if self.dealbreaker_filter != "drop" or not order:
+            order += by_score(hit)
+        if hit:
+            logger.info(f"Dealbreaker filter moved {len(hit)} of {len(pool)} candidates out of the way", extra={'response': True})
+
+        seen = {works.book_key(seed_dna.book_id)}
+        ordered = []
+        for i in order:
+            key = self.candidate_key(pool[i].title, pool[i].author)
+            if key in seen:
+                logger.info(f"Skipping '{pool[i].title}': another edition is already in the pool", extra={'response': True})
+                continue
+            seen.add(key)
+            ordered.append((pool[i], scores[i]))
+        return ordered
+
+    def rank_from_snippets(
         self,
         seed_dna: BookDNAResponse,
         candidates: CandidateList,
         selected_pillars: list[str],
         dealbreakers: list[str]
     ) -> RankingResponse:
-        """Rank book candidates based on DNA analysis and user preferences."""
+        """Rank candidates without analyzing them or calling the LLM.
+
+        For snippet-only recommendations: candidates with a cached match
+        keep its score, the rest are ranked by the first-stage score. Cached
+        DNA is attached where there is some, and the finder's explanation
+        is the reasoning.
+        """
+        pool = candidates.candidates
+        if not pool:
+            return RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+        scores = self._first_stage_scores(seed_dna, pool, selected_pillars, dealbreakers)
+        scope = selected_pillars if self.partial_analysis else None
+        matches = []
+        for candidate, score in zip(pool, scores):
+            match = self.match_cache.get(self._match_key(seed_dna, candidate.title, candidate.author, selected_pillars, dealbreakers))
+            matches.append(match or RankedCandidate(
+                title=candidate.title,
+                author=candidate.author,
+                rank=0,
+                confidence_score=round(score, 1),
+                reasoning=candidate.source_snippet,
+                dna=self.book_analyzer.cached_dna(candidate.title, candidate.author, scope)
+            ))
+        matches.sort(key=lambda match: match.confidence_score, reverse=True)
+        logger.info(f"Ranked {len(matches)} candidates from search snippets", extra={'response': True})
+        return RankingResponse(
+            candidates=[match.model_copy(update={'rank': i}) for i, match in enumerate(matches, 1)],
+            total_analyzed=sum(1 for match in matches if match.dna is not None),
+            failed_analyses=0
+        )
+
+    def _funnel(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None
+    ) -> CandidateList:
+        """Narrow a wide candidate pool to the few worth a full DNA analysis.
+
+        A pool already small enough is still screened for dealbreakers, so
+        "drop" mode leaves hits out of it too.
+        """
+        keep = self.analysis_batch_size(deadline)
+        pool = candidates.candidates
+        if keep <= 0 or not pool:
+            return candidates
+
+        survivors = self._ordered_pool(seed_dna, pool, selected_pillars, dealbreakers)[:keep]
+        if len(pool) <= keep:
+            return CandidateList(candidates=[candidate for candidate, _ in survivors])
+        logger.info(f"Funnel kept {len(survivors)} of {len(pool)} candidates for DNA analysis", extra={'response': True})
+        for candidate, score in survivors:
+            logger.info(f"Funnel: '{candidate.title}' by {candidate.author} (score {score:.1f})", extra={'response': True})
+        return CandidateList(candidates=[candidate for candidate, _ in survivors])
+
+    def _prefilter(
+        self,
+        seed_dna: BookDNAResponse,
+        analyzed_candidates: list[dict],
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> list[dict]:
+        """Keep the locally most similar candidates for the LLM, in their original order."""
+        if self.prefilter_top_k <= 0 or len(analyzed_candidates) <= self.prefilter_top_k:
+            return analyzed_candidates
+        scores = similarity_scores(
+            seed_dna, [item['dna'] for item in analyzed_candidates], selected_pillars, dealbreakers
+        )
+        ranked = sorted(range(len(analyzed_candidates)), key=lambda i: scores[i], reverse=True)
+        keep = sorted(ranked[:self.prefilter_top_k])
+        logger.info(f"Pre-filter kept {len(keep)} of {len(analyzed_candidates)} candidates for LLM ranking", extra={'response': True})
+        return [analyzed_candidates[i] for i in keep]
+
+    @staticmethod
+    def _match_key(
+        seed_dna: BookDNAResponse,
+        title: str,
+        author: str,
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> tuple:
+        """Cache key for one seed/candidate match under a user selection (any editions of either)."""
+        return (
+            seed_key(seed_dna), BookRanker.candidate_key(title, author),
+            tuple(sorted(selected_pillars)), tuple(sorted(dealbreakers))
+        )
+
+    @staticmethod
+    def candidate_key(title: str, author: str) -> str:
+        """Work key for one candidate book, as used in match keys and analysis checkpoints."""
+        return work_key(title, author)
+
+    async def _analyze_candidate(
+        self,
+        candidate: CandidateBook,
+        selected_pillars: list[str],
+        deadline: Deadline | None,
+        analyses: dict[str, BookDNAResponse] | None
+    ) -> BookDNAResponse | None:
+        """A candidate's DNA, taken from ``analyses`` if it was checkpointed there, else analyzed and recorded.
+
+        Returns None if the analysis fails, including on an open breaker or
+        a passed deadline, so one candidate doesn't abort the batch.
+        """
+        key = self.candidate_key(candidate.title, candidate.author)
+        if analyses is not None and key in analyses:
+            logger.info(f"Resuming with checkpointed DNA for '{candidate.title}'", extra={'response': True})
+            return analyses[key]
+        try:
+            dna = await self.book_analyzer.analyze(
+                title=candidate.title,
+                author=candidate.author,
+                priority=Priority.BULK,
+                deadline=deadline,
+                pillars=selected_pillars if self.partial_analysis else None
+            )
+        except (ProviderUnavailableError, DeadlineExceededError) as e:
+            logger.warning(f"Analysis of candidate '{candidate.title}' stopped: {e.detail}")
+            return None
+        if dna is not None and analyses is not None:
+            analyses[key] = dna
+        return dna
+
+    def _start_resolving(self, candidates: CandidateList) -> asyncio.Task | None:
+        """Look up every candidate's Google Books volume in the background, alongside the analyses."""
+        if self.books_api is None or not candidates.candidates:
+            return None
+
+        async def resolve() -> dict[str, BookMetadata]:
+            pool = candidates.candidates
+            volumes = await self.books_api.resolve_many([(c.title, c.author) for c in pool])
+            return {self.candidate_key(c.title, c.author): v for c, v in zip(pool, volumes) if v is not None}
+
+        return asyncio.ensure_future(resolve())
+
+    async def _with_volumes(
+        self,
+        resolving: asyncio.Task | None,
+        matches: list[RankedCandidate],
+        deadline: Deadline | None
+    ) -> list[RankedCandidate]:
+        """Matches with the ids and covers of their resolved volumes.
+
+        Lookups still running get at most ``resolve_wait_seconds`` (within
+        the deadline) to finish; matches that can't be resolved in time are
+        returned as they are.
+        """
+        if resolving is None or not matches:
+            return matches
+        if not resolving.done():
+            timeout = min(self.resolve_wait_seconds, deadline.remaining()) if deadline else self.resolve_wait_seconds
+            await asyncio.wait([resolving], timeout=max(timeout, 0))
+        if not resolving.done() or resolving.cancelled() or resolving.exception() is not None:
+            logger.warning("Candidate volumes not resolved in time - cards will have no covers")
+            return matches
+        volumes = resolving.result()
+        return [self._attach_volume(match, volumes.get(self.candidate_key(match.title, match.author))) for match in matches]
+
+    @staticmethod
+    def _attach_volume(match: RankedCandidate, volume: BookMetadata | None) -> RankedCandidate:
+        if volume is None:
+            return match
+        update = {'book_id': volume.book_id, 'thumbnail': volume.thumbnail}
+        if match.dna is not None:
+            update['dna'] = match.dna.model_copy(update={'book_id': volume.book_id})
+        return match.model_copy(update=update)
+
+    def _merge_cached_matches(self, ranking: RankingResponse, cached: list[RankedCandidate]) -> RankingResponse:
+        """Combine cached and freshly scored matches, re-ranked by confidence score."""
+        merged = sorted(cached + ranking.candidates, key=lambda c: c.confidence_score, reverse=True)
+        return RankingResponse(
+            candidates=[candidate.model_copy(update={'rank': i}) for i, candidate in enumerate(merged, 1)],
+            total_analyzed=ranking.total_analyzed + len(cached),
+            failed_analyses=ranking.failed_analyses,
+            partial=ranking.partial
+        )
+
+    async def rank_candidates(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        mode: str | None = None,
+        funnel: bool = True,
+        analyses: dict[str, BookDNAResponse] | None = None
+    ) -> RankingResponse:
+        """Rank book candidates based on DNA analysis and user preferences.
+
+        A wide pool is first narrowed by a cheap first-stage score, unless
+        ``funnel`` is False (the candidates are already a batch of a
+        ``funnel_order`` pool). Candidates already scored against this seed
+        and selection are taken from the match cache; only the rest are
+        analyzed and ranked, and both are merged by confidence score.
+        ``mode`` ("llm" or "fast") overrides the configured ranking mode.
+
+        ``analyses`` is a checkpoint of candidate DNA keyed by
+        ``candidate_key``: candidates found in it are not analyzed again, and
+        every fresh analysis is recorded in it, so a caller retrying after a
+        failed ranking call only pays for the ranking.
+
+        While candidates are analyzed and ranked, they are resolved to
+        Google Books volumes, whose ids and covers are added to the matches.
+        """
+        mode = mode or self.ranking_mode
+        if funnel:
+            candidates = self._funnel(seed_dna, candidates, selected_pillars, dealbreakers, deadline)
+        resolving = self._start_resolving(candidates)
+        try:
+            ranking = await self._rank_with_cache(
+                seed_dna, candidates, selected_pillars, dealbreakers, deadline, mode, analyses
+            )
+            ranking.candidates = await self._with_volumes(resolving, ranking.candidates, deadline)
+            return ranking
+        finally:
+            if resolving is not None:
+                resolving.cancel()
+
+    async def _rank_with_cache(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None,
+        mode: str,
+        analyses: dict[str, BookDNAResponse] | None
+    ) -> RankingResponse:
+        """Rank candidates, taking the ones already scored from the match cache."""
+        cached = []
+        uncached = []
+        for candidate in candidates.candidates:
+            key = self._match_key(seed_dna, candidate.title, candidate.author, selected_pillars, dealbreakers)
+            match = self.match_cache.get(key)
+            if match is not None:
+                cached.append(match)
+            else:
+                uncached.append(candidate)
+
+        if not cached:
+            ranking = await self._rank_uncached(
+                seed_dna, candidates, selected_pillars, dealbreakers, deadline, mode, analyses
+            )
+        else:
+            logger.info(f"Reusing {len(cached)} cached match scores, ranking {len(uncached)} new candidates", extra={'response': True})
+            ranking = RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+            if uncached:
+                ranking = await self._rank_uncached(
+                    seed_dna, CandidateList(candidates=uncached), selected_pillars, dealbreakers, deadline, mode, analyses
+                )
+
+        return self._merge_cached_matches(ranking, cached) if cached else ranking
+
+    def _settled(self, scores: list[float], remaining: int) -> bool:
+        """Whether the best of the analyzed candidates can be emitted now.
+
+        A clear lead is rarely overtaken by the candidates still being analyzed.
+        """
+        if remaining == 0:
+            return True
+        ordered = sorted(scores, reverse=True)
+        runner_up = ordered[1] if len(ordered) > 1 else 0.0
+        return ordered[0] >= self.SETTLE_SCORE and ordered[0] - runner_up >= self.SETTLE_MARGIN
+
+    async def stream_matches(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        ranking: RankingResponse | None = None,
+        funnel: bool = True,
+        analyses: dict[str, BookDNAResponse] | None = None,
+        mode: str | None = None
+    ) -> AsyncIterator[RankedCandidate]:
+        """Yield ranked candidates in rank order, each as soon as its position is settled.
+
+        The candidates are analyzed concurrently. In "llm" mode the analyses
+        feed the LLM ranking as in ``rank_candidates`` (match cache and
+        pre-filter included), and every match is yielded once it returns.
+        In "fast" mode they feed a running local similarity ranking instead,
+        so a clear leader is yielded while the rest are still analyzed.
+        Time for writing the first card is held back from the deadline.
+
+        If ``ranking`` is given it is filled in with the yielded candidates
+        and the totals. ``funnel``, ``analyses`` and ``mode`` work as in
+        ``rank_candidates``, and yielded candidates carry their volume ids
+        and covers as there.
+        """
+        mode = mode or self.ranking_mode
+        ranking = ranking if ranking is not None else RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+        if funnel:
+            candidates = self._funnel(seed_dna, candidates, selected_pillars, dealbreakers, deadline)
+        logger.info(f"BOOK RANKER (streaming, {mode}): {len(candidates.candidates)} candidates", extra={'step': True})
+        deadline = deadline.reserve(expected_seconds("writing_card", 15.0)) if deadline else None
+        stream = self._stream_settled if mode == "fast" else self._stream_ranked
+        resolving = self._start_resolving(candidates)
+        try:
+            async with aclosing(stream(seed_dna, candidates, selected_pillars, dealbreakers, deadline, ranking, analyses)) as matches:
+                async for match in matches:
+                    match = (await self._with_volumes(resolving, [match], deadline))[0]
+                    ranking.candidates[match.rank - 1] = match
+                    yield match
+        finally:
+            if resolving is not None:
+                resolving.cancel()
+
+    async def _analyses_as_completed(
+        self,
+        candidates: list[CandidateBook],
+        selected_pillars: list[str],
+        deadline: Deadline | None,
+        analyses: dict[str, BookDNAResponse] | None
+    ) -> AsyncIterator[tuple[CandidateBook, BookDNAResponse | None]]:
+        """Analyze candidates concurrently, yielding each with its DNA (None if it failed) as it completes.
+
+        The Gemini limiter still caps how many analyses run at once.
+        """
+        tasks = [
+            asyncio.ensure_future(self._analyze_candidate(candidate, selected_pillars, deadline, analyses))
+            for candidate in candidates
+        ]
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for candidate, task in zip(candidates, tasks):
+                    if task in done:
+                        yield candidate, task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _record_failure(candidate: CandidateBook, deadline: Deadline | None, ranking: RankingResponse) -> None:
+        """Count a failed streamed analysis in ``ranking`` (partial if the deadline cut it short)."""
+        ranking.failed_analyses += 1
+        if deadline is not None and deadline.expired:
+            ranking.partial = True
+        logger.warning(f"✗ Candidate analysis failed: '{candidate.title}' - skipping", extra={'response': True})
+
+    async def _stream_settled(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None,
+        ranking: RankingResponse,
+        analyses: dict[str, BookDNAResponse] | None
+    ) -> AsyncIterator[RankedCandidate]:
+        """The analyses and running similarity ranking behind ``stream_matches`` in fast mode."""
+        waiting = []  # Analyzed but not yet emitted: {'candidate', 'dna'}
+        remaining = len(candidates.candidates)
+
+        async with aclosing(self._analyses_as_completed(candidates.candidates, selected_pillars, deadline, analyses)) as completed:
+            async for candidate, dna in completed:
+                remaining -= 1
+                if dna is None:
+                    self._record_failure(candidate, deadline, ranking)
+                else:
+                    ranking.total_analyzed += 1
+                    waiting.append({'candidate': candidate, 'dna': dna})
+
+                # Emit every leading candidate whose position is settled
+                while waiting:
+                    scores = similarity_scores(seed_dna, [item['dna'] for item in waiting], selected_pillars, dealbreakers)
+                    if not self._settled(scores, remaining):
+                        break
+                    best = max(range(len(waiting)), key=lambda i: scores[i])
+                    item = waiting.pop(best)
+                    match = RankedCandidate(
+                        title=item['candidate'].title,
+                        author=item['candidate'].author,
+                        rank=len(ranking.candidates) + 1,
+                        confidence_score=scores[best],
+                        reasoning=item['candidate'].source_snippet,
+                        dna=item['dna']
+                    )
+                    ranking.candidates.append(match)
+                    logger.info(f"Settled rank {match.rank}: '{match.title}' (Score: {match.confidence_score})", extra={'response': True})
+                    yield match
+
+    async def _stream_ranked(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None,
+        ranking: RankingResponse,
+        analyses: dict[str, BookDNAResponse] | None
+    ) -> AsyncIterator[RankedCandidate]:
+        """The analyses and LLM ranking behind ``stream_matches`` in llm mode.
+
+        Candidates with a cached match are not analyzed; the rest are
+        analyzed concurrently into ``analyses`` (a fresh checkpoint if none
+        was given), so the ranking call finds every DNA there.
+        """
+        analyses = analyses if analyses is not None else {}
+        uncached = [
+            candidate for candidate in candidates.candidates
+            if self.match_cache.get(self._match_key(seed_dna, candidate.title, candidate.author, selected_pillars, dealbreakers)) is None
+        ]
+        failed = set()
+        analysis_deadline = deadline.reserve(expected_seconds("ranking", 20.0)) if deadline else None
+        async with aclosing(self._analyses_as_completed(uncached, selected_pillars, analysis_deadline, analyses)) as completed:
+            async for candidate, dna in completed:
+                if dna is None:
+                    self._record_failure(candidate, analysis_deadline, ranking)
+                    failed.add(self.candidate_key(candidate.title, candidate.author))
+
+        # Failed candidates are left out so the ranking call doesn't analyze them again
+        survivors = [
+            candidate for candidate in candidates.candidates
+            if self.candidate_key(candidate.title, candidate.author) not in failed
+        ]
+        if not survivors:
+            if not provider_available("gemini"):
+                raise ProviderUnavailableError("gemini")
+            return
+        result = await self._rank_with_cache(
+            seed_dna, CandidateList(candidates=survivors), selected_pillars, dealbreakers, deadline, "llm", analyses
+        )
+        ranking.total_analyzed += result.total_analyzed
+        ranking.failed_analyses += result.failed_analyses
+        ranking.partial = ranking.partial or result.partial
+        for match in result.candidates:
+            match = match.model_copy(update={'rank': len(ranking.candidates) + 1})
+            ranking.candidates.append(match)
+            yield match
+
+    async def _rank_uncached(
+        self,
+        seed_dna: BookDNAResponse,
+        candidates: CandidateList,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        mode: str = "llm",
+        analyses: dict[str, BookDNAResponse] | None = None
+    ) -> RankingResponse:
+        """Analyze candidates and rank them with the LLM (or locally in fast mode).
+
+        With a deadline, time for the ranking call is held back from the
+        candidate analyses; candidates that no longer fit are skipped and the
+        result is marked partial. If the ranking call itself runs out of time,
+        the analyzed candidates are ranked by local similarity instead.
+        Only LLM scores are stored in the match cache.
+        """
         try:
             logger.info(f"BOOK RANKER: Ranking {len(candidates.candidates)} candidates", extra={'step': True})
 
             # Step 1: Analyze each candidate sequentially
             analyzed_candidates = []
             failed_count = 0
+            skipped_count = 0
             total_candidates = len(candidates.candidates)
+            analysis_deadline = deadline.reserve(expected_seconds("ranking", 20.0)) if deadline else None
 
             for i, candidate in enumerate(candidates.candidates, 1):
+                if analysis_deadline is not None and analysis_deadline.expired:
+                    skipped_count = total_candidates - i + 1
+                    logger.warning(f"Deadline reached - skipping {skipped_count} remaining candidate analyses")
+                    break
+
                 logger.info(f"Analyzing candidate {i}/{total_candidates}: '{candidate.title}' by {candidate.author}...", extra={'query': True})
 
                 # Analyze candidate using BookAnalyzer (async)
-                candidate_dna = await self.book_analyzer.analyze(
-                    title=candidate.title,
-                    author=candidate.author
-                )
+                candidate_dna = await self._analyze_candidate(candidate, selected_pillars, analysis_deadline, analyses)
 
                 if candidate_dna:
                     analyzed_candidates.append({
@@ -77,16 +778,33 @@ class BookRanker:
                     failed_count += 1
                     logger.warning(f"✗ Candidate {i}/{total_candidates} analysis failed: '{candidate.title}' - skipping", extra={'response': True})
 
+            if not analyzed_candidates and skipped_count:
+                # No time for any analysis: hand back the unanalyzed candidates in search order
+                return self._search_order_ranking(
+                    [{'candidate': c, 'dna': None} for c in candidates.candidates[-skipped_count:]],
+                    failed_count
+                )
+
             if not analyzed_candidates:
                 logger.error("All candidate analyses failed")
+                if not provider_available("gemini"):
+                    raise ProviderUnavailableError("gemini")
                 return RankingResponse(
                     candidates=[],
                     total_analyzed=0,
                     failed_analyses=failed_count
                 )
 
+            if mode == "fast":
+                logger.info(f"Ranking {len(analyzed_candidates)} analyzed candidates by local similarity...", extra={'query': True})
+                return self._similarity_ranking(
+                    seed_dna, analyzed_candidates, selected_pillars, dealbreakers, failed_count, skipped_count > 0
+                )
+
+            shortlisted = self._prefilter(seed_dna, analyzed_candidates, selected_pillars, dealbreakers)
+
             # Step 2: Rank candidates using LLM
-            logger.info(f"Ranking {len(analyzed_candidates)} analyzed candidates...", extra={'query': True})
+            logger.info(f"Ranking {len(shortlisted)} analyzed candidates...", extra={'query': True})
 
             # Build pillar descriptions for ranking
             pillar_descriptions = build_pillar_descriptions(seed_dna, selected_pillars)
@@ -95,23 +813,14 @@ class BookRanker:
             pillar_text = '\n'.join(f"- {desc}" for desc in pillar_descriptions)
             dealbreaker_text = ', '.join(dealbreakers) if dealbreakers else 'None'
 
-            # Build candidate DNA summaries for LLM
+            # Build candidate DNA summaries for LLM (full text only for the selected pillars)
             candidate_summaries = []
-            for i, item in enumerate(analyzed_candidates, 1):
+            dna_texts = []
+            for i, item in enumerate(shortlisted, 1):
                 candidate = item['candidate']
-                dna = item['dna']
-                summary = f"""
-Candidate {i}: "{candidate.title}" by {candidate.author}
-- Genre: {dna.genre}
-- Setting: {dna.setting.full_text}
-- Narrative Engine: {dna.narrative_engine.full_text}
-- Prose Texture: {dna.prose_texture.full_text}
-- Emotional Profile: {dna.emotional_profile.full_text}
-- Structural Quirks: {dna.structural_quirks.full_text}
-- Theme: {dna.theme.full_text}
-- Dealbreakers: {', '.join(dna.dealbreakers)}
-"""
-                candidate_summaries.append(summary.strip())
+                dna_text = format_dna_for_prompt(item['dna'], selected_pillars)
+                dna_texts.append(dna_text)
+                candidate_summaries.append(f'Candidate {i}: "{candidate.title}" by {candidate.author}\n{dna_text}')
 
             candidates_text = '\n\n'.join(candidate_summaries)
 
@@ -120,16 +829,22 @@ Candidate {i}: "{candidate.title}" by {candidate.author}
                 pillar_text=pillar_text,
                 dealbreaker_text=dealbreaker_text,
                 candidates_text=candidates_text,
-                num_candidates=len(analyzed_candidates)
+                num_candidates=len(shortlisted)
             )
 
             logger.info(f"Ranking prompt: {prompt}...", extra={'query': True})
+            log_prompt_size(
+                "Ranking", prompt, dna_texts,
+                [format_dna_for_prompt(item['dna'], selected_pillars, compact=False) for item in shortlisted]
+            )
 
-            # Execute ranking (async)
+            # Execute ranking (async), on the smaller model if time is short
+            short_on_time = deadline is not None and not deadline.can_afford("ranking", 20.0)
+            agents = self.fast_agents if short_on_time else self.agents
+            stage = "ranking_fast" if short_on_time else "ranking"
             try:
-                result = await self.agent.invoke_async(
-                    prompt,
-                    structured_output_model=RankingOutput
+                result = await invoke_agent(
+                    agents, prompt, RankingOutput, stage=stage, priority=Priority.STANDARD, deadline=deadline
                 )
 
                 llm_ranking = result.structured_output
@@ -138,15 +853,20 @@ Candidate {i}: "{candidate.title}" by {candidate.author}
             except StructuredOutputException as e:
                 logger.error(f"LLM failed to produce structured ranking output: {e}")
                 logger.error(f"Prompt length: {len(prompt)} chars")
-                logger.error(f"Number of candidates to rank: {len(analyzed_candidates)}")
+                logger.error(f"Number of candidates to rank: {len(shortlisted)}")
                 raise
+            except DeadlineExceededError:
+                logger.warning("Deadline reached before ranking completed - ranking by local similarity")
+                return self._similarity_ranking(
+                    seed_dna, analyzed_candidates, selected_pillars, dealbreakers, failed_count, partial=True
+                )
 
             # Convert LLM output to full RankedCandidate objects with DNA
             ranked_candidates = []
             for llm_candidate in llm_ranking.candidates:
                 # Find matching analyzed candidate to get DNA
                 candidate_dna = None
-                for item in analyzed_candidates:
+                for item in shortlisted:
                     if (item['candidate'].title == llm_candidate.title and
                         item['candidate'].author == llm_candidate.author):
                         candidate_dna = item['dna']
@@ -162,11 +882,16 @@ Candidate {i}: "{candidate.title}" by {candidate.author}
                 )
                 ranked_candidates.append(ranked_candidate)
 
+                if candidate_dna is not None:
+                    key = self._match_key(seed_dna, ranked_candidate.title, ranked_candidate.author, selected_pillars, dealbreakers)
+                    self.match_cache.set(key, ranked_candidate)
+
             # Create final response
             ranking = RankingResponse(
                 candidates=ranked_candidates,
                 total_analyzed=len(analyzed_candidates),
-                failed_analyses=failed_count
+                failed_analyses=failed_count,
+                partial=skipped_count > 0
             )
 
             logger.info(f"✓ Ranking completed - {len(ranking.candidates)} candidates ranked", extra={'response': True})
@@ -180,6 +905,8 @@ Candidate {i}: "{candidate.title}" by {candidate.author}
         except StructuredOutputException as e:
             logger.error(f"Structured output failed for ranking: {e}")
             return RankingResponse(candidates=[], total_analyzed=0, failed_analyses=len(candidates.candidates))
+        except (ProviderUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             logger.error(f"Ranking failed: {e}")
             return RankingResponse(candidates=[], total_analyzed=0, failed_analyses=len(candidates.candidates))
\ No newline at end of file
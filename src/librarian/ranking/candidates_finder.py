@@ -5,8 +5,16 @@ from strands.types.exceptions import StructuredOutputException
 from .models import CandidateList, CandidateBook
 from ..analysis.models import BookDNAResponse
 from .tavily_tool import search_book_candidates
-from ..shared.ai.gemini_client import create_gemini_model
+from ..shared.ai.gemini_client import FAST_MODEL_ID, create_gemini_model
+from ..shared.ai.agent_pool import AgentPool
+from ..shared.ai.invocation import invoke_agent
+from ..shared.config.settings import get_int_setting
+from ..shared.resilience.circuit_breaker import provider_available
+from ..shared.resilience.deadline import Deadline
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.exceptions import DeadlineExceededError, ProviderUnavailableError
 from ..shared.utils import build_pillar_descriptions
+from ..shared.works import work_key, works
 
 logger = logging.getLogger("librarian")
 
@@ -23,6 +31,13 @@ class CandidatesFinder:
         "narrative_engine": 2,
         "structural_quirks": 1   # Lowest priority
     }
+
+    # Candidate pool handed to the ranker's funnel (smaller when the deadline is short)
+    DEFAULT_POOL_SIZE = 20
+    SHORT_DEADLINE_POOL_SIZE = 5
+
+    # Extra searches, one per top selected pillar, for pools larger than the short-deadline one
+    MAX_PILLAR_QUERIES = 3
     
     def _load_system_prompt(self) -> str:
         """Load the system prompt from external file."""
@@ -33,29 +48,99 @@ class CandidatesFinder:
         """Load the task prompt template from external file."""
         prompt_path = Path(__file__).parent / "prompts" / "candidates_finder_task.md"
         return prompt_path.read_text(encoding='utf-8').strip()
+
+    def _load_offline_task_prompt(self) -> str:
+        """Load the knowledge-only task prompt used while Tavily is unavailable."""
+        prompt_path = Path(__file__).parent / "prompts" / "candidates_finder_offline_task.md"
+        return prompt_path.read_text(encoding='utf-8').strip()
     
     def __init__(self):
         self.system_prompt = self._load_system_prompt()
         self.task_prompt_template = self._load_task_prompt()
+        self.offline_task_prompt_template = self._load_offline_task_prompt()
         
         self.model = create_gemini_model(
             model_id="gemini-2.5-flash",
             temperature=0.4,  # Slightly higher for more diverse recommendations
             max_output_tokens=8192  # Increased from 3072 to handle longer structured output
         )
-        self.agent = Agent(
+        self.agent = self._create_agent()
+        self.agents = AgentPool(self._create_agent, seed=self.agent)
+        # Tool-less agents for picking candidates from the LLM's own knowledge
+        self.offline_agents = AgentPool(self._create_offline_agent)
+        # Smaller model without search, for requests short on time
+        self.fast_model = create_gemini_model(
+            model_id=FAST_MODEL_ID,
+            temperature=0.4,
+            max_output_tokens=8192
+        )
+        self.fast_agents = AgentPool(self._create_fast_agent)
+
+        self.pool_size = max(1, get_int_setting("LIBRARIAN_CANDIDATE_POOL_SIZE", self.DEFAULT_POOL_SIZE))
+
+    def _create_agent(self) -> Agent:
+        """Create a candidates agent (the pool creates extras for concurrent calls)."""
+        return Agent(
             model=self.model,
             system_prompt=self.system_prompt,
             tools=[search_book_candidates]
         )
+
+    def _create_offline_agent(self) -> Agent:
+        """Create a tool-less candidates agent for when Tavily is unavailable."""
+        return Agent(model=self.model, system_prompt=self.system_prompt, tools=[])
+
+    def _create_fast_agent(self) -> Agent:
+        """Create a tool-less agent on the smaller model for short deadlines."""
+        return Agent(model=self.fast_model, system_prompt=self.system_prompt, tools=[])
     
+    def _search_queries(self, seed_book_dna: BookDNAResponse, selected_pillars: list[str], pool_size: int) -> list[str]:
+        """Tavily queries for a pool: a broad one, plus one per top selected pillar for wide pools."""
+        queries = [f'books similar to "{seed_book_dna.title}" recommendations']
+        if pool_size <= self.SHORT_DEADLINE_POOL_SIZE:
+            return queries
+        by_priority = sorted(selected_pillars, key=lambda name: self.PILLAR_PRIORITY.get(name, 0), reverse=True)
+        for pillar_name in by_priority[:self.MAX_PILLAR_QUERIES]:
+            summary = getattr(seed_book_dna, pillar_name).summary.strip()
+            if summary:
+                queries.append(f'books like "{seed_book_dna.title}" {summary}')
+        return queries
+
+    def _distinct_works(self, seed_book_dna: BookDNAResponse, candidates: list[CandidateBook]) -> list[CandidateBook]:
+        """Candidates with editions of the seed, and repeat editions of a candidate, left out."""
+        seen = {works.book_key(seed_book_dna.book_id)}
+        if seed_book_dna.author:
+            seen.add(work_key(seed_book_dna.title, seed_book_dna.author))
+        distinct = []
+        for candidate in candidates:
+            key = work_key(candidate.title, candidate.author)
+            if key in seen:
+                logger.info(f"Dropping '{candidate.title}': an edition of the seed or of an earlier candidate", extra={'response': True})
+                continue
+            seen.add(key)
+            distinct.append(candidate)
+        return distinct
+
     async def find_candidates(
         self,
         seed_book_dna: BookDNAResponse,
         selected_pillars: list[str],
-        dealbreakers: list[str]
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        priority: Priority = Priority.STANDARD,
+        pool_size: int | None = None
     ) -> CandidateList | None:
-        """Find book candidates based on user-selected pillars and dealbreakers."""
+        """Find book candidates based on user-selected pillars and dealbreakers.
+
+        Returns a wide pool of candidates, best first; the ranker narrows it
+        down before analysis. When the deadline is short, the search step is
+        skipped and the smaller model picks a smaller pool. ``pool_size``
+        overrides the configured pool (speculative searches ask for less).
+
+        Raises:
+            ProviderUnavailableError: If the Gemini breaker is open
+            DeadlineExceededError: If the deadline passes mid-search
+        """
         try:
             # Major step logging
             logger.info(f"BOOK CANDIDATES FINDER: {seed_book_dna.title}", extra={'step': True})
@@ -67,52 +152,69 @@ class CandidatesFinder:
 
             logger.info(f"Pillar descriptions for filtering: {pillar_descriptions}", extra={'query': True})
 
-            # Create single broad search query
-            query = f'books similar to "{seed_book_dna.title}" recommendations'
-            logger.info(f"Tavily search query: {query}", extra={'query': True})
-
             # Create the prompt for LLM to filter results
             pillar_text = '\n'.join(f"- {desc}" for desc in pillar_descriptions)
             dealbreaker_text = ', '.join(dealbreakers) if dealbreakers else 'None'
 
-            prompt = self.task_prompt_template.format(
-                query=query,
+            # Skip Tavily entirely while its breaker is open rather than waiting out timeouts
+            use_search = provider_available("tavily")
+            short_on_time = deadline is not None and not deadline.can_afford("candidates", 25.0)
+            template = self.task_prompt_template if use_search else self.offline_task_prompt_template
+            agents = self.agents if use_search else self.offline_agents
+            stage = "candidates"
+            if short_on_time:
+                logger.warning(f"Deadline short ({deadline.remaining():.0f}s left) - fast candidate search")
+                template = self.offline_task_prompt_template
+                agents = self.fast_agents
+                stage = "candidates_fast"
+            elif not use_search:
+                logger.warning("Tavily unavailable - picking candidates from model knowledge only")
+
+            pool_size = pool_size or self.pool_size
+            if short_on_time:
+                pool_size = min(pool_size, self.SHORT_DEADLINE_POOL_SIZE)
+
+            # One broad search rarely names a wide pool's worth of books, so pillar searches widen it
+            queries = self._search_queries(seed_book_dna, selected_pillars, pool_size)
+            logger.info(f"Tavily search queries: {queries}", extra={'query': True})
+
+            prompt = template.format(
+                queries='\n'.join(f"- {query}" for query in queries),
                 pillar_text=pillar_text,
                 dealbreaker_text=dealbreaker_text,
-                seed_title=seed_book_dna.title
+                seed_title=seed_book_dna.title,
+                num_candidates=pool_size,
+                # Keep the whole list within the output budget as the pool grows
+                explanation_chars=max(200, 5000 // pool_size)
             )
 
             logger.info(f"LLM filtering prompt: {prompt}...", extra={'query': True})
 
             # Execute single LLM call with broad search + intelligent filtering
-            result = await self.agent.invoke_async(
-                prompt,
-                structured_output_model=CandidateList
+            result = await invoke_agent(
+                agents, prompt, CandidateList, stage=stage, priority=priority, deadline=deadline
             )
 
             # Log the results
             candidates = result.structured_output
             logger.info(f"LLM found {len(candidates.candidates)} candidates with ranking explanations", extra={'response': True})
 
-            # Log all 5 candidates with their ranking explanations
+            # Log all candidates with their ranking explanations
             for i, candidate in enumerate(candidates.candidates, 1):
                 logger.info(f"Rank {i}: '{candidate.title}' by {candidate.author}", extra={'response': True})
                 logger.info(f"  Ranking explanation: {candidate.source_snippet}", extra={'response': True})
 
-            # Select top 3 candidates for analysis
-            top_candidates = CandidateList(candidates=candidates.candidates[:3])
-            logger.info(f"Selected top 3 candidates for DNA analysis", extra={'response': True})
-
-            for i, candidate in enumerate(top_candidates.candidates, 1):
-                logger.info(f"Analyzing: Rank {i} - '{candidate.title}' by {candidate.author}", extra={'response': True})
+            # The LLM may repeat a book across searches or pick the seed itself
+            pool = CandidateList(candidates=self._distinct_works(seed_book_dna, candidates.candidates)[:pool_size])
 
-            # Return top 3 candidates for analysis
             logger.info(f"Candidates finding completed successfully", extra={'response': True})
-            return top_candidates
+            return pool
 
         except StructuredOutputException as e:
             logger.error(f"Structured output failed for candidates: {e}")
             return None
+        except (ProviderUnavailableError, DeadlineExceededError):
+            raise
         except Exception as e:
             logger.error(f"Candidates finding failed: {e}")
             return None
\ No newline at end of file
@@ -38,10 +38,13 @@ class RankedCandidate(BaseModel):
     confidence_score: float = Field(description="0-100 confidence in the match")
     reasoning: str = Field(description="Why this book matches the user's preferences")
     dna: BookDNAResponse | None = Field(description="DNA analysis (None if analysis failed)")
+    book_id: str | None = Field(default=None, description="Google Books volume id, if the book was resolved to one")
+    thumbnail: str | None = Field(default=None, description="Cover image URL, if the book was resolved to a volume")
 
 
 class RankingResponse(BaseModel):
     """Response containing ranked book recommendations."""
     candidates: list[RankedCandidate] = Field(description="Ranked candidate books")
     total_analyzed: int = Field(description="Number of candidates successfully analyzed")
-    failed_analyses: int = Field(description="Number of candidate analyses that failed")
\ No newline at end of file
+    failed_analyses: int = Field(description="Number of candidate analyses that failed")
+    partial: bool = Field(default=False, description="True if work was cut short to meet the request deadline")
\ No newline at end of file
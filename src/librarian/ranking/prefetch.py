@@ -0,0 +1,56 @@
+import logging
+
+from .candidates_finder import CandidatesFinder
+from ..analysis.models import PILLAR_NAMES, BookDNAResponse
+from ..analysis.prefetch import DNAPrefetcher
+from ..shared.config.settings import get_int_setting
+from ..shared.resilience.deadline import Deadline
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.resilience.speculation import Speculator, speculator
+from ..shared.utils import seed_key
+
+logger = logging.getLogger("librarian")
+
+
+class CandidatePrefetcher:
+    """Warms candidate search and analysis while the user is still picking pillars.
+
+    The Tavily query only depends on the seed, and full DNA analyses don't
+    depend on the pillar choice, so both can start once the seed is
+    analyzed. A small pillar-neutral pool is found (filling the search
+    cache the real search reuses) and its leading candidates are analyzed
+    into the DNA cache the ranker's funnel reads. Everything runs as capped,
+    cancellable speculative work.
+    """
+
+    def __init__(
+        self,
+        candidates_finder: CandidatesFinder,
+        dna_prefetcher: DNAPrefetcher,
+        speculation: Speculator = speculator
+    ):
+        self.candidates_finder = candidates_finder
+        self.dna_prefetcher = dna_prefetcher
+        self.speculation = speculation
+        # Spend caps: candidates asked for, and how many of them get a full analysis
+        self.pool_size = get_int_setting("LIBRARIAN_SPECULATIVE_CANDIDATES", 5)
+        self.analyses = get_int_setting("LIBRARIAN_SPECULATIVE_CANDIDATE_ANALYSES", 3)
+
+    def prefetch(self, seed_dna: BookDNAResponse, group: str) -> bool:
+        """Start the warm-up for a seed; returns whether it is running."""
+        if self.pool_size <= 0:
+            return False
+
+        async def warm(deadline: Deadline) -> None:
+            candidates = await self.candidates_finder.find_candidates(
+                seed_dna, list(PILLAR_NAMES), [],
+                deadline=deadline, priority=Priority.SPECULATIVE, pool_size=self.pool_size
+            )
+            if candidates:
+                pairs = [(candidate.title, candidate.author) for candidate in candidates.candidates]
+                self.dna_prefetcher.prefetch_candidates(pairs, group, self.analyses)
+
+        started = self.speculation.schedule(("candidates", seed_key(seed_dna)), group, warm)
+        if started:
+            logger.info(f"Prefetching candidates for '{seed_dna.title}'", extra={'query': True})
+        return started
@@ -0,0 +1,150 @@
+"""Local DNA similarity scoring, used as a fast ranking mode and LLM pre-filter.
+
+Pillar texts are compared with TF-IDF cosine similarity (IDF taken over the
+seed and the candidates being scored), weighted by pillar priority, with a
+penalty for each of the user's dealbreakers the candidate's DNA lists.
+"""
+
+import math
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+
+from .candidates_finder import CandidatesFinder
+from ..analysis.models import BookDNAResponse
+
+# Subtracted from the 0-1 similarity for every dealbreaker the candidate has
+DEALBREAKER_PENALTY = 0.3
+
+# Spelling similarity (0-1) at which two words, or two whole phrases, count as the same
+DEALBREAKER_FUZZY_RATIO = 0.85
+
+_TOKEN_RE = re.compile(r"[a-z][a-z'-]+")
+
+_STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have in into is it its of on or
+    that the their them then there these they this to was were which while
+    with within without who whose will would
+""".split())
+
+
+def _stem(token: str) -> str:
+    """Crude plural folding so "triangles" matches "triangle"."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, plural-folded content words of a text."""
+    return [_stem(token) for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _pillar_text(dna: BookDNAResponse, pillar_name: str) -> str:
+    pillar = getattr(dna, pillar_name)
+    if pillar_name == "setting":
+        return f"{pillar.time} {pillar.place} {pillar.vibe} {pillar.full_text} {pillar.summary}"
+    return f"{pillar.full_text} {pillar.summary}"
+
+
+def _tfidf_vectors(documents: list[list[str]]) -> list[dict[str, float]]:
+    """Smoothed TF-IDF vectors, L2-normalised so a dot product is the cosine."""
+    document_frequency = Counter(token for tokens in documents for token in set(tokens))
+    n = len(documents)
+    vectors = []
+    for tokens in documents:
+        counts = Counter(tokens)
+        vector = {
+            token: count * (math.log((1 + n) / (1 + document_frequency[token])) + 1)
+            for token, count in counts.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors.append({token: weight / norm for token, weight in vector.items()} if norm else {})
+    return vectors
+
+
+def _cosine(a: dict[str, float], b: dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(token, 0.0) for token, weight in a.items())
+
+
+def _root(word: str) -> str:
+    """Drop a verb ending so "dumping" matches "dump"."""
+    for suffix in ("ing", "ed"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _close(a: str, b: str) -> bool:
+    a, b = _root(a), _root(b)
+    return a == b or SequenceMatcher(None, a, b).ratio() >= DEALBREAKER_FUZZY_RATIO
+
+
+def _dealbreaker_matches(words: list[str], trope: list[str]) -> bool:
+    """Whether a dealbreaker and a trope, both tokenized, name the same thing.
+
+    Either every one of the dealbreaker's words has a close match among
+    the trope's, or the phrases are close once spacing and hyphens are
+    removed ("info-dumping" and "info dumps"). One shared word is not
+    enough: "Slow pacing" is not "Slow-burn romance".
+    """
+    words = [part for word in words for part in word.split("-") if part]
+    trope = [part for word in trope for part in word.split("-") if part]
+    if not words or not trope:
+        return False
+    if all(any(_close(word, other) for other in trope) for word in words):
+        return True
+    return _close("".join(words), "".join(trope))
+
+
+def dealbreaker_hits(dealbreakers: list[str], candidate_dna: BookDNAResponse) -> list[str]:
+    """The user's dealbreakers that match, allowing for spelling variants, one listed in the candidate's DNA."""
+    candidate_tropes = [tokenize(trope) for trope in candidate_dna.dealbreakers]
+    return [
+        dealbreaker for dealbreaker in dealbreakers
+        if any(_dealbreaker_matches(tokenize(dealbreaker), trope) for trope in candidate_tropes)
+    ]
+
+
+def similarity_scores(
+    seed_dna: BookDNAResponse,
+    candidate_dnas: list[BookDNAResponse],
+    selected_pillars: list[str],
+    dealbreakers: list[str]
+) -> list[float]:
+    """0-100 match score for each candidate, in the order given."""
+    if not candidate_dnas:
+        return []
+
+    weights = {pillar: CandidatesFinder.PILLAR_PRIORITY.get(pillar, 1) for pillar in selected_pillars}
+    total_weight = sum(weights.values())
+    weighted = [0.0] * len(candidate_dnas)
+
+    for pillar, weight in weights.items():
+        documents = [tokenize(_pillar_text(dna, pillar)) for dna in [seed_dna, *candidate_dnas]]
+        seed_vector, *candidate_vectors = _tfidf_vectors(documents)
+        for i, vector in enumerate(candidate_vectors):
+            weighted[i] += weight * _cosine(seed_vector, vector)
+
+    scores = []
+    for similarity, dna in zip(weighted, candidate_dnas):
+        similarity = similarity / total_weight if total_weight else 0.0
+        similarity -= DEALBREAKER_PENALTY * len(dealbreaker_hits(dealbreakers, dna))
+        scores.append(round(max(similarity, 0.0) * 100, 1))
+    return scores
+
+
+def snippet_scores(seed_dna: BookDNAResponse, snippets: list[str], selected_pillars: list[str]) -> list[float]:
+    """0-100 score for each search snippet against the seed's selected pillars.
+
+    A cheap first-stage signal for candidates that have no DNA yet; snippet
+    and pillar texts differ in length and style, so scores run lower than
+    ``similarity_scores``.
+    """
+    if not snippets:
+        return []
+    query = " ".join(_pillar_text(seed_dna, pillar) for pillar in selected_pillars)
+    query_vector, *snippet_vectors = _tfidf_vectors([tokenize(text) for text in [query, *snippets]])
+    return [round(_cosine(query_vector, vector) * 100, 1) for vector in snippet_vectors]
@@ -1,11 +1,40 @@
 import logging
+import threading
 from strands import tool
 from tavily import TavilyClient
 
+from ..shared.cache.ttl_cache import TTLCache
 from ..shared.config.api_keys import get_tavily_api_key
+from ..shared.config.settings import get_float_setting, get_int_setting
+from ..shared.resilience.provider_calls import call_provider
 
 logger = logging.getLogger("librarian")
 
+# Formatted results per query; the broad query only depends on the seed title,
+# so a speculative search made while the user picks pillars serves the real one.
+# The tool runs in worker threads, hence the lock around the cache.
+_results_cache: TTLCache[str] | None = None
+_cache_lock = threading.Lock()
+
+# Tavily returns at most 20 results per search
+TAVILY_MAX_RESULTS = 20
+
+
+def _max_results() -> int:
+    """Results per search, enough for the configured candidate pool within Tavily's cap."""
+    return min(TAVILY_MAX_RESULTS, max(10, get_int_setting("LIBRARIAN_CANDIDATE_POOL_SIZE", 20)))
+
+
+def _cache() -> TTLCache[str]:
+    global _results_cache
+    if _results_cache is None:
+        _results_cache = TTLCache(
+            "tavily searches",
+            ttl_seconds=get_float_setting("LIBRARIAN_SEARCH_CACHE_TTL_SECONDS", 3600),
+            max_entries=get_int_setting("LIBRARIAN_SEARCH_CACHE_MAX_ENTRIES", 500),
+        )
+    return _results_cache
+
 
 @tool
 def search_book_candidates(query: str) -> str:
@@ -20,6 +49,11 @@ def search_book_candidates(query: str) -> str:
     """
     try:
         logger.info(f"QUERY: Tavily search query: {query!r}", extra={'query': True})
+        with _cache_lock:
+            cached = _cache().get(query.strip().lower())
+        if cached is not None:
+            logger.info("RESPONSE: Using cached Tavily results", extra={'response': True})
+            return cached
         
         # Get API key from environment
         api_key = get_tavily_api_key()
@@ -29,13 +63,13 @@ def search_book_candidates(query: str) -> str:
         
         # Create Tavily client and execute search
         client = TavilyClient(api_key=api_key)
-        results = client.search(
+        results = call_provider("tavily", lambda: client.search(
             query=query,
             search_depth="advanced",
-            max_results=10,
+            max_results=_max_results(),
             include_answer=True,
             include_raw_content=False
-        )
+        ))
         
         logger.info(f"RESPONSE: Tavily found {len(results.get('results', []))} results", extra={'response': True})
         
@@ -65,7 +99,10 @@ Content: {result.get('content', 'No content')}
 """
             formatted_results.append(formatted_result.strip())
         
-        return '\n\n'.join(formatted_results)
+        formatted = '\n\n'.join(formatted_results)
+        with _cache_lock:
+            _cache().set(query.strip().lower(), formatted)
+        return formatted
         
     except Exception as e:
         logger.error(f"Tavily search failed for query '{query}': {e}")
@@ -1,10 +1,15 @@
+import asyncio
 import logging
 import httpx
 from langdetect import detect, LangDetectException
 from .query_parser import QueryParser
 from .models import ParsedBookQuery
 from ..shared.models.book_metadata import BookMetadata
+from ..shared.cache.ttl_cache import TTLCache
 from ..shared.config.api_keys import get_google_books_api_key
+from ..shared.config.settings import get_float_setting, get_int_setting
+from ..shared.resilience.circuit_breaker import provider_available
+from ..shared.works import normalize_author, normalize_isbn, work_key, works
 
 logger = logging.getLogger("librarian")
 
@@ -18,6 +23,12 @@ class BooksAPI:
         self.api_key = get_google_books_api_key()
         self.client = httpx.AsyncClient(timeout=10.0)
         self.query_parser = QueryParser() if use_llm_parser else None
+        # Volumes found for candidate books, per work
+        self.resolved: TTLCache[BookMetadata] = TTLCache(
+            "resolved volumes",
+            ttl_seconds=get_float_setting("LIBRARIAN_RESOLVE_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_RESOLVE_CACHE_MAX_ENTRIES", 5000),
+        )
     
     async def search(self, query: str, max_results: int = 10) -> list[BookMetadata]:
         """Search for books by query string.
@@ -30,7 +41,9 @@ class BooksAPI:
         
         # Try LLM parsing first
         search_query = query
-        if self.query_parser:
+        if self.query_parser and not provider_available("gemini"):
+            logger.warning("Gemini unavailable - skipping LLM parser, using raw query")
+        elif self.query_parser:
             try:
                 parsed = await self.query_parser.parse(query)
                 logger.info(f"LLM parsed - title: {parsed.title!r}, author: {parsed.author!r}", extra={'response': True})
@@ -61,8 +74,8 @@ class BooksAPI:
         for item in data.get("items", []):
             book = self._parse_book(item)
             if book:  # None means filtered out
-                # Dedupe by title + author (case-insensitive)
-                book_key = (book.title.lower(), book.author.lower())
+                # Dedupe editions of the same work
+                book_key = works.register(book)
                 if book_key not in seen_books:
                     seen_books.add(book_key)
                     books.append(book)
@@ -99,14 +112,53 @@ class BooksAPI:
         else:
             return None  # Filter out books without descriptions
             
+        isbns = [
+            isbn for identifier in info.get("industryIdentifiers", [])
+            if identifier.get("type") in ("ISBN_10", "ISBN_13")
+            and (isbn := normalize_isbn(identifier.get("identifier", ""))) is not None
+        ]
         return BookMetadata(
             book_id=item["id"],
             title=info.get("title", "Unknown"),
             author=", ".join(info.get("authors", ["Unknown"])),
             blurb=blurb,
             thumbnail=thumbnail,
+            isbns=list(dict.fromkeys(isbns)),
         )
     
+    async def resolve(self, title: str, author: str) -> BookMetadata | None:
+        """The Google Books volume for a book known by title and author, cached per work.
+
+        Prefers a volume of the same work, else one by the same author.
+        Returns None if nothing matches or the lookup fails, so callers can
+        carry on without a cover.
+        """
+        key = work_key(title, author)
+
+        async def lookup() -> BookMetadata | None:
+            params = {"q": f'intitle:"{title}" inauthor:"{author}"', "maxResults": 5, "langRestrict": "en"}
+            if self.api_key:
+                params["key"] = self.api_key
+            response = await self.client.get(self.BASE_URL, params=params)
+            response.raise_for_status()
+            books = [book for item in response.json().get("items", []) if (book := self._parse_book(item))]
+            same_author = [book for book in books if normalize_author(book.author) == normalize_author(author)]
+            match = next((book for book in same_author if work_key(book.title, book.author) == key), None)
+            match = match or next(iter(same_author), None)
+            if match is not None:
+                works.register(match)
+            return match
+
+        try:
+            return await self.resolved.get_or_compute(key, lookup, should_cache=lambda book: book is not None)
+        except Exception as e:
+            logger.warning(f"Resolving '{title}' by {author} failed: {e}")
+            return None
+
+    async def resolve_many(self, books: list[tuple[str, str]]) -> list[BookMetadata | None]:
+        """Resolve (title, author) pairs in one concurrent batch, in order."""
+        return list(await asyncio.gather(*(self.resolve(title, author) for title, author in books)))
+
     async def get_book(self, book_id: str) -> BookMetadata | None:
         """Get a specific book by ID."""
         url = f"{self.BASE_URL}/{book_id}"
@@ -117,7 +169,10 @@ class BooksAPI:
             return None
         response.raise_for_status()
         
-        return self._parse_book(response.json())
+        book = self._parse_book(response.json())
+        if book:
+            works.register(book)
+        return book
     
     async def close(self):
         await self.client.aclose()
\ No newline at end of file
@@ -4,6 +4,9 @@ from strands import Agent
 from strands.types.exceptions import StructuredOutputException
 from .models import ParsedBookQuery
 from ..shared.ai.gemini_client import create_gemini_model
+from ..shared.ai.agent_pool import AgentPool
+from ..shared.ai.invocation import invoke_agent
+from ..shared.resilience.rate_limiter import Priority
 
 logger = logging.getLogger("librarian")
 
@@ -24,16 +27,24 @@ class QueryParser:
             temperature=0.1,
             max_output_tokens=1024
         )
-        self.agent = Agent(model=self.model, system_prompt=self.system_prompt)
+        self.agent = self._create_agent()
+        self.agents = AgentPool(self._create_agent, seed=self.agent)
+
+    def _create_agent(self) -> Agent:
+        """Create a parser agent (the pool creates extras for concurrent calls)."""
+        return Agent(model=self.model, system_prompt=self.system_prompt)
     
     async def parse(self, query: str) -> ParsedBookQuery:
         """Parse a user's search query into structured fields."""
         try:
             logger.info(f"Gemini query parser prompt: Parse this book search query: {query}", extra={'query': True})
 
-            result = await self.agent.invoke_async(
+            result = await invoke_agent(
+                self.agents,
                 f"Parse this book search query: {query}",
-                structured_output_model=ParsedBookQuery
+                ParsedBookQuery,
+                stage="query_parser",
+                priority=Priority.INTERACTIVE  # Short call with a user waiting on it
             )
 
             parsed = result.structured_output
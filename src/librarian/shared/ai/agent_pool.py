@@ -0,0 +1,30 @@
+"""Pool of interchangeable Strands agents for concurrent invocations."""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from strands import Agent
+
+
+class AgentPool:
+    """Hands out idle agents, creating new ones when every pooled agent is busy.
+
+    A Strands agent supports one invocation at a time and keeps its conversation
+    history, so hedged or concurrent calls each need their own instance. Agents
+    go back to the pool with their history cleared so every call starts fresh.
+    """
+
+    def __init__(self, factory: Callable[[], Agent], seed: Agent | None = None, max_idle: int = 4):
+        self._factory = factory
+        self._idle: list[Agent] = [seed] if seed is not None else []
+        self._max_idle = max_idle
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Agent]:
+        agent = self._idle.pop() if self._idle else self._factory()
+        try:
+            yield agent
+        finally:
+            agent.messages.clear()
+            if len(self._idle) < self._max_idle:
+                self._idle.append(agent)
@@ -1,6 +1,9 @@
 from strands.models.gemini import GeminiModel
 from ..config.api_keys import get_gemini_api_key
 
+# Smaller, faster model stages switch to when a request's deadline is short
+FAST_MODEL_ID = "gemini-2.5-flash-lite"
+
 
 def create_gemini_model(model_id: str = "gemini-2.5-flash", temperature: float = 0.3, max_output_tokens: int = 2048) -> GeminiModel:
     """Create a configured Gemini model instance."""
@@ -0,0 +1,228 @@
+"""Single entry point for structured-output and streamed agent calls."""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from pydantic import BaseModel
+from strands import Agent
+from strands.types.exceptions import MaxTokensReachedException, StructuredOutputException
+
+from .agent_pool import AgentPool
+from .json_repair import coerce_to_model, missing_fields_model, parse_lenient
+from ..config.settings import get_bool_setting
+from ..resilience.circuit_breaker import get_breaker, provider_available
+from ..resilience.deadline import Deadline, deadline_scope
+from ..resilience.hedging import hedged
+from ..resilience.latency import latency_tracker
+from ..resilience.rate_limiter import Priority, current_priority, get_limiter, priority_scope
+from ..exceptions import DeadlineExceededError, ProviderUnavailableError
+
+logger = logging.getLogger("librarian")
+
+T = TypeVar("T", bound=BaseModel)
+
+# Follow-up asking for only the fields a truncated answer is missing
+_MISSING_FIELDS_PROMPT = """{prompt}
+
+Your previous answer was cut off. These fields are already complete:
+{completed}
+
+Provide only the remaining fields: {missing}."""
+
+
+class RepairedResult:
+    """Stands in for an AgentResult whose structured output was repaired locally."""
+
+    def __init__(self, structured_output: BaseModel):
+        self.structured_output = structured_output
+
+
+class _OutputCapture:
+    """Callback handler keeping the raw text of a structured-output call as it streams.
+
+    Strands drops a tool input it can't parse, so the streamed text is the
+    only copy of a truncated answer. Events are passed on to the agent's
+    own handler.
+    """
+
+    def __init__(self, tool_name: str, handler: Callable[..., Any]):
+        self.tool_name = tool_name
+        self.handler = handler
+        self.text = ""
+        self.tool_input = ""
+        self._tool_use_id = None
+
+    def __call__(self, **event: Any) -> None:
+        if data := event.get("data"):
+            self.text += data
+        tool_use = event.get("current_tool_use") or {}
+        delta = (event.get("delta") or {}).get("toolUse")
+        if delta and tool_use.get("name") == self.tool_name:
+            if tool_use.get("toolUseId") != self._tool_use_id:  # A retry starts a fresh answer
+                self._tool_use_id = tool_use.get("toolUseId")
+                self.tool_input = ""
+            self.tool_input += delta.get("input", "")
+        self.handler(**event)
+
+    @property
+    def raw_output(self) -> str:
+        return self.tool_input or self.text
+
+
+async def _repair(agent: Agent, prompt: str, output_model: type[T], raw_output: str) -> T | None:
+    """Recover structured output from a truncated or malformed answer.
+
+    The answer is closed and coerced locally; if required fields are still
+    missing, the model is asked for just those fields rather than the
+    whole output again.
+    """
+    data = parse_lenient(raw_output)
+    if data is None:
+        return None
+    repaired, missing = coerce_to_model(data, output_model)
+    if repaired is not None or not missing:
+        return repaired
+
+    logger.warning(f"Asking for {len(missing)} missing field(s) of {output_model.__name__}: {', '.join(missing)}")
+    completed = {name: value for name, value in data.items() if name in output_model.model_fields and name not in missing}
+    agent.messages.clear()  # The failed turn may end in a tool call without a result
+    result = await agent.invoke_async(
+        _MISSING_FIELDS_PROMPT.format(prompt=prompt, completed=json.dumps(completed), missing=", ".join(missing)),
+        structured_output_model=missing_fields_model(output_model, missing)
+    )
+    repaired, _ = coerce_to_model({**completed, **result.structured_output.model_dump()}, output_model)
+    return repaired
+
+
+async def _invoke_with_repair(agent: Agent, prompt: str, output_model: type[T]) -> Any:
+    """Invoke an agent for structured output, repairing an answer that fails validation.
+
+    Raises:
+        StructuredOutputException: If the answer can't be repaired either
+        MaxTokensReachedException: If a truncated answer can't be repaired
+    """
+    if not get_bool_setting("LIBRARIAN_STRUCTURED_OUTPUT_REPAIR", True):
+        return await agent.invoke_async(prompt, structured_output_model=output_model)
+
+    capture = _OutputCapture(output_model.__name__, agent.callback_handler)
+    agent.callback_handler = capture
+    try:
+        return await agent.invoke_async(prompt, structured_output_model=output_model)
+    except (StructuredOutputException, MaxTokensReachedException) as e:
+        try:
+            repaired = await _repair(agent, prompt, output_model, capture.raw_output)
+        except (StructuredOutputException, MaxTokensReachedException):
+            repaired = None
+        if repaired is None:
+            raise e
+        logger.warning(f"Repaired {output_model.__name__} output locally after: {e}")
+        return RepairedResult(repaired)
+    finally:
+        agent.callback_handler = capture.handler
+
+
+async def invoke_agent(
+    pool: AgentPool,
+    prompt: str,
+    output_model: type[T],
+    stage: str,
+    priority: Priority | None = None,
+    deadline: Deadline | None = None
+) -> Any:
+    """Invoke a pooled agent for structured output.
+
+    Every attempt is admitted through the Gemini limiter at the given priority
+    (tools called by the agent inherit it and the deadline), guarded by the
+    Gemini circuit breaker, and hedged if enabled for the stage. With a
+    deadline, the call is abandoned once the remaining time runs out. An
+    answer that is truncated or fails validation is repaired locally
+    before giving up (the result is then a ``RepairedResult``).
+
+    Raises:
+        ProviderUnavailableError: If the Gemini breaker is open
+        DeadlineExceededError: If the deadline passes before the call completes
+    """
+    priority = current_priority() if priority is None else priority
+    if not provider_available("gemini"):
+        raise ProviderUnavailableError("gemini")  # Fail fast instead of queueing
+
+    async def attempt():
+        with priority_scope(priority), deadline_scope(deadline):
+            with get_breaker("gemini").guard():
+                async with pool.acquire() as agent:
+                    return await _invoke_with_repair(agent, prompt, output_model)
+
+    # Each attempt holds a limiter slot; its latency is timed from admission
+    admit = lambda: get_limiter("gemini").slot(priority)
+    with priority_scope(priority):  # Hedging is decided by priority too
+        if deadline is None:
+            return await hedged(stage, attempt, admit)
+
+        deadline.check(stage)
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                return await hedged(stage, attempt, admit)
+        except TimeoutError:
+            raise DeadlineExceededError(stage) from None
+
+
+async def stream_agent(
+    pool: AgentPool,
+    prompt: str,
+    stage: str,
+    priority: Priority | None = None,
+    deadline: Deadline | None = None,
+    structured_output_model: type[BaseModel] | None = None
+) -> AsyncIterator[dict]:
+    """Invoke a pooled agent, yielding its stream events as they are generated.
+
+    Admitted and guarded like ``invoke_agent``, but never hedged: a stream
+    that is already being consumed can't be swapped for a duplicate. The
+    deadline is checked as each event arrives. With a structured output
+    model, the last event's ``"result"`` carries the validated output.
+
+    Raises:
+        ProviderUnavailableError: If the Gemini breaker is open
+        DeadlineExceededError: If the deadline passes before the stream completes
+    """
+    priority = current_priority() if priority is None else priority
+    if not provider_available("gemini"):
+        raise ProviderUnavailableError("gemini")
+    if deadline is not None:
+        deadline.check(stage)
+
+    kwargs = {"structured_output_model": structured_output_model} if structured_output_model else {}
+    with priority_scope(priority), deadline_scope(deadline):
+        async with get_limiter("gemini").slot(priority):
+            start = time.monotonic()  # Timed from admission, like hedged calls
+            with get_breaker("gemini").guard():
+                async with pool.acquire() as agent:
+                    async for event in agent.stream_async(prompt, **kwargs):
+                        if deadline is not None:
+                            deadline.check(stage)
+                        if isinstance(event, dict):
+                            yield event
+    latency_tracker.record(stage, time.monotonic() - start)
+
+
+async def stream_agent_text(
+    pool: AgentPool,
+    prompt: str,
+    stage: str,
+    priority: Priority | None = None,
+    deadline: Deadline | None = None
+) -> AsyncIterator[str]:
+    """Invoke a pooled agent for plain text, yielding text chunks as they are generated.
+
+    Raises:
+        ProviderUnavailableError: If the Gemini breaker is open
+        DeadlineExceededError: If the deadline passes before the stream completes
+    """
+    async with aclosing(stream_agent(pool, prompt, stage, priority, deadline)) as events:
+        async for event in events:
+            if text := event.get("data"):
+                yield text
@@ -0,0 +1,165 @@
+"""Local repair of truncated or slightly malformed structured output."""
+
+import json
+import re
+from typing import Any, TypeVar, get_args
+
+from pydantic import BaseModel, ValidationError, create_model
+
+T = TypeVar("T", bound=BaseModel)
+
+# Attempts at fixing validation errors before giving up on a field
+_MAX_FIX_ROUNDS = 20
+
+
+def close_truncated_json(text: str) -> str | None:
+    """Turn the text of a JSON object, possibly cut off mid-way, into parseable JSON.
+
+    Anything before the first ``{`` (such as a code fence) is skipped. A
+    complete object is returned as is. Otherwise an open string is closed
+    along with every open bracket; if that doesn't parse, the text is cut
+    back to the last comma that ended a complete value. Returns None if no
+    object can be recovered.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+
+    closers: list[str] = []
+    cuts: list[tuple[int, str]] = []  # (comma position, closers needed there)
+    in_string = escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                return text[:i + 1]
+        elif char == ",":
+            cuts.append((i, "".join(reversed(closers))))
+
+    attempts = [text.rstrip().rstrip(",") + ('"' if in_string else "") + "".join(reversed(closers))]
+    attempts += [text[:i] + closing for i, closing in reversed(cuts)]
+    for attempt in attempts:
+        try:
+            json.loads(attempt)
+        except ValueError:
+            continue
+        return attempt
+    return None
+
+
+def parse_lenient(text: str) -> dict[str, Any] | None:
+    """The JSON object in ``text``, recovering it if it was truncated."""
+    closed = close_truncated_json(text)
+    if closed is None:
+        return None
+    parsed = json.loads(closed)
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _accepts_none(annotation: Any) -> bool:
+    return type(None) in get_args(annotation)
+
+
+def _coerce_value(value: Any, error_type: str) -> tuple[bool, Any]:
+    """A fixed value for one validation error, if the fix is obvious."""
+    if error_type == "list_type" and isinstance(value, str):
+        return True, [value]
+    if error_type == "string_type" and isinstance(value, list):
+        return True, ", ".join(str(item) for item in value)
+    if error_type == "string_type" and isinstance(value, (int, float, bool)):
+        return True, str(value)
+    if error_type in ("float_parsing", "int_parsing") and isinstance(value, str):
+        number = re.search(r"-?\d+(\.\d+)?", value)
+        if number:
+            return True, float(number.group()) if error_type == "float_parsing" else int(float(number.group()))
+    return False, value
+
+
+def _fix_error(data: dict[str, Any], error: dict, model: type[BaseModel], missing: set[str]) -> None:
+    """Fix one validation error in place: coerce the value, or drop what can't be saved.
+
+    An unsalvageable value inside a list item drops that item (typically
+    the last one, cut off by truncation); anywhere else it drops the
+    top-level field, which is then reported as missing.
+    """
+    loc = error["loc"]
+    top = loc[0] if loc else None
+    if top not in model.model_fields:
+        return
+    if len(loc) == 1 and error["type"] == "missing":
+        if _accepts_none(model.model_fields[top].annotation):
+            data[top] = None
+        else:
+            missing.add(top)
+        return
+
+    # Walk to the value, remembering the innermost list item on the way
+    parents = []
+    node: Any = data
+    for part in loc[:-1]:
+        try:
+            parents.append((node, part))
+            node = node[part]
+        except (KeyError, IndexError, TypeError):
+            return
+    leaf = loc[-1]
+    if error["type"] != "missing":
+        try:
+            fixed, value = _coerce_value(node[leaf], error["type"])
+        except (KeyError, IndexError, TypeError):
+            fixed = False
+        if fixed:
+            node[leaf] = value
+            return
+
+    for container, part in reversed(parents + [(node, leaf)]):
+        if isinstance(container, list) and isinstance(part, int) and part < len(container):
+            del container[part]
+            return
+    data.pop(top, None)
+    missing.add(top)
+
+
+def coerce_to_model(data: dict[str, Any], model: type[T]) -> tuple[T | None, list[str]]:
+    """Validate ``data`` against ``model`` after obvious local fixes.
+
+    Types are coerced where the intent is clear, nullable fields that are
+    missing are set to None (optional fields get their defaults from the
+    model), and broken list items are dropped. Returns the model, or None
+    and the required top-level fields that are still missing.
+    """
+    data = dict(data)
+    missing: set[str] = set()
+    for _ in range(_MAX_FIX_ROUNDS):
+        try:
+            return model.model_validate(data), []
+        except ValidationError as e:
+            errors = e.errors()
+        before = json.dumps(data, sort_keys=True, default=str), len(missing)
+        # Later errors first, so list indexes of earlier ones stay valid
+        for error in reversed(errors):
+            _fix_error(data, error, model, missing)
+        if missing:
+            return None, [name for name in model.model_fields if name in missing]
+        if (json.dumps(data, sort_keys=True, default=str), len(missing)) == before:
+            break
+    return None, []
+
+
+def missing_fields_model(model: type[BaseModel], fields: list[str]) -> type[BaseModel]:
+    """Structured-output schema asking for only the given fields of ``model``."""
+    definitions = {name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    return create_model(model.__name__, __doc__=model.__doc__, **definitions)
@@ -0,0 +1,58 @@
+"""Incremental parsing of a JSON object whose text is still being streamed."""
+
+import json
+from typing import Any
+
+
+class PartialObjectParser:
+    """Pulls completed top-level members out of a JSON object as its text arrives.
+
+    Structured output is streamed as the text of one JSON object. Each time
+    a top-level member is closed off (by a comma or the final brace), the
+    text so far is closed and parsed, and the members not seen before are
+    returned. Scanning is incremental, so each character is looked at once.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._seen: set[str] = set()
+
+    def feed(self, text: str) -> dict[str, Any]:
+        """Add streamed text; returns the members completed by it."""
+        start = len(self._text)
+        self._text += text
+        completed: dict[str, Any] = {}
+        for i in range(start, len(self._text)):
+            char = self._text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.update(self._new_members(self._text[:i + 1]))
+            elif char == "," and self._depth == 1:
+                completed.update(self._new_members(self._text[:i] + "}"))
+        return completed
+
+    def _new_members(self, text: str) -> dict[str, Any]:
+        try:
+            parsed = json.loads(text[text.find("{"):])
+        except ValueError:
+            return {}
+        if not isinstance(parsed, dict):
+            return {}
+        new = {key: value for key, value in parsed.items() if key not in self._seen}
+        self._seen.update(new)
+        return new
@@ -0,0 +1 @@
+"""In-process caches for pipeline results and intermediate artifacts."""
@@ -0,0 +1,36 @@
+"""Short-lived server-side storage for intermediate pipeline artifacts.
+
+Endpoints hand out opaque ids for the DNA, candidates and rankings they
+produce, so later steps can refer to them instead of receiving the full
+JSON back from the browser.
+"""
+
+import secrets
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from .ttl_cache import TTLCache
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class ArtifactStore:
+    """TTL store mapping opaque ids to already-validated models."""
+
+    def __init__(self, ttl_seconds: float = 1800.0, max_entries: int = 5000):
+        self._cache: TTLCache[BaseModel] = TTLCache("artifacts", ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    def put(self, kind: str, artifact: BaseModel) -> str:
+        """Store an artifact and return its id (e.g. ``dna_Xy3...``)."""
+        artifact_id = f"{kind}_{secrets.token_urlsafe(12)}"
+        self._cache.set(artifact_id, artifact)
+        return artifact_id
+
+    def get(self, artifact_id: str, model_type: type[M]) -> M | None:
+        """The stored artifact, or None if unknown, expired or of another type."""
+        artifact = self._cache.get(artifact_id)
+        return artifact if isinstance(artifact, model_type) else None
+
+    def __len__(self) -> int:
+        return len(self._cache)
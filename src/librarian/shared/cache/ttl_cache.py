@@ -0,0 +1,175 @@
+"""In-process TTL cache with single-flight misses and stale-while-revalidate."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+logger = logging.getLogger("librarian")
+
+T = TypeVar("T")
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: T):
+        self.value = value
+        self.stored_at = time.monotonic()
+
+
+class _Flight:
+    """A computation shared by every caller waiting on the same key."""
+    __slots__ = ("task", "waiters", "detached")
+
+    def __init__(self, task: asyncio.Task, detached: bool):
+        self.task = task
+        self.waiters = 0
+        self.detached = detached
+
+
+class TTLCache(Generic[T]):
+    """LRU-bounded cache whose entries are fresh for ``ttl_seconds``.
+
+    For a further ``stale_seconds`` an entry is still served, while a single
+    background refresh replaces it. Concurrent misses on a key share one
+    computation, which is cancelled only once every waiter has gone away.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, stale_seconds: float = 0.0, max_entries: int = 1000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _Entry[T]] = OrderedDict()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _age(self, entry: _Entry[T]) -> float:
+        return time.monotonic() - entry.stored_at
+
+    def get(self, key: Hashable) -> T | None:
+        """Cached value (fresh or stale), or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._age(entry) >= self.ttl_seconds + self.stale_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: Hashable, value: T) -> None:
+        self._entries[key] = _Entry(value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _start(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[T]],
+        should_cache: Callable[[T], bool] | None,
+        detached: bool
+    ) -> _Flight:
+        async def run() -> T:
+            try:
+                value = await compute()
+                if should_cache is None or should_cache(value):
+                    self.set(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        flight = _Flight(asyncio.ensure_future(run()), detached)
+        if detached:
+            flight.task.add_done_callback(lambda task: self._log_refresh_failure(key, task))
+        self._inflight[key] = flight
+        return flight
+
+    def _log_refresh_failure(self, key: Hashable, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"{self.name} cache refresh failed for {key}: {task.exception()}")
+
+    def refresh(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[T]],
+        should_cache: Callable[[T], bool] | None = None
+    ) -> bool:
+        """Compute ``key`` in the background unless that is already happening.
+
+        Callers of ``get_or_compute`` join the background computation
+        instead of starting their own. Returns whether one was started.
+        """
+        if key in self._inflight:
+            return False
+        self._start(key, compute, should_cache, detached=True)
+        return True
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[T]],
+        should_cache: Callable[[T], bool] | None = None
+    ) -> T:
+        """Return the cached value, computing it once on a miss.
+
+        ``should_cache`` can reject results (e.g. partial ones) from being stored.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._age(entry)
+            if age < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    logger.info(f"{self.name} cache entry stale - refreshing in background", extra={'query': True})
+                    self._start(key, compute, should_cache, detached=True)
+                return entry.value
+            del self._entries[key]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._start(key, compute, should_cache, detached=False)
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # Abandon the shared computation only when nobody is waiting for it
+            if flight.waiters == 1 and not flight.detached and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+
+def get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Get a tuning setting from environment variables."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip()
+
+
+def get_bool_setting(name: str, default: bool = False) -> bool:
+    """Get a boolean setting ("1", "true", "yes", "on" are truthy)."""
+    value = get_setting(name)
+    if value is None:
+        return default
+    return value.lower() in {"1", "true", "yes", "on"}
+
+
+def get_int_setting(name: str, default: int) -> int:
+    """Get an integer setting, falling back to the default on bad values."""
+    value = get_setting(name)
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def get_float_setting(name: str, default: float) -> float:
+    """Get a float setting, falling back to the default on bad values."""
+    value = get_setting(name)
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def get_list_setting(name: str) -> list[str]:
+    """Get a comma-separated list setting."""
+    value = get_setting(name)
+    if value is None:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
@@ -20,6 +20,16 @@ class BookNotFoundError(LibrarianError):
         )
 
 
+class ArtifactNotFoundError(LibrarianError):
+    """Raised when a request refers to an unknown or expired artifact id."""
+
+    def __init__(self, artifact_id: str):
+        super().__init__(
+            message=f"Artifact not found: {artifact_id}",
+            detail=f"Artifact {artifact_id} is unknown or has expired - resend the full payload"
+        )
+
+
 class AnalysisFailedError(LibrarianError):
     """Raised when book DNA analysis fails."""
 
@@ -40,3 +50,44 @@ class CandidateSearchFailedError(LibrarianError):
             message="Candidate search failed",
             detail=detail
         )
+
+
+class RecommendationFailedError(LibrarianError):
+    """Raised when the pipeline cannot produce recommendations after finding candidates."""
+
+    def __init__(self, reason: str | None = None):
+        detail = f"Failed to produce recommendations: {reason}" if reason else "Failed to produce recommendations"
+        super().__init__(
+            message="Recommendations failed",
+            detail=detail
+        )
+
+
+class ProviderUnavailableError(LibrarianError):
+    """Raised when an external provider's circuit breaker is open."""
+
+    def __init__(self, provider: str):
+        super().__init__(
+            message="Service temporarily unavailable",
+            detail=f"{provider} is temporarily unavailable - please try again shortly"
+        )
+
+
+class DeadlineExceededError(LibrarianError):
+    """Raised when a request's time budget runs out before a result is ready."""
+
+    def __init__(self, stage: str):
+        super().__init__(
+            message="Request timed out",
+            detail=f"Ran out of time during {stage} - please try again"
+        )
+
+
+class RequestCancelledError(LibrarianError):
+    """Raised when work is abandoned because the client disconnected."""
+
+    def __init__(self, stage: str):
+        super().__init__(
+            message="Request cancelled",
+            detail=f"Client disconnected during {stage}"
+        )
@@ -7,4 +7,5 @@ class BookMetadata(BaseModel):
     title: str
     author: str
     blurb: str | None = None
-    thumbnail: str | None = None
\ No newline at end of file
+    thumbnail: str | None = None
+    isbns: list[str] = []  # ISBN-13s of this edition
\ No newline at end of file
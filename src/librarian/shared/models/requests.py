@@ -4,24 +4,43 @@ from pydantic import BaseModel
 
 
 class FindCandidatesRequest(BaseModel):
-    """Request model for finding book candidates."""
+    """Request model for finding book candidates (DNA inline or by artifact id)."""
     selected_pillars: list[str]
     dealbreakers: list[str] = []
     dna: dict | None = None
+    dna_id: str | None = None
+
+
+class RecommendRequest(BaseModel):
+    """Request model for running the full recommendation pipeline (DNA inline or by artifact id)."""
+    selected_pillars: list[str]
+    dealbreakers: list[str] = []
+    dna: dict | None = None
+    dna_id: str | None = None
+    mode: str | None = None  # "full" or "snippet"; chosen by load when omitted
+
+
+class RecommendMoreRequest(RecommendRequest):
+    """Request model for the next batch of recommendations from a kept candidate pool."""
+    offset: int
 
 
 class RankCandidatesRequest(BaseModel):
-    """Request model for ranking book candidates."""
+    """Request model for ranking book candidates (payloads inline or by artifact id)."""
     seed_dna: dict | None = None
+    seed_dna_id: str | None = None
     candidates: list | None = None
+    candidates_id: str | None = None
     selected_pillars: list[str]
     dealbreakers: list[str] = []
 
 
 class WriteRecommendationsRequest(BaseModel):
-    """Request model for writing recommendations."""
+    """Request model for writing recommendations (payloads inline or by artifact id)."""
     seed_dna: dict | None = None
+    seed_dna_id: str | None = None
     ranking: dict | None = None
+    ranking_id: str | None = None
     selected_pillars: list[str]
     dealbreakers: list[str] = []
 
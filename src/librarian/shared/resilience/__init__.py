@@ -0,0 +1 @@
+"""Latency, hedging and other resilience helpers for external calls."""
@@ -0,0 +1,196 @@
+"""Per-provider circuit breakers so degraded providers fail fast.
+
+A breaker trips open when too many recent calls failed or were slow. While
+open, calls raise ``ProviderUnavailableError`` immediately and stages fall
+back to degraded behavior; after a cool-down a single probe call decides
+whether to close it again.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+
+from strands.types.exceptions import StructuredOutputException
+
+from ..config.settings import get_float_setting, get_int_setting
+from ..exceptions import ProviderUnavailableError
+
+logger = logging.getLogger("librarian")
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling-window breaker that trips on error rate or slow-call rate."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 15.0,
+        slow_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        # Each outcome is (failed, slow)
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen=window_size)
+        self._state = BreakerState.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> BreakerState:
+        if self._state == BreakerState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return BreakerState.HALF_OPEN
+        return self._state
+
+    def is_available(self) -> bool:
+        """Whether a call would currently be let through (does not reserve a probe)."""
+        with self._lock:
+            state = self._current_state()
+            return state == BreakerState.CLOSED or (state == BreakerState.HALF_OPEN and not self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Reserve permission for one call."""
+        with self._lock:
+            state = self._current_state()
+            if state == BreakerState.CLOSED:
+                return True
+            if state == BreakerState.HALF_OPEN and not self._probe_in_flight:
+                self._state = BreakerState.HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def _trip(self) -> None:
+        self._state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning(f"Circuit breaker for {self.name} opened - failing fast for {self.open_seconds:.0f}s")
+
+    def record(self, failed: bool, duration: float) -> None:
+        """Record the outcome of a permitted call."""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == BreakerState.HALF_OPEN:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._trip()
+                else:
+                    self._state = BreakerState.CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit breaker for {self.name} closed - provider recovered", extra={'response': True})
+                return
+            if self._state == BreakerState.OPEN:
+                return  # Late result from before the breaker tripped
+
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failure_rate = sum(f for f, _ in self._outcomes) / len(self._outcomes)
+            slow_rate = sum(s for _, s in self._outcomes) / len(self._outcomes)
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_rate_threshold:
+                self._trip()
+
+    def abandon(self) -> None:
+        """Release a half-open probe whose call was cancelled without an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap one provider call; raises ``ProviderUnavailableError`` while open.
+
+        Malformed structured output is not the provider's fault and counts as success.
+        """
+        if not self.allow():
+            raise ProviderUnavailableError(self.name)
+        start = time.monotonic()
+        try:
+            yield
+        except StructuredOutputException:
+            self.record(False, time.monotonic() - start)
+            raise
+        except Exception:
+            self.record(True, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.abandon()
+            raise
+        else:
+            self.record(False, time.monotonic() - start)
+
+    def snapshot(self) -> dict[str, str | float | int]:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            return {
+                "state": state.value,
+                "calls": calls,
+                "failure_rate": sum(f for f, _ in self._outcomes) / calls if calls else 0.0,
+                "slow_rate": sum(s for _, s in self._outcomes) / calls if calls else 0.0,
+                "open_for_seconds": (
+                    max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+                    if state == BreakerState.OPEN else 0.0
+                ),
+            }
+
+
+# Calls slower than this count as slow (agent calls include tool use, so Gemini is generous)
+_DEFAULT_SLOW_CALL_SECONDS = {
+    "gemini": 90.0,
+    "exa": 15.0,
+    "tavily": 15.0,
+}
+
+_breakers: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a provider, created from settings on first use."""
+    with _registry_lock:
+        if provider not in _breakers:
+            prefix = f"LIBRARIAN_{provider.upper()}"
+            _breakers[provider] = CircuitBreaker(
+                provider,
+                failure_rate_threshold=get_float_setting(f"{prefix}_BREAKER_FAILURE_RATE", 0.5),
+                slow_call_seconds=get_float_setting(
+                    f"{prefix}_SLOW_CALL_SECONDS", _DEFAULT_SLOW_CALL_SECONDS.get(provider, 15.0)
+                ),
+                min_calls=get_int_setting(f"{prefix}_BREAKER_MIN_CALLS", 5),
+                open_seconds=get_float_setting(f"{prefix}_BREAKER_OPEN_SECONDS", 30.0),
+            )
+        return _breakers[provider]
+
+
+def provider_available(provider: str) -> bool:
+    """Cheap check stages use to pick a degraded path before calling a provider."""
+    return get_breaker(provider).is_available()
+
+
+def breaker_snapshot() -> dict[str, dict[str, str | float | int]]:
+    """Current state of every breaker, for dashboards."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,110 @@
+"""Request-level time budgets propagated through the pipeline.
+
+A ``Deadline`` is created at the FastAPI endpoint and passed to each stage,
+which shrinks its work when time is short. Agent tools see the active
+deadline through a context variable. A deadline is also cancelled when the
+client disconnects, so worker threads stop starting new provider calls.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .latency import latency_tracker
+from ..config.settings import get_float_setting
+from ..exceptions import DeadlineExceededError, RequestCancelledError
+
+# Default time budget (seconds) per endpoint
+_DEFAULT_BUDGETS = {
+    "analyze": 60.0,
+    "find_candidates": 45.0,
+    "rank_candidates": 150.0,
+    "write_recommendations": 45.0,
+    "recommend": 240.0,
+    "speculative": 90.0,
+}
+
+
+def expected_seconds(stage: str, default_seconds: float) -> float:
+    """Typical (p50) duration of a stage, or a default until enough samples exist."""
+    return latency_tracker.percentile(stage, 0.5, min_samples=5) or default_seconds
+
+
+class Deadline:
+    """Absolute point in time by which a request must have produced a result."""
+
+    def __init__(
+        self,
+        budget_seconds: float,
+        expires_at: float | None = None,
+        cancelled: threading.Event | None = None
+    ):
+        self.budget_seconds = budget_seconds
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + budget_seconds
+        # Shared with deadlines derived via reserve(), and set from any thread
+        self._cancelled = cancelled or threading.Event()
+
+    @classmethod
+    def for_endpoint(cls, endpoint: str) -> "Deadline":
+        """Deadline for an endpoint, overridable with LIBRARIAN_<ENDPOINT>_BUDGET_SECONDS."""
+        default = _DEFAULT_BUDGETS.get(endpoint, 60.0)
+        return cls(get_float_setting(f"LIBRARIAN_{endpoint.upper()}_BUDGET_SECONDS", default))
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Abandon the request (e.g. the client disconnected)."""
+        self._cancelled.set()
+
+    def check(self, context: str) -> None:
+        """Raise if the request was cancelled or no time is left.
+
+        Raises:
+            RequestCancelledError: If the request was cancelled
+            DeadlineExceededError: If the deadline has passed
+        """
+        if self.cancelled:
+            raise RequestCancelledError(context)
+        if self.expired:
+            raise DeadlineExceededError(context)
+
+    def can_afford(self, stage: str, default_seconds: float) -> bool:
+        """Whether a typical call of the stage fits in the remaining time."""
+        return self.remaining() >= expected_seconds(stage, default_seconds)
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """A deadline ending ``seconds`` earlier, keeping time back for a later step."""
+        return Deadline(self.budget_seconds, self.expires_at - seconds, self._cancelled)
+
+
+_current_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "librarian_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    """Deadline of the calling context, if any (tools inherit their agent's)."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline | None) -> Iterator[None]:
+    """Make a deadline visible to provider calls made in this block."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,45 @@
+"""Cancel in-flight pipeline work when the HTTP client goes away."""
+
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+from starlette.requests import Request
+
+from .deadline import Deadline
+from ..exceptions import RequestCancelledError
+
+logger = logging.getLogger("librarian")
+
+T = TypeVar("T")
+
+# How often to poll the connection while work is running
+_POLL_SECONDS = 0.5
+
+
+async def cancel_on_disconnect(request: Request, deadline: Deadline | None, work: Awaitable[T]) -> T:
+    """Run endpoint work, cancelling it if the client disconnects first.
+
+    On disconnect the deadline is cancelled (so provider calls running in
+    worker threads stop scheduling new requests) and the work task is
+    cancelled, which propagates through agent invocations.
+
+    Raises:
+        RequestCancelledError: If the client disconnected before the work finished
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.warning(f"Client disconnected - cancelling {request.url.path}")
+                if deadline is not None:
+                    deadline.cancel()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise RequestCancelledError(request.url.path)
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,240 @@
+"""Opt-in request hedging for idempotent LLM and provider calls.
+
+If a call has not returned by its stage's p90 latency, a duplicate is sent
+and whichever finishes first wins. A global hedge-rate cap keeps the extra
+cost bounded. Attempts are timed, and the hedge delay counted, from when
+they are admitted (``admit``, typically the provider's limiter slot), so
+time spent queueing neither inflates the p90 nor triggers hedges.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, nullcontext
+from typing import Awaitable, Callable, TypeVar
+
+from .latency import latency_tracker
+from .rate_limiter import Priority, current_priority, get_limiter
+from ..config.settings import get_float_setting, get_int_setting, get_list_setting
+
+logger = logging.getLogger("librarian")
+
+T = TypeVar("T")
+
+# Worker threads for hedged synchronous provider calls (Exa, Tavily), one pool per provider
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(provider: str) -> ThreadPoolExecutor:
+    """A provider's worker pool, with room for a hedge beside every call its limiter admits.
+
+    Separate pools keep one provider's backlog from holding up another's
+    calls and their hedges.
+    """
+    with _executors_lock:
+        executor = _executors.get(provider)
+        if executor is None:
+            workers = 2 * get_limiter(provider).max_concurrency
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"librarian-hedge-{provider}")
+            _executors[provider] = executor
+        return executor
+
+
+def hedging_enabled(stage: str) -> bool:
+    """Hedging is opt-in per stage via LIBRARIAN_HEDGE_STAGES (or "all"); speculative work is never hedged."""
+    if current_priority() == Priority.SPECULATIVE:
+        return False
+    stages = get_list_setting("LIBRARIAN_HEDGE_STAGES")
+    return "all" in stages or stage in stages
+
+
+def hedge_delay(stage: str) -> float | None:
+    """Delay before sending a duplicate, or None while latencies are still unknown."""
+    return latency_tracker.percentile(
+        stage,
+        get_float_setting("LIBRARIAN_HEDGE_PERCENTILE", 0.9),
+        min_samples=get_int_setting("LIBRARIAN_HEDGE_MIN_SAMPLES", 20),
+    )
+
+
+class HedgeBudget:
+    """Caps hedged calls to a fraction of recent calls across the process."""
+
+    def __init__(self, max_rate: float | None = None, window_size: int = 200):
+        self._max_rate = max_rate
+        self._recent: deque[bool] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    @property
+    def max_rate(self) -> float:
+        if self._max_rate is not None:
+            return self._max_rate
+        return get_float_setting("LIBRARIAN_HEDGE_MAX_RATE", 0.1)
+
+    def record_call(self) -> None:
+        """Record a call that did not need a hedge."""
+        with self._lock:
+            self._recent.append(False)
+
+    def try_acquire(self) -> bool:
+        """Reserve a hedge if the recent hedge rate is below the cap."""
+        with self._lock:
+            hedged = sum(self._recent)
+            if (hedged + 1) > self.max_rate * (len(self._recent) + 1):
+                self._recent.append(False)
+                return False
+            self._recent.append(True)
+            return True
+
+    def hedge_rate(self) -> float:
+        with self._lock:
+            return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+
+hedge_budget = HedgeBudget()
+
+
+class _AttemptClock:
+    """When one attempt of a hedged call was admitted, and whether another attempt has already won."""
+
+    def __init__(self, settled: threading.Event):
+        self.settled = settled
+        self.start: float | None = None
+
+    def begin(self) -> None:
+        self.start = time.monotonic()
+
+    def record(self, stage: str, lost: bool = False) -> None:
+        """Record the attempt's latency; a lost attempt counts as at least as slow as it had run."""
+        if self.start is not None and (not lost or self.settled.is_set()):
+            latency_tracker.record(stage, time.monotonic() - self.start)
+
+
+async def hedged(
+    stage: str,
+    attempt: Callable[[], Awaitable[T]],
+    admit: Callable[[], AbstractAsyncContextManager] | None = None
+) -> T:
+    """Run an async attempt, hedging it with a duplicate past the stage's p90.
+
+    ``attempt`` is called once per try, inside ``admit()`` if given, and
+    must be idempotent. Latency is recorded for every attempt from its
+    admission: in full for completed ones, and up to the moment it was
+    abandoned for one that lost to the other.
+    """
+    settled = threading.Event()
+
+    async def timed_attempt(started: asyncio.Event) -> T:
+        clock = _AttemptClock(settled)
+        try:
+            async with admit() if admit else nullcontext():
+                clock.begin()
+                started.set()
+                result = await attempt()
+            clock.record(stage)
+            return result
+        except BaseException:
+            clock.record(stage, lost=True)
+            raise
+        finally:
+            started.set()
+
+    delay = hedge_delay(stage) if hedging_enabled(stage) else None
+    if delay is None:
+        return await timed_attempt(asyncio.Event())
+
+    primary_started = asyncio.Event()
+    primary = asyncio.ensure_future(timed_attempt(primary_started))
+    backup = None
+    try:
+        # The hedge clock starts once the primary is admitted
+        await primary_started.wait()
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not hedge_budget.try_acquire():
+            if done:
+                hedge_budget.record_call()
+            return await primary
+
+        logger.info(f"Hedging {stage} call after {delay:.1f}s", extra={'query': True})
+        backup = asyncio.ensure_future(timed_attempt(asyncio.Event()))
+        pending = {primary, backup}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        logger.info(f"Hedged {stage} call won", extra={'response': True})
+                    settled.set()
+                    return task.result()
+        # Both attempts failed; surface the primary's error
+        return primary.result()
+    finally:
+        for task in (primary, backup):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def hedged_sync(
+    stage: str,
+    attempt: Callable[[], T],
+    admit: Callable[[], AbstractContextManager] | None = None
+) -> T:
+    """Synchronous counterpart of ``hedged`` for blocking provider SDK calls.
+
+    Attempts run on the worker pool of the provider named by ``stage``. A
+    duplicate still waiting for admission when the other attempt wins is
+    dropped without calling the provider; one already running can't be
+    stopped, and records its full latency when it returns.
+    """
+    settled = threading.Event()
+
+    def timed_attempt(started: threading.Event) -> T:
+        clock = _AttemptClock(settled)
+        try:
+            with admit() if admit else nullcontext():
+                if settled.is_set():
+                    raise RuntimeError(f"Hedged {stage} attempt no longer needed")
+                clock.begin()
+                started.set()
+                result = attempt()
+            clock.record(stage)
+            return result
+        except BaseException:
+            clock.record(stage, lost=True)
+            raise
+        finally:
+            started.set()
+
+    delay = hedge_delay(stage) if hedging_enabled(stage) else None
+    if delay is None:
+        return timed_attempt(threading.Event())
+
+    # Each attempt runs in its own copy of the caller's context
+    executor = _executor(stage)
+    primary_started = threading.Event()
+    primary = executor.submit(contextvars.copy_context().run, timed_attempt, primary_started)
+    # The hedge clock starts once the primary is admitted, not while it queues
+    primary_started.wait()
+    done, _ = wait([primary], timeout=delay)
+    if done or not hedge_budget.try_acquire():
+        if done:
+            hedge_budget.record_call()
+        return primary.result()
+
+    logger.info(f"Hedging {stage} call after {delay:.1f}s", extra={'query': True})
+    backup = executor.submit(contextvars.copy_context().run, timed_attempt, threading.Event())
+    pending = {primary, backup}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                settled.set()
+                for other in pending:
+                    other.cancel()
+                return future.result()
+    return primary.result()
@@ -0,0 +1,56 @@
+"""Per-stage latency tracking used to derive hedging thresholds."""
+
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """Keeps a rolling window of call latencies for each pipeline stage."""
+
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record the latency of one completed call."""
+        with self._lock:
+            samples = self._samples.setdefault(stage, deque(maxlen=self.window_size))
+            samples.append(seconds)
+
+    def count(self, stage: str) -> int:
+        """Number of samples currently held for a stage."""
+        with self._lock:
+            return len(self._samples.get(stage, ()))
+
+    def percentile(self, stage: str, q: float, min_samples: int = 1) -> float | None:
+        """Return the q-th percentile (0-1) latency, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(len(samples) - 1, max(0, round(q * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> dict[str, dict[str, float | int | None]]:
+        """Summarize p50/p90/p99 per stage for logging and dashboards."""
+        with self._lock:
+            stages = list(self._samples)
+        return {
+            stage: {
+                "count": self.count(stage),
+                "p50": self.percentile(stage, 0.5),
+                "p90": self.percentile(stage, 0.9),
+                "p99": self.percentile(stage, 0.99),
+            }
+            for stage in stages
+        }
+
+    def reset(self) -> None:
+        """Drop all samples."""
+        with self._lock:
+            self._samples.clear()
+
+
+# Process-wide tracker shared by every agent and provider call
+latency_tracker = LatencyTracker()
@@ -0,0 +1,40 @@
+"""Single entry point for blocking calls to external search providers."""
+
+from typing import Callable, TypeVar
+
+from .circuit_breaker import get_breaker, provider_available
+from .deadline import current_deadline
+from .hedging import hedged_sync
+from .rate_limiter import get_limiter
+from ..exceptions import ProviderUnavailableError
+
+T = TypeVar("T")
+
+
+def call_provider(provider: str, call: Callable[[], T]) -> T:
+    """Run a blocking provider SDK call (Exa, Tavily) through the resilience layers.
+
+    Each attempt waits for a slot on the provider's limiter at the caller's
+    priority and is guarded by the provider's circuit breaker; slow calls may
+    be hedged. Calls are not started once the caller's deadline has passed
+    or its request was cancelled, including after waiting for a slot.
+
+    Raises:
+        ProviderUnavailableError: If the provider's breaker is open
+        DeadlineExceededError: If the caller's deadline has already passed
+        RequestCancelledError: If the caller's request was cancelled
+    """
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check(provider)
+    if not provider_available(provider):
+        raise ProviderUnavailableError(provider)  # Fail fast instead of queueing
+
+    def guarded_call() -> T:
+        if deadline is not None:
+            deadline.check(provider)
+        with get_breaker(provider).guard():
+            return call()
+
+    # The limiter slot is taken before each attempt's clock starts, so queueing isn't counted as latency
+    return hedged_sync(provider, guarded_call, admit=get_limiter(provider).slot_sync)
@@ -0,0 +1,276 @@
+"""Process-wide admission control for Gemini, Exa and Tavily calls.
+
+Each provider gets a token bucket (request rate), an adaptive concurrency cap
+(AIMD: grow slowly on success, halve on 429s) and a priority queue so short
+interactive calls jump ahead of bulk candidate analyses.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Iterator
+
+from strands.types.exceptions import ModelThrottledException
+
+from ..config.settings import get_float_setting, get_int_setting
+
+logger = logging.getLogger("librarian")
+
+
+class Priority(IntEnum):
+    """Admission priority classes (lower value = served first)."""
+    INTERACTIVE = 0  # User is waiting on a short call (query parsing, seed analysis)
+    STANDARD = 1     # Single pipeline steps (finding, ranking, writing)
+    BULK = 2         # Fan-out work such as candidate analyses
+    SPECULATIVE = 3  # Warm-ups nobody is waiting on yet (prefetching)
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "librarian_priority", default=Priority.STANDARD
+)
+
+
+def current_priority() -> Priority:
+    """Priority of the calling context (tools inherit their agent's priority)."""
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: Priority) -> Iterator[None]:
+    """Run provider calls made in this block (including agent tools) at a priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True when a provider rejected a call for rate limiting (HTTP 429)."""
+    if isinstance(exc, ModelThrottledException):
+        return True
+    if getattr(exc, "status_code", None) == 429 or getattr(exc, "code", None) == 429:
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in ("429", "rate limit", "too many requests", "resource_exhausted"))
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (guarded by the limiter lock)."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until_available(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def drain(self) -> None:
+        """Empty the bucket so callers pause after a 429."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "wake")
+
+    def __init__(self, priority: Priority, seq: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.wake = wake
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ProviderLimiter:
+    """Token bucket + AIMD concurrency cap + priority queue for one provider.
+
+    Usable from the event loop (``slot``) and from worker threads (``slot_sync``).
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self._bucket = TokenBucket(rate, burst)
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.throttled_count = 0
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(self.min_concurrency, int(self._limit))
+
+    def _poll(self, waiter: _Waiter) -> tuple[bool, float | None]:
+        """Admit the waiter if it is first in line. Returns (admitted, retry_after)."""
+        if self._waiters[0] is not waiter or self._in_flight >= self.concurrency_limit:
+            return False, None  # Wait to be woken by a release or an admission
+        delay = self._bucket.time_until_available()
+        if delay > 0:
+            return False, delay
+        self._bucket.take()
+        heapq.heappop(self._waiters)
+        self._in_flight += 1
+        if self._waiters:
+            self._waiters[0].wake()  # Let the next in line check for spare capacity
+        return True, None
+
+    def _remove(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            if self._waiters:
+                self._waiters[0].wake()
+
+    async def acquire(self, priority: Priority | None = None) -> None:
+        """Wait for a slot; higher-priority waiters are admitted first."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = _Waiter(
+            current_priority() if priority is None else priority,
+            next(self._seq),
+            lambda: loop.call_soon_threadsafe(event.set),
+        )
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    admitted, retry_after = self._poll(waiter)
+                if admitted:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), retry_after)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self._remove(waiter)
+            raise
+
+    def acquire_sync(self, priority: Priority | None = None) -> None:
+        """Blocking variant of ``acquire`` for provider SDK calls in worker threads."""
+        event = threading.Event()
+        waiter = _Waiter(current_priority() if priority is None else priority, next(self._seq), event.set)
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    admitted, retry_after = self._poll(waiter)
+                if admitted:
+                    return
+                event.wait(retry_after)
+        except BaseException:
+            with self._lock:
+                self._remove(waiter)
+            raise
+
+    def release(self, error: BaseException | None = None) -> None:
+        """Free a slot and adapt the concurrency cap to the call's outcome."""
+        with self._lock:
+            self._in_flight -= 1
+            if error is not None and is_throttle_error(error):
+                # Multiplicative decrease, and pause new calls until tokens refill
+                self._limit = max(float(self.min_concurrency), self._limit / 2)
+                self._bucket.drain()
+                self.throttled_count += 1
+                logger.warning(f"{self.name} throttled (429): concurrency cap now {self.concurrency_limit}")
+            elif error is None:
+                # Additive increase: about +1 per full window of successful calls
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+            if self._waiters:
+                self._waiters[0].wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority | None = None) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(error)
+
+    @contextmanager
+    def slot_sync(self, priority: Priority | None = None) -> Iterator[None]:
+        self.acquire_sync(priority)
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(error)
+
+    def snapshot(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "concurrency_limit": self.concurrency_limit,
+                "throttled": self.throttled_count,
+            }
+
+
+# (requests per second, burst, max concurrency) per provider
+_DEFAULT_LIMITS = {
+    "gemini": (10.0, 20, 16),
+    "exa": (5.0, 10, 8),
+    "tavily": (2.0, 5, 4),
+}
+
+_limiters: dict[str, ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Get the process-wide limiter for a provider, created from settings on first use."""
+    with _registry_lock:
+        if provider not in _limiters:
+            rate, burst, concurrency = _DEFAULT_LIMITS.get(provider, (5.0, 10, 8))
+            prefix = f"LIBRARIAN_{provider.upper()}"
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                rate=get_float_setting(f"{prefix}_RATE_PER_SECOND", rate),
+                burst=get_int_setting(f"{prefix}_BURST", burst),
+                max_concurrency=get_int_setting(f"{prefix}_MAX_CONCURRENCY", concurrency),
+            )
+        return _limiters[provider]
+
+
+def limiter_snapshot() -> dict[str, dict[str, int | float]]:
+    """Current state of every limiter, for logging and dashboards."""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
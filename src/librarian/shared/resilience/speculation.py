@@ -0,0 +1,135 @@
+"""Bounded background work started on a guess about the user's next step.
+
+Speculative warm-ups run at ``Priority.SPECULATIVE``, behind all real
+traffic, under a process-wide cap on concurrent tasks and a per-minute start
+budget. They are refused outright while Gemini calls are queueing, and are
+grouped by the browser that triggered them so they can be cancelled once
+the user moves on.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+from .deadline import Deadline
+from .rate_limiter import Priority, TokenBucket, get_limiter, priority_scope
+from ..config.settings import get_bool_setting, get_float_setting, get_int_setting
+
+logger = logging.getLogger("librarian")
+
+
+class Speculator:
+    """Runs keyed speculative tasks in the background within a global budget."""
+
+    def __init__(self):
+        self._tasks: dict[Hashable, tuple[str, asyncio.Task, Deadline]] = {}
+        self._bucket: TokenBucket | None = None
+        self.started = 0
+        self.refused = 0
+        self.cancelled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return get_bool_setting("LIBRARIAN_SPECULATION_ENABLED", True)
+
+    @property
+    def max_concurrent(self) -> int:
+        return get_int_setting("LIBRARIAN_SPECULATIVE_MAX_CONCURRENCY", 4)
+
+    def _take_budget(self) -> bool:
+        """Spend one start from the per-minute budget, if any is left."""
+        if self._bucket is None:
+            per_minute = get_float_setting("LIBRARIAN_SPECULATIVE_PER_MINUTE", 30.0)
+            self._bucket = TokenBucket(per_minute / 60, max(1, int(per_minute)))
+        if self._bucket.time_until_available() > 0:
+            return False
+        self._bucket.take()
+        return True
+
+    def running(self, key: Hashable) -> asyncio.Task | None:
+        """The in-flight task for a key, if there is one."""
+        entry = self._tasks.get(key)
+        return entry[1] if entry else None
+
+    def schedule(self, key: Hashable, group: str, work: Callable[[Deadline], Awaitable[Any]]) -> bool:
+        """Start ``work`` in the background unless the budget or load says no.
+
+        ``work`` is given its own deadline, which is cancelled along with the
+        task so provider calls in worker threads stop too. Returns whether
+        the work is running (an identical task already in flight counts).
+        """
+        if not self.enabled:
+            return False
+        if key in self._tasks:
+            return True
+        if (
+            len(self._tasks) >= self.max_concurrent
+            or get_limiter("gemini").snapshot()["queued"] > 0  # Real traffic is waiting
+            or not self._take_budget()
+        ):
+            self.refused += 1
+            return False
+
+        deadline = Deadline.for_endpoint("speculative")
+        with priority_scope(Priority.SPECULATIVE):
+            task = asyncio.ensure_future(self._run(key, work, deadline))
+        self._tasks[key] = (group, task, deadline)
+        self.started += 1
+        return True
+
+    async def _run(self, key: Hashable, work: Callable[[Deadline], Awaitable[Any]], deadline: Deadline) -> None:
+        try:
+            await work(deadline)
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+        except Exception as e:
+            logger.warning(f"Speculative task {key} failed: {e}")
+        finally:
+            entry = self._tasks.get(key)
+            if entry is not None and entry[1] is asyncio.current_task():
+                del self._tasks[key]
+
+    def cancel_group(self, group: str, keep: Hashable | None = None) -> int:
+        """Cancel a group's tasks, except the one for ``keep``; returns how many were cancelled."""
+        doomed = [key for key, (task_group, _, _) in self._tasks.items() if task_group == group and key != keep]
+        for key in doomed:
+            self._cancel(key)
+        if doomed:
+            logger.info(f"Cancelled {len(doomed)} speculative task(s) for a user who moved on")
+        return len(doomed)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the task for a key; returns whether one was running."""
+        if key not in self._tasks:
+            return False
+        self._cancel(key)
+        return True
+
+    def cancel_all(self) -> None:
+        for key in list(self._tasks):
+            self._cancel(key)
+
+    def reset(self) -> None:
+        """Cancel everything and start over with a full budget."""
+        self.cancel_all()
+        self._bucket = None
+        self.started = self.refused = self.cancelled = 0
+
+    def _cancel(self, key: Hashable) -> None:
+        _, task, deadline = self._tasks.pop(key)
+        deadline.cancel()
+        task.cancel()
+        self.cancelled += 1
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "running": len(self._tasks),
+            "started": self.started,
+            "refused": self.refused,
+            "cancelled": self.cancelled,
+        }
+
+
+# Shared by every kind of speculative work, so the cap is process-wide
+speculator = Speculator()
@@ -1,6 +1,16 @@
 """Shared utility functions for the Librarian application."""
 
-from ..analysis.models import BookDNAResponse
+import hashlib
+import logging
+import math
+
+from ..analysis.models import PILLAR_NAMES, BookDNAResponse
+from .works import normalize_title, works
+
+logger = logging.getLogger("librarian")
+
+# Rough characters-per-token ratio for English prompt text
+CHARS_PER_TOKEN = 4
 
 
 def build_pillar_descriptions(dna: BookDNAResponse, selected_pillars: list[str]) -> list[str]:
@@ -24,3 +34,73 @@ def build_pillar_descriptions(dna: BookDNAResponse, selected_pillars: list[str])
         pillar_descriptions.append(desc)
 
     return pillar_descriptions
+
+
+def format_dna_for_prompt(dna: BookDNAResponse, selected_pillars: list[str], compact: bool = True) -> str:
+    """
+    Format a candidate's DNA as prompt lines.
+
+    Selected pillars get their full text. When compact, the other pillars
+    get only their 2-3 word summary, and pillars left empty by a
+    pillar-scoped analysis are omitted.
+
+    Args:
+        dna: Book DNA response to format
+        selected_pillars: Pillars the user selected
+        compact: Use summaries for non-selected pillars
+
+    Returns:
+        Newline-separated "- Label: text" lines
+    """
+    lines = [f"- Genre: {dna.genre}"]
+    for pillar_name in PILLAR_NAMES:
+        pillar = getattr(dna, pillar_name)
+        label = pillar_name.replace('_', ' ').title()
+        if pillar_name in selected_pillars or not compact:
+            text = pillar.full_text
+        else:
+            text = pillar.summary
+            label = f"{label} (in brief)"
+        if text or not compact:
+            lines.append(f"- {label}: {text}")
+    lines.append(f"- Dealbreakers: {', '.join(dna.dealbreakers)}")
+    return '\n'.join(lines)
+
+
+def seed_key(seed_dna: BookDNAResponse, book_id: str | None = None) -> str:
+    """
+    Key of a seed book and its DNA, for every cache entry derived from the seed.
+
+    The volume's registered work key if it has one, else the key of the
+    seed's title and author, so an edition the work registry never saw
+    (or has forgotten) still lands on the same entries. Endpoints accept
+    DNA sent inline by the client, so a digest of what the stages read
+    from it is added: DNA that differs from the server's analysis gets
+    entries of its own instead of being served to everyone else.
+
+    Args:
+        seed_dna: Seed book DNA (its author is set by the analyzer)
+        book_id: Volume id of the seed, if not the DNA's own
+
+    Returns:
+        Work key and content digest of the seed
+    """
+    content = seed_dna.model_dump_json(exclude={"book_id", "title", "author"})
+    digest = hashlib.sha256(f"{normalize_title(seed_dna.title)}\n{content}".encode()).hexdigest()[:16]
+    return f"{works.key(seed_dna.title, seed_dna.author or '', book_id or seed_dna.book_id)}#{digest}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a prompt."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def log_prompt_size(stage: str, prompt: str, candidate_texts: list[str], full_candidate_texts: list[str]) -> None:
+    """Log a prompt's estimated size and what compact DNA formatting saved."""
+    compact_tokens = sum(estimate_tokens(text) for text in candidate_texts)
+    full_tokens = sum(estimate_tokens(text) for text in full_candidate_texts)
+    logger.info(
+        f"{stage} prompt: ~{estimate_tokens(prompt)} tokens "
+        f"(candidates ~{compact_tokens} tokens, ~{full_tokens - compact_tokens} saved by compact pillars)",
+        extra={'query': True}
+    )
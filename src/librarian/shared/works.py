@@ -0,0 +1,133 @@
+"""Canonical work identity, so every edition of a book shares its cache entries.
+
+Google Books returns separate volumes for the hardcover, paperback and
+ebook of one novel, and the candidate finder names books by title and
+author only. A work key is the normalized title and the first author's
+surname. Volumes sharing an ISBN are kept under the key of the first one
+seen, even when their titles differ.
+"""
+
+import re
+import unicodedata
+
+from .cache.ttl_cache import TTLCache
+from .config.settings import get_float_setting, get_int_setting
+from .models.book_metadata import BookMetadata
+
+# Parenthesised or bracketed asides: series numbering, format, edition
+_BRACKETS_RE = re.compile(r"\s*[\(\[][^\)\]]*[\)\]]")
+
+# Trailing ": ..." or " - ..." subtitles that only name an edition or format
+_EDITION_SUBTITLE_RE = re.compile(
+    r"\s*(?::|\s-|\s–|\s—)\s*(?:a novel|the novel|novel|a memoir|(?:\w+\s+){0,3}edition|illustrated|unabridged"
+    r"|abridged|(?:book|volume|vol\.?|part)\s+\w+)\s*$"
+)
+
+_LEADING_ARTICLE_RE = re.compile(r"^(?:the|a|an)\s+")
+
+# Separators between co-authors
+_AUTHOR_SPLIT_RE = re.compile(r"\s*(?:;|&|\band\b|,)\s*")
+
+
+def _fold(text: str) -> str:
+    """Lowercase ASCII text, with accents removed."""
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def normalize_title(title: str) -> str:
+    """A title without edition asides, punctuation or a leading article.
+
+    "The Left Hand of Darkness (50th Anniversary Edition)" and "Left Hand
+    of Darkness: A Novel" both become "left hand of darkness". Subtitles
+    that are more than an edition marker are kept, since titles such as
+    "Star Wars: Heir to the Empire" share their main title with other
+    novels by the same author.
+    """
+    text = _BRACKETS_RE.sub("", _fold(title))
+    text = _EDITION_SUBTITLE_RE.sub("", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text).strip()
+    return _LEADING_ARTICLE_RE.sub("", text) or title.strip().lower()
+
+
+def normalize_author(author: str) -> str:
+    """The first author's surname.
+
+    Both "Ursula K. Le Guin" and "Le Guin, Ursula K." give "guin", and
+    co-authors after the first are ignored.
+    """
+    first = next((part for part in _AUTHOR_SPLIT_RE.split(_fold(author)) if part.strip()), "")
+    words = re.findall(r"[a-z]+", first)
+    return words[-1] if words else author.strip().lower()
+
+
+def normalize_isbn(isbn: str) -> str | None:
+    """An ISBN as 13 digits, converting ISBN-10s; None if it isn't one."""
+    digits = re.sub(r"[^0-9X]", "", isbn.upper())
+    if len(digits) == 13 and digits.isdigit():
+        return digits
+    if len(digits) == 10 and digits[:9].isdigit():
+        core = "978" + digits[:9]
+        check = (10 - sum((3 if i % 2 else 1) * int(d) for i, d in enumerate(core)) % 10) % 10
+        return core + str(check)
+    return None
+
+
+def work_key(title: str, author: str) -> str:
+    """Key shared by every edition of a book, from its title and author."""
+    return f"{normalize_title(title)}|{normalize_author(author)}"
+
+
+class WorkRegistry:
+    """Maps Google Books volume ids and ISBNs to work keys.
+
+    Registering a volume keeps it, and its ISBNs, under the work key of any
+    volume seen earlier with one of the same ISBNs, or else under the key
+    of its own title and author. Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self._volumes: TTLCache[str] | None = None
+        self._isbns: TTLCache[str] | None = None
+
+    def _caches(self) -> tuple[TTLCache[str], TTLCache[str]]:
+        if self._volumes is None or self._isbns is None:
+            ttl_seconds = get_float_setting("LIBRARIAN_WORK_KEY_TTL_SECONDS", 30 * 24 * 3600)
+            max_entries = get_int_setting("LIBRARIAN_WORK_KEY_MAX_ENTRIES", 50000)
+            self._volumes = TTLCache("work keys by volume", ttl_seconds=ttl_seconds, max_entries=max_entries)
+            self._isbns = TTLCache("work keys by ISBN", ttl_seconds=ttl_seconds, max_entries=max_entries)
+        return self._volumes, self._isbns
+
+    def register(self, book: BookMetadata) -> str:
+        """Record a volume and its ISBNs; returns its work key."""
+        volumes, isbns = self._caches()
+        key = volumes.get(book.book_id)
+        if key is None:
+            key = next((known for isbn in book.isbns if (known := isbns.get(isbn)) is not None), None)
+        if key is None:
+            key = work_key(book.title, book.author)
+        volumes.set(book.book_id, key)
+        for isbn in book.isbns:
+            if isbns.get(isbn) is None:
+                isbns.set(isbn, key)
+        return key
+
+    def book_key(self, book_id: str) -> str:
+        """The work key of a registered volume, or the id itself if it was never seen."""
+        volumes, _ = self._caches()
+        return volumes.get(book_id) or book_id
+
+    def key(self, title: str, author: str, book_id: str | None = None) -> str:
+        """The work key of a book, preferring what is registered for its volume."""
+        if book_id:
+            volumes, _ = self._caches()
+            registered = volumes.get(book_id)
+            if registered is not None:
+                return registered
+        return work_key(title, author)
+
+    def reset(self) -> None:
+        self._volumes = self._isbns = None
+
+
+# Shared by the books API, analyzer, ranker, writer and pipeline
+works = WorkRegistry()
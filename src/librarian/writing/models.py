@@ -11,6 +11,8 @@ class RecommendationCard(BaseModel):
     why_it_matches: str = Field(description="Empathetic explanation of how it matches user preferences")
     what_is_fresh: str = Field(description="What makes this a 'pivot' rather than a 'clone'")
     dna: BookDNAResponse | None = Field(description="DNA analysis (None if analysis failed)")
+    book_id: str | None = Field(default=None, description="Google Books volume id, if the book was resolved to one")
+    thumbnail: str | None = Field(default=None, description="Cover image URL, if the book was resolved to a volume")
 
 
 class LLMRecommendation(BaseModel):
@@ -32,4 +34,7 @@ class RecommendationResponse(BaseModel):
     """Final response with enhanced recommendations."""
     recommendations: list[RecommendationCard] = Field(description="Enhanced recommendation cards")
     total_analyzed: int = Field(description="Number of candidates successfully analyzed")
-    failed_analyses: int = Field(description="Number of candidate analyses that failed")
\ No newline at end of file
+    failed_analyses: int = Field(description="Number of candidate analyses that failed")
+    partial: bool = Field(default=False, description="True if work was cut short to meet the request deadline")
+    snippet_only: bool = Field(default=False, description="True if ranked and written from search snippets, without candidate DNA analysis")
+    next_offset: int | None = Field(default=None, description="Where the next batch starts in the kept candidate pool (None when it is used up)")
\ No newline at end of file
@@ -1,15 +1,27 @@
+import asyncio
 import logging
 from pathlib import Path
+from typing import AsyncIterator
 from strands import Agent
 from strands.types.exceptions import StructuredOutputException
 from .models import RecommendationResponse, RecommendationCard, RecommendationOutput, LLMRecommendation
-from ..ranking.models import RankingResponse
+from ..ranking.models import RankedCandidate, RankingResponse
 from ..analysis.models import BookDNAResponse
-from ..shared.ai.gemini_client import create_gemini_model
-from ..shared.utils import build_pillar_descriptions
+from ..shared.ai.gemini_client import FAST_MODEL_ID, create_gemini_model
+from ..shared.ai.agent_pool import AgentPool
+from ..shared.ai.invocation import invoke_agent, stream_agent_text
+from ..shared.cache.ttl_cache import TTLCache
+from ..shared.config.settings import get_float_setting, get_int_setting, get_setting
+from ..shared.resilience.deadline import Deadline
+from ..shared.resilience.rate_limiter import Priority
+from ..shared.exceptions import DeadlineExceededError
+from ..shared.utils import build_pillar_descriptions, format_dna_for_prompt, log_prompt_size, seed_key
+from ..shared.works import work_key
 
 logger = logging.getLogger("librarian")
 
+WRITING_MODES = ("batch", "per_card")
+
 
 class RecommendationsWriter:
     """Strands agent that transforms ranked candidates into empathetic recommendation copy."""
@@ -24,6 +36,16 @@ class RecommendationsWriter:
         prompt_path = Path(__file__).parent / "prompts" / "recommendations_writer_task.md"
         return prompt_path.read_text(encoding='utf-8').strip()
     
+    def _load_card_task_prompt(self) -> str:
+        """Load the single-card task prompt template from external file."""
+        prompt_path = Path(__file__).parent / "prompts" / "recommendation_card_task.md"
+        return prompt_path.read_text(encoding='utf-8').strip()
+
+    def _load_card_stream_format(self) -> str:
+        """Load the plain-text section format used when a card is streamed."""
+        prompt_path = Path(__file__).parent / "prompts" / "recommendation_card_stream_format.md"
+        return prompt_path.read_text(encoding='utf-8').strip()
+
     def _load_candidate_summary_template(self) -> str:
         """Load the candidate summary template from external file."""
         template_path = Path(__file__).parent / "prompts" / "candidate_summary_template.md"
@@ -37,6 +59,8 @@ class RecommendationsWriter:
     def __init__(self):
         self.system_prompt = self._load_system_prompt()
         self.task_prompt_template = self._load_task_prompt()
+        self.card_task_prompt_template = self._load_card_task_prompt()
+        self.card_stream_format = self._load_card_stream_format()
         self.candidate_summary_template = self._load_candidate_summary_template()
         self.candidate_summary_failed_template = self._load_candidate_summary_failed_template()
         
@@ -45,14 +69,78 @@ class RecommendationsWriter:
             temperature=0.4,  # Higher temperature for creative, empathetic writing
             max_output_tokens=8192
         )
-        self.agent = Agent(
+        self.agent = self._create_agent()
+        self.agents = AgentPool(self._create_agent, seed=self.agent)
+        # Smaller model for requests short on time
+        self.fast_model = create_gemini_model(
+            model_id=FAST_MODEL_ID,
+            temperature=0.4,
+            max_output_tokens=8192
+        )
+        self.fast_agents = AgentPool(self._create_fast_agent)
+
+        # "batch" writes every card in one call; "per_card" makes one small concurrent call per card
+        self.writing_mode = get_setting("LIBRARIAN_WRITING_MODE", "batch")
+        if self.writing_mode not in WRITING_MODES:
+            logger.warning(f"Unknown writing mode '{self.writing_mode}' - using 'batch'")
+            self.writing_mode = "batch"
+        # Cards written one at a time, per seed, candidate, rank and user selection
+        self.card_cache: TTLCache[RecommendationCard] = TTLCache(
+            "recommendation cards",
+            ttl_seconds=get_float_setting("LIBRARIAN_CARD_CACHE_TTL_SECONDS", 24 * 3600),
+            max_entries=get_int_setting("LIBRARIAN_CARD_CACHE_MAX_ENTRIES", 20000),
+        )
+
+    def _create_agent(self) -> Agent:
+        """Create a writing agent (the pool creates extras for concurrent calls)."""
+        return Agent(
             model=self.model,
             system_prompt=self.system_prompt,
             tools=[]  # No tools needed for writing
         )
+
+    def _create_fast_agent(self) -> Agent:
+        """Create a writing agent on the smaller model for short deadlines."""
+        return Agent(model=self.fast_model, system_prompt=self.system_prompt, tools=[])
+
+    @staticmethod
+    def fallback_card(candidate: RankedCandidate) -> RecommendationCard:
+        """Plain card built from the ranker's reasoning when no copy could be written."""
+        return RecommendationCard(
+            title=candidate.title,
+            author=candidate.author,
+            rank=candidate.rank,
+            confidence_score=candidate.confidence_score,
+            why_it_matches=candidate.reasoning,
+            what_is_fresh="",
+            dna=None,
+            book_id=candidate.book_id,
+            thumbnail=candidate.thumbnail
+        )
+
+    def _reasoning_cards(self, ranking: RankingResponse) -> RecommendationResponse:
+        """Plain cards built from the ranker's reasoning when there is no time to write copy."""
+        recommendations = [self.fallback_card(candidate) for candidate in ranking.candidates]
+        return RecommendationResponse(
+            recommendations=recommendations,
+            total_analyzed=ranking.total_analyzed,
+            failed_analyses=ranking.failed_analyses,
+            partial=True
+        )
     
-    def _build_candidate_summaries(self, ranking: RankingResponse) -> str:
-        """Build candidate DNA summaries for empathetic writing."""
+    def _build_candidate_summaries(
+        self,
+        ranking: RankingResponse,
+        selected_pillars: list[str] | None = None,
+        compact: bool = True
+    ) -> str:
+        """Build candidate DNA summaries for empathetic writing.
+
+        Only the selected pillars are given in full; the rest are summarized.
+        Without a selection every pillar is given in full.
+        """
+        if selected_pillars is None:
+            selected_pillars, compact = [], False
         candidate_summaries = []
         for candidate in ranking.candidates:
             if candidate.dna:
@@ -62,14 +150,7 @@ class RecommendationsWriter:
                     author=candidate.author,
                     confidence_score=candidate.confidence_score,
                     reasoning=candidate.reasoning,
-                    genre=candidate.dna.genre,
-                    setting=candidate.dna.setting.full_text,
-                    narrative_engine=candidate.dna.narrative_engine.full_text,
-                    prose_texture=candidate.dna.prose_texture.full_text,
-                    emotional_profile=candidate.dna.emotional_profile.full_text,
-                    structural_quirks=candidate.dna.structural_quirks.full_text,
-                    theme=candidate.dna.theme.full_text,
-                    dealbreakers=', '.join(candidate.dna.dealbreakers)
+                    dna_text=format_dna_for_prompt(candidate.dna, selected_pillars, compact=compact)
                 )
             else:
                 summary = self.candidate_summary_failed_template.format(
@@ -89,9 +170,18 @@ class RecommendationsWriter:
         seed_dna: BookDNAResponse,
         ranking: RankingResponse,
         selected_pillars: list[str],
-        dealbreakers: list[str]
+        dealbreakers: list[str],
+        deadline: Deadline | None = None,
+        mode: str | None = None
     ) -> RecommendationResponse:
-        """Transform ranked candidates into empathetic recommendation copy."""
+        """Transform ranked candidates into empathetic recommendation copy.
+
+        Uses the smaller model when the deadline is short, and falls back to
+        the ranker's reasoning if the copy can't be written in time.
+        ``mode`` ("batch" or "per_card") overrides the configured writing mode.
+        """
+        if (mode or self.writing_mode) == "per_card" and ranking.candidates:
+            return await self._write_cards(seed_dna, ranking, selected_pillars, dealbreakers, deadline)
         try:
             logger.info(f"RECOMMENDATIONS WRITER: Creating empathetic copy for {len(ranking.candidates)} recommendations", extra={'step': True})
 
@@ -110,7 +200,7 @@ class RecommendationsWriter:
             dealbreaker_text = ', '.join(dealbreakers) if dealbreakers else 'None'
 
             # Build candidate summaries for empathetic writing
-            candidates_text = self._build_candidate_summaries(ranking)
+            candidates_text = self._build_candidate_summaries(ranking, selected_pillars)
 
             # Create empathetic writing prompt
             prompt = self.task_prompt_template.format(
@@ -123,35 +213,48 @@ class RecommendationsWriter:
 
             logger.info(f"Writing empathetic recommendations...", extra={'query': True})
             logger.info(f"Prompt: {prompt}...", extra={'query': True})
+            log_prompt_size(
+                "Writing", prompt, [candidates_text],
+                [self._build_candidate_summaries(ranking, selected_pillars, compact=False)]
+            )
 
-            # Execute empathetic writing (async)
-            result = await self.agent.invoke_async(
+            # Execute empathetic writing (async), on the smaller model if time is short
+            short_on_time = deadline is not None and not deadline.can_afford("writing", 20.0)
+            result = await invoke_agent(
+                self.fast_agents if short_on_time else self.agents,
                 prompt,
-                structured_output_model=RecommendationOutput
+                RecommendationOutput,
+                stage="writing_fast" if short_on_time else "writing",
+                priority=Priority.STANDARD,
+                deadline=deadline
             )
 
             llm_output = result.structured_output
             logger.info(f"✓ Empathetic copy generated for {len(llm_output.recommendations)} recommendations", extra={'response': True})
 
-            # Convert to final response format
-            recommendations = [
-                RecommendationCard(
+            # Convert to final response format, with volume ids and covers from the ranking
+            ranked = {work_key(c.title, c.author): c for c in ranking.candidates}
+            recommendations = []
+            for rec in llm_output.recommendations:
+                candidate = ranked.get(work_key(rec.title, rec.author))
+                recommendations.append(RecommendationCard(
                     title=rec.title,
                     author=rec.author,
                     rank=rec.rank,
                     confidence_score=rec.confidence_score,
                     why_it_matches=rec.why_it_matches,
                     what_is_fresh=rec.what_is_fresh,
-                    dna=None  # Not needed by frontend
-                )
-                for rec in llm_output.recommendations
-            ]
+                    dna=None,  # Not needed by frontend
+                    book_id=candidate.book_id if candidate else None,
+                    thumbnail=candidate.thumbnail if candidate else None
+                ))
 
             # Create final response
             response = RecommendationResponse(
                 recommendations=recommendations,
                 total_analyzed=ranking.total_analyzed,
-                failed_analyses=ranking.failed_analyses
+                failed_analyses=ranking.failed_analyses,
+                partial=ranking.partial
             )
 
             # Log the empathetic copy
@@ -163,6 +266,9 @@ class RecommendationsWriter:
             logger.info(f"Recommendations writing completed successfully", extra={'response': True})
             return response
 
+        except DeadlineExceededError:
+            logger.warning("Deadline reached before copy was written - using ranking reasoning")
+            return self._reasoning_cards(ranking)
         except StructuredOutputException as e:
             logger.error(f"Structured output failed for recommendations writing: {e}")
             return RecommendationResponse(
@@ -176,4 +282,260 @@ class RecommendationsWriter:
                 recommendations=[],
                 total_analyzed=ranking.total_analyzed,
                 failed_analyses=ranking.failed_analyses
-            )
\ No newline at end of file
+            )
+
+    async def _write_cards(
+        self,
+        seed_dna: BookDNAResponse,
+        ranking: RankingResponse,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None
+    ) -> RecommendationResponse:
+        """Write every card with its own concurrent call; a failed card falls back on its own."""
+        logger.info(f"RECOMMENDATIONS WRITER: Writing {len(ranking.candidates)} cards concurrently", extra={'step': True})
+        cards = await asyncio.gather(*(
+            self.write_card(seed_dna, candidate, selected_pillars, dealbreakers, deadline=deadline)
+            for candidate in ranking.candidates
+        ))
+        failed = sum(1 for card in cards if card is None)
+        if failed:
+            logger.warning(f"{failed} of {len(cards)} cards fell back to ranking reasoning")
+        return RecommendationResponse(
+            recommendations=[
+                card if card is not None else self.fallback_card(candidate)
+                for card, candidate in zip(cards, ranking.candidates)
+            ],
+            total_analyzed=ranking.total_analyzed,
+            failed_analyses=ranking.failed_analyses,
+            partial=ranking.partial or failed > 0
+        )
+
+    @staticmethod
+    def _card_key(
+        seed_dna: BookDNAResponse,
+        candidate: RankedCandidate,
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> tuple:
+        """Cache key for a card; the rank is included because the copy explains it."""
+        return (
+            seed_key(seed_dna), work_key(candidate.title, candidate.author), candidate.rank,
+            tuple(sorted(selected_pillars)), tuple(sorted(dealbreakers))
+        )
+
+    def _card_prompt(
+        self,
+        seed_dna: BookDNAResponse,
+        candidate: RankedCandidate,
+        selected_pillars: list[str],
+        dealbreakers: list[str]
+    ) -> str:
+        """Task prompt for a single card."""
+        single = RankingResponse(candidates=[candidate], total_analyzed=1, failed_analyses=0)
+        return self.card_task_prompt_template.format(
+            seed_title=seed_dna.title,
+            seed_author=getattr(seed_dna, 'author', 'Unknown'),
+            pillar_text='\n'.join(f"- {desc}" for desc in build_pillar_descriptions(seed_dna, selected_pillars)),
+            dealbreaker_text=', '.join(dealbreakers) if dealbreakers else 'None',
+            candidate_text=self._build_candidate_summaries(single, selected_pillars),
+            rank_word=_ordinal(candidate.rank)
+        )
+
+    async def write_card(
+        self,
+        seed_dna: BookDNAResponse,
+        candidate: RankedCandidate,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None
+    ) -> RecommendationCard | None:
+        """Write the copy for a single ranked candidate.
+
+        Used when cards are written as soon as each candidate's rank is
+        known. Returns None if the copy could not be written, so the caller
+        can fall back to ``fallback_card`` for just that card. Written cards
+        are cached per seed, candidate, rank and user selection.
+        """
+        key = self._card_key(seed_dna, candidate, selected_pillars, dealbreakers)
+        cached = self.card_cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached card #{candidate.rank}: '{candidate.title}'", extra={'response': True})
+            return cached.model_copy(update={
+                'confidence_score': candidate.confidence_score,
+                'book_id': candidate.book_id,
+                'thumbnail': candidate.thumbnail
+            })
+        try:
+            logger.info(f"Writing card #{candidate.rank}: '{candidate.title}'", extra={'query': True})
+            prompt = self._card_prompt(seed_dna, candidate, selected_pillars, dealbreakers)
+
+            short_on_time = deadline is not None and not deadline.can_afford("writing_card", 15.0)
+            result = await invoke_agent(
+                self.fast_agents if short_on_time else self.agents,
+                prompt,
+                LLMRecommendation,
+                stage="writing_card_fast" if short_on_time else "writing_card",
+                priority=Priority.STANDARD,
+                deadline=deadline
+            )
+            rec = result.structured_output
+
+            # Title, rank and score come from the ranking, not the LLM
+            card = RecommendationCard(
+                title=candidate.title,
+                author=candidate.author,
+                rank=candidate.rank,
+                confidence_score=candidate.confidence_score,
+                why_it_matches=rec.why_it_matches,
+                what_is_fresh=rec.what_is_fresh,
+                dna=None,  # Not needed by frontend
+                book_id=candidate.book_id,
+                thumbnail=candidate.thumbnail
+            )
+            logger.info(f"✓ Card #{card.rank} written: '{card.title}'", extra={'response': True})
+            self.card_cache.set(key, card)
+            return card
+
+        except DeadlineExceededError:
+            logger.warning(f"Deadline reached before card '{candidate.title}' was written")
+            return None
+        except StructuredOutputException as e:
+            logger.error(f"Structured output failed for card '{candidate.title}': {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Card writing failed for '{candidate.title}': {e}")
+            return None
+
+    async def stream_card(
+        self,
+        seed_dna: BookDNAResponse,
+        candidate: RankedCandidate,
+        selected_pillars: list[str],
+        dealbreakers: list[str],
+        deadline: Deadline | None = None
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Stream the copy for a single ranked candidate as it is generated.
+
+        Yields ``(section, text)`` pairs, where section is ``"why_it_matches"``
+        or ``"what_is_fresh"``. The card is asked for as plain text with
+        section markers rather than structured output, so each section can
+        be shown while it is still being written. A completed card is cached
+        like ``write_card``'s, and a cached card is replayed one section at a time.
+
+        Raises:
+            ProviderUnavailableError: If the Gemini breaker is open
+            DeadlineExceededError: If the deadline passes mid-card
+        """
+        key = self._card_key(seed_dna, candidate, selected_pillars, dealbreakers)
+        cached = self.card_cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached card #{candidate.rank}: '{candidate.title}'", extra={'response': True})
+            yield "why_it_matches", cached.why_it_matches
+            if cached.what_is_fresh:
+                yield "what_is_fresh", cached.what_is_fresh
+            return
+
+        logger.info(f"Streaming card #{candidate.rank}: '{candidate.title}'", extra={'query': True})
+        prompt = self._card_prompt(seed_dna, candidate, selected_pillars, dealbreakers)
+        prompt = f"{prompt}\n\n{self.card_stream_format}"
+        short_on_time = deadline is not None and not deadline.can_afford("writing_card", 15.0)
+
+        parser = _CardSectionParser()
+        sections = {"why_it_matches": "", "what_is_fresh": ""}
+        chunks = stream_agent_text(
+            self.fast_agents if short_on_time else self.agents,
+            prompt,
+            stage="writing_card_fast" if short_on_time else "writing_card",
+            priority=Priority.STANDARD,
+            deadline=deadline
+        )
+        async for chunk in chunks:
+            for section, text in parser.feed(chunk):
+                sections[section] += text
+                yield section, text
+        for section, text in parser.close():
+            sections[section] += text
+            yield section, text
+
+        if not sections["why_it_matches"].strip():
+            logger.warning(f"Streamed card '{candidate.title}' had no copy")
+            return
+        card = RecommendationCard(
+            title=candidate.title,
+            author=candidate.author,
+            rank=candidate.rank,
+            confidence_score=candidate.confidence_score,
+            why_it_matches=sections["why_it_matches"].strip(),
+            what_is_fresh=sections["what_is_fresh"].strip(),
+            dna=None,
+            book_id=candidate.book_id,
+            thumbnail=candidate.thumbnail
+        )
+        logger.info(f"✓ Card #{card.rank} streamed: '{card.title}'", extra={'response': True})
+        self.card_cache.set(key, card)
+
+
+class _CardSectionParser:
+    """Splits streamed card text on its section markers, holding back a possibly split marker."""
+
+    MARKERS = (("WHY IT MATCHES:", "why_it_matches"), ("WHAT IS FRESH:", "what_is_fresh"))
+
+    def __init__(self):
+        self.section: str | None = None
+        self._buffer = ""
+        self._section_start = False
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """Section text that is safe to emit after adding a chunk."""
+        self._buffer += text
+        out: list[tuple[str, str]] = []
+        while True:
+            hits = [(self._buffer.find(marker), marker, name) for marker, name in self.MARKERS]
+            hits = [hit for hit in hits if hit[0] != -1]
+            if not hits:
+                break
+            position, marker, name = min(hits)
+            self._emit(out, self._buffer[:position])
+            self.section = name
+            self._section_start = True
+            self._buffer = self._buffer[position + len(marker):]
+
+        held = self._held_back()
+        self._emit(out, self._buffer[:len(self._buffer) - held])
+        self._buffer = self._buffer[len(self._buffer) - held:]
+        return out
+
+    def close(self) -> list[tuple[str, str]]:
+        """Whatever section text is left once the stream ends."""
+        out: list[tuple[str, str]] = []
+        self._emit(out, self._buffer)
+        self._buffer = ""
+        return out
+
+    def _held_back(self) -> int:
+        """Length of the buffer's tail that could be the start of a marker."""
+        for length in range(min(len(self._buffer), max(len(m) for m, _ in self.MARKERS) - 1), 0, -1):
+            tail = self._buffer[-length:]
+            if any(marker.startswith(tail) for marker, _ in self.MARKERS):
+                return length
+        return 0
+
+    def _emit(self, out: list[tuple[str, str]], text: str) -> None:
+        # Text before the first marker is preamble and is dropped
+        if self.section is None:
+            return
+        if self._section_start:
+            text = text.lstrip()
+            if not text:
+                return
+            self._section_start = False
+        if text:
+            out.append((self.section, text))
+
+
+_ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth"]
+
+
+def _ordinal(rank: int) -> str:
+    return _ORDINALS[rank - 1] if 1 <= rank <= len(_ORDINALS) else f"#{rank}"
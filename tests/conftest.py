@@ -11,11 +11,35 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from helpers import make_book_dna, make_candidate_list, make_ranking_response, make_book_metadata
 
+from librarian.ranking import tavily_tool
+from librarian.shared.resilience import circuit_breaker, rate_limiter
+from librarian.shared.resilience.latency import latency_tracker
+from librarian.shared.resilience.speculation import speculator
+from librarian.shared.works import works
+
 
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(autouse=True)
+def reset_resilience_state():
+    """Process-wide breakers, limiters, latencies, speculative work, search results and work keys must not leak between tests."""
+    circuit_breaker._breakers.clear()
+    rate_limiter._limiters.clear()
+    latency_tracker.reset()
+    speculator.reset()
+    tavily_tool._results_cache = None
+    works.reset()
+    yield
+    circuit_breaker._breakers.clear()
+    rate_limiter._limiters.clear()
+    latency_tracker.reset()
+    speculator.reset()
+    tavily_tool._results_cache = None
+    works.reset()
+
+
 @pytest.fixture
 def sample_dna():
     return make_book_dna()
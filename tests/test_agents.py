@@ -1,5 +1,7 @@
 """Tests for all agent classes with mocked Strands Agent."""
 
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from strands.types.exceptions import StructuredOutputException
@@ -10,17 +12,22 @@ from librarian.ranking.models import (
     CandidateBook,
     RankingOutput,
     RankedCandidateOutput,
+    RankingResponse,
 )
 from librarian.writing.models import (
     LLMRecommendation,
     RecommendationOutput,
 )
 from librarian.seed.models import ParsedBookQuery
+from librarian.shared.exceptions import DeadlineExceededError, ProviderUnavailableError
+from librarian.shared.resilience.deadline import Deadline
 
 from helpers import (
     FakeAgentResult,
     make_book_dna,
+    make_book_metadata,
     make_candidate_list,
+    make_dna_pillar,
     make_mock_agent,
     make_ranking_response,
 )
@@ -89,6 +96,144 @@ class TestBookAnalyzer:
         assert result.title == "Project Hail Mary"
         mock_agent.invoke_async.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_stream_analysis_yields_pillars_as_they_complete(self):
+        fake_dna = make_book_dna(book_id="placeholder", title="placeholder")
+        text = fake_dna.model_dump_json(exclude={"analyzed_pillars"})
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+        seen_before_result = []
+
+        async def stream_async(prompt, structured_output_model=None):
+            tool_use = {"toolUseId": "t1", "name": "BookDNAResponse"}
+            for chunk in chunks:
+                yield {"type": "tool_use_stream", "delta": {"toolUse": {"input": chunk}}, "current_tool_use": tool_use}
+            seen_before_result.extend(fields)
+            yield {"result": FakeAgentResult(fake_dna.model_copy())}
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = MagicMock()
+                mock_agent.stream_async = MagicMock(side_effect=stream_async)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        fields = []
+        async for field, value in analyzer.stream_analysis("Project Hail Mary", "Andy Weir", "book-123"):
+            fields.append(field)
+            if field == "theme":
+                assert value.summary == "Identity"
+
+        # Every pillar arrived before the final result, and the result was cached
+        assert {"setting", "theme", "dealbreakers"} <= set(seen_before_result)
+        assert fields[-1] == "dna"
+        assert len(fields) == len(set(fields))
+        assert analyzer.cached_dna("Project Hail Mary", "Andy Weir").book_id == "book-123"
+
+    @pytest.mark.asyncio
+    async def test_stream_analysis_stops_on_failure(self):
+        async def stream_async(prompt, structured_output_model=None):
+            raise RuntimeError("provider down")
+            yield
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = MagicMock()
+                mock_agent.stream_async = MagicMock(side_effect=stream_async)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        assert [part async for part in analyzer.stream_analysis("Project Hail Mary", "Andy Weir", "book-123")] == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error", [ProviderUnavailableError("gemini"), DeadlineExceededError("analysis")])
+    async def test_analyze_propagates_breaker_and_deadline_errors(self, error):
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent"):
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        with patch("librarian.analysis.book_analyzer.invoke_agent", AsyncMock(side_effect=error)):
+            with pytest.raises(type(error)):
+                await analyzer.analyze("Project Hail Mary", "Andy Weir", "book-123")
+
+    @pytest.mark.asyncio
+    async def test_analyze_reuses_cached_dna(self):
+        fake_dna = make_book_dna(book_id="placeholder", title="placeholder")
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(fake_dna)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        await analyzer.analyze("Project Hail Mary", "Andy Weir", "book-123")
+        result = await analyzer.analyze("project hail mary", "Andy Weir")
+
+        mock_agent.invoke_async.assert_awaited_once()
+        assert result.book_id == "candidate_project_hail_mary"
+        assert analyzer.cached_dna("Project Hail Mary", "Andy Weir") is not None
+
+    @pytest.mark.asyncio
+    async def test_analyze_shares_dna_across_editions(self):
+        """Another edition, a reversed author name or a volume sharing an ISBN reuses the analysis."""
+        from librarian.shared.works import works
+
+        fake_dna = make_book_dna(book_id="placeholder", title="placeholder")
+        reissue = make_book_metadata(book_id="vol-reissue", title="Hail Mary Omnibus", author="Andy Weir")
+        reissue.isbns = ["9780593135204"]
+        original = make_book_metadata(book_id="vol-original", title="Project Hail Mary", author="Andy Weir")
+        original.isbns = ["9780593135204"]
+        works.register(original)
+        works.register(reissue)
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(fake_dna)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        await analyzer.analyze("Project Hail Mary", "Andy Weir", "vol-original")
+        await analyzer.analyze("Project Hail Mary (Deluxe Edition)", "Weir, Andy")
+        result = await analyzer.analyze("Hail Mary Omnibus", "Andy Weir", "vol-reissue")
+
+        mock_agent.invoke_async.assert_awaited_once()
+        assert result.book_id == "vol-reissue"
+
+    @pytest.mark.asyncio
+    async def test_analyze_scoped_to_pillars(self):
+        from librarian.analysis.models import partial_dna_model
+
+        partial = partial_dna_model(("theme",))(
+            genre="Fantasy", theme=make_dna_pillar("Power and grief", "Power"), dealbreakers=["Info dumps"]
+        )
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(partial)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+        result = await analyzer.analyze("Some Title", "Author", pillars=["theme"])
+
+        assert result.theme.summary == "Power"
+        assert result.analyzed_pillars == ["theme"]
+        assert mock_agent.invoke_async.call_args.kwargs["structured_output_model"].__name__ == "PartialBookDNA"
+        assert "Only these pillars are needed for this analysis: theme." in mock_agent.invoke_async.call_args.args[0]
+
+        # Served from cache for the same scope, but not for a full analysis
+        await analyzer.analyze("Some Title", "Author", pillars=["theme"])
+        assert mock_agent.invoke_async.await_count == 1
+        assert analyzer.cached_dna("Some Title", "Author") is None
+
     @pytest.mark.asyncio
     async def test_analyze_generates_id_when_missing(self):
         fake_dna = make_book_dna()
@@ -135,6 +280,54 @@ class TestBookAnalyzer:
         assert result is None
 
 
+    @pytest.mark.asyncio
+    async def test_analyze_without_search_when_exa_breaker_open(self):
+        fake_dna = make_book_dna()
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model"):
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(fake_dna)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+                with patch("librarian.analysis.book_analyzer.provider_available", return_value=False):
+                    result = await analyzer.analyze("Dune", "Frank Herbert", "dune-1")
+
+                # The fallback agent is created without any search tools
+                assert MockAgent.call_args.kwargs["tools"] == []
+
+        assert result is not None
+        prompt = mock_agent.invoke_async.call_args[0][0]
+        assert "do not call any tools" in prompt
+        # Knowledge-only DNA is not cached, so it is upgraded once Exa recovers
+        assert analyzer.cached_dna("Dune", "Frank Herbert", book_id="dune-1") is None
+
+
+    @pytest.mark.asyncio
+    async def test_analyze_uses_fast_agent_when_deadline_short(self):
+        fake_dna = make_book_dna()
+
+        with patch("librarian.analysis.book_analyzer.create_gemini_model") as mock_create:
+            with patch("librarian.analysis.book_analyzer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(fake_dna)
+                MockAgent.return_value = mock_agent
+
+                from librarian.analysis.book_analyzer import BookAnalyzer
+                analyzer = BookAnalyzer()
+
+                result = await analyzer.analyze("Dune", "Frank Herbert", deadline=Deadline(5.0))
+
+                # The short-deadline agent runs on the smaller model without search tools
+                assert MockAgent.call_args.kwargs["model"] is analyzer.fast_model
+                assert MockAgent.call_args.kwargs["tools"] == []
+
+        assert result is not None
+        assert mock_create.call_args_list[-1].kwargs["model_id"] == "gemini-2.5-flash-lite"
+        assert analyzer.cached_dna("Dune", "Frank Herbert") is None
+
+
 # ---------------------------------------------------------------------------
 # CandidatesFinder
 # ---------------------------------------------------------------------------
@@ -158,8 +351,8 @@ class TestCandidatesFinder:
         result = await finder.find_candidates(seed_dna, ["prose_texture", "theme"], ["Love triangles"])
 
         assert result is not None
-        # Should return top 3 even though agent returned 5
-        assert len(result.candidates) == 3
+        # The whole pool goes to the ranker's funnel
+        assert len(result.candidates) == 5
         assert result.candidates[0].title == "Book 1"
 
     @pytest.mark.asyncio
@@ -202,6 +395,85 @@ class TestCandidatesFinder:
         assert "Dune" in prompt
 
 
+    @pytest.mark.asyncio
+    async def test_find_candidates_asks_for_wide_pool(self):
+        with patch("librarian.ranking.candidates_finder.create_gemini_model"):
+            with patch("librarian.ranking.candidates_finder.Agent") as MockAgent:
+                mock_agent = make_mock_agent(make_candidate_list(n=25))
+                MockAgent.return_value = mock_agent
+
+                from librarian.ranking.candidates_finder import CandidatesFinder
+                finder = CandidatesFinder()
+
+        result = await finder.find_candidates(make_book_dna(), ["theme"], [])
+
+        assert "exactly 20 books" in mock_agent.invoke_async.call_args[0][0]
+        assert len(result.candidates) == 20
+
+    @pytest.mark.asyncio
+    async def test_find_candidates_searches_per_pillar_and_dedupes_works(self):
+        found = CandidateList(candidates=[
+            CandidateBook(title="Other Book", author="Jane Smith", source_snippet="S"),
+            CandidateBook(title="Test Book: A Novel", author="Seed Author", source_snippet="S"),
+            CandidateBook(title="Other Book (Anniversary Edition)", author="J. Smith", source_snippet="S"),
+            CandidateBook(title="Third Book", author="Ann Lee", source_snippet="S"),
+        ])
+        with patch("librarian.ranking.candidates_finder.create_gemini_model"):
+            with patch("librarian.ranking.candidates_finder.Agent") as MockAgent:
+                mock_agent = make_mock_agent(found)
+                MockAgent.return_value = mock_agent
+
+                from librarian.ranking.candidates_finder import CandidatesFinder
+                finder = CandidatesFinder()
+
+        seed_dna = make_book_dna().model_copy(update={"author": "Seed Author"})
+        result = await finder.find_candidates(seed_dna, ["theme", "structural_quirks", "prose_texture", "setting"], [])
+
+        prompt = mock_agent.invoke_async.call_args[0][0]
+        assert 'books similar to "Test Book" recommendations' in prompt
+        # The three highest-priority pillars get a search each
+        assert 'books like "Test Book" Sparse prose' in prompt
+        assert 'books like "Test Book" Identity' in prompt
+        assert 'books like "Test Book" Gritty NYC' in prompt
+        assert 'books like "Test Book" Linear' not in prompt
+        assert [c.title for c in result.candidates] == ["Other Book", "Third Book"]
+
+    @pytest.mark.asyncio
+    async def test_find_candidates_asks_for_smaller_pool_when_deadline_short(self):
+        with patch("librarian.ranking.candidates_finder.create_gemini_model"):
+            with patch("librarian.ranking.candidates_finder.Agent") as MockAgent:
+                mock_agent = make_mock_agent(make_candidate_list(n=5))
+                MockAgent.return_value = mock_agent
+
+                from librarian.ranking.candidates_finder import CandidatesFinder
+                finder = CandidatesFinder()
+
+                # The short-deadline agent is created on first use
+                result = await finder.find_candidates(make_book_dna(), ["theme"], [], deadline=Deadline(5.0))
+
+        assert "exactly 5 real, published books" in mock_agent.invoke_async.call_args[0][0]
+        assert len(result.candidates) == 5
+
+    @pytest.mark.asyncio
+    async def test_candidate_prefetch_warms_pillar_neutral_pool_within_caps(self):
+        from librarian.ranking.prefetch import CandidatePrefetcher
+        from librarian.shared.resilience.rate_limiter import Priority
+
+        finder = MagicMock()
+        finder.find_candidates = AsyncMock(return_value=make_candidate_list(n=5))
+        dna_prefetcher = MagicMock()
+        prefetcher = CandidatePrefetcher(finder, dna_prefetcher)
+
+        assert prefetcher.prefetch(make_book_dna(), "group-1")
+        await asyncio.sleep(0.05)
+
+        kwargs = finder.find_candidates.call_args.kwargs
+        assert kwargs["priority"] == Priority.SPECULATIVE
+        assert kwargs["pool_size"] == 5
+        pairs, group, limit = dna_prefetcher.prefetch_candidates.call_args.args
+        assert len(pairs) == 5 and group == "group-1" and limit == 3
+
+
 # ---------------------------------------------------------------------------
 # BookRanker
 # ---------------------------------------------------------------------------
@@ -259,6 +531,63 @@ class TestBookRanker:
         assert len(result.candidates) == 0
         assert result.failed_analyses == 2
 
+    @pytest.mark.asyncio
+    async def test_candidate_deadline_error_does_not_abort_the_batch(self):
+        """One candidate running out of time counts as a failed analysis; the others are still ranked."""
+        async def analyze(title, author, **kwargs):
+            if title == "Book 1":
+                raise DeadlineExceededError("analysis")
+            return make_book_dna(book_id="candidate_placeholder", title=title)
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                MockAgent.return_value = make_mock_agent(None)
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(side_effect=analyze)
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        result = await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=2), ["theme"], [], mode="fast")
+
+        assert [c.title for c in result.candidates] == ["Book 2"]
+        assert result.failed_analyses == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_after_ranking_failure_resumes_from_checkpointed_analyses(self):
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=1, confidence_score=90.0, reasoning="Top match"),
+        ])
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        analyses = {}
+        succeed = mock_agent.invoke_async.return_value
+        mock_agent.invoke_async.side_effect = [StructuredOutputException("failed"), succeed]
+
+        failed = await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=2), ["theme"], [], analyses=analyses)
+        assert failed.candidates == []
+        assert set(analyses) == {ranker.candidate_key("Book 1", "Author 1"), ranker.candidate_key("Book 2", "Author 2")}
+
+        result = await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=2), ["theme"], [], analyses=analyses)
+        assert result.candidates[0].title == "Book 1"
+        assert mock_analyzer_instance.analyze.await_count == 2  # Only the first attempt analyzed
+
     @pytest.mark.asyncio
     async def test_rank_candidates_partial_analysis_failure(self):
         """When some analyses fail, should rank only successful ones."""
@@ -288,6 +617,466 @@ class TestBookRanker:
         assert result.failed_analyses == 1
 
 
+    @pytest.mark.asyncio
+    async def test_rank_candidates_keeps_search_order_when_out_of_time(self):
+        """With no time left for any analysis, candidates come back unranked in search order."""
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(None)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        candidates = make_candidate_list(n=3)
+        result = await ranker.rank_candidates(make_book_dna(), candidates, ["theme"], [], deadline=Deadline(1.0))
+
+        assert result.partial is True
+        # The funnel keeps fewer candidates when time is short
+        assert [c.title for c in result.candidates] == ["Book 1", "Book 2"]
+        assert result.candidates[0].reasoning == "Match reason 1"
+        mock_analyzer_instance.analyze.assert_not_called()
+        mock_agent.invoke_async.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rank_candidates_reuses_cached_match_scores(self):
+        """A repeat run scores only new candidates and merges in cached scores."""
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=1, confidence_score=70.0, reasoning="Decent match"),
+            RankedCandidateOutput(title="Book 2", author="Author 2", rank=2, confidence_score=60.0, reasoning="Weaker match"),
+        ])
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        seed_dna = make_book_dna()
+        await ranker.rank_candidates(seed_dna, make_candidate_list(n=2), ["theme", "prose_texture"], [])
+
+        mock_analyzer_instance.analyze.reset_mock()
+        mock_agent.invoke_async.reset_mock()
+        mock_agent.invoke_async.return_value = FakeAgentResult(RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 3", author="Author 3", rank=1, confidence_score=95.0, reasoning="Best match"),
+        ]))
+
+        # Same selection in a different order, plus one new candidate
+        result = await ranker.rank_candidates(seed_dna, make_candidate_list(n=3), ["prose_texture", "theme"], [])
+
+        assert mock_analyzer_instance.analyze.call_count == 1
+        assert mock_agent.invoke_async.call_count == 1
+        assert [c.title for c in result.candidates] == ["Book 3", "Book 1", "Book 2"]
+        assert [c.rank for c in result.candidates] == [1, 2, 3]
+        assert result.candidates[1].reasoning == "Decent match"
+        assert result.total_analyzed == 3
+
+    @pytest.mark.asyncio
+    async def test_funnel_analyzes_only_top_candidates_of_wide_pool(self):
+        """A wide pool is narrowed before analysis, favouring snippets that match the pillars."""
+        pool = make_candidate_list(n=8)
+        pool.candidates[6].source_snippet = "Identity and belonging explored with quiet depth"
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(RankingOutput(candidates=[]))
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        await ranker.rank_candidates(make_book_dna(), pool, ["theme"], [])
+
+        analyzed = [call.kwargs["title"] for call in mock_analyzer_instance.analyze.call_args_list]
+        assert len(analyzed) == 3
+        assert "Book 7" in analyzed
+        assert "Book 1" in analyzed
+
+    def test_first_stage_scores_rescale_snippet_and_dna_scores_apart(self):
+        """The best snippet match counts as much as the best cached DNA match."""
+        cached = make_book_dna(title="Book 1")
+        cached.theme = make_dna_pillar("Identity lost at sea", "Identity")
+        pool = make_candidate_list(n=3).candidates
+        pool[1].source_snippet = "Identity and belonging"
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent"):
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.cached_dna = MagicMock(
+                        side_effect=lambda title, author, scope=None: cached if title == "Book 1" else None
+                    )
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        ranker.FINDER_ORDER_WEIGHT = 0.0
+        scores = ranker._first_stage_scores(make_book_dna(), pool, ["theme"], [])
+        assert scores[0] == scores[1] == 100.0
+        assert scores[2] < 100.0
+
+    def test_prefilter_default_leaves_the_weakest_analysis_out(self):
+        """The pre-filter default sits below the analysis batch, so it always engages."""
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent"):
+                with patch("librarian.ranking.book_ranker.BookAnalyzer"):
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        assert ranker.prefilter_top_k == ranker.analysis_top_k - 1
+
+    @pytest.mark.asyncio
+    async def test_dealbreaker_filter_replaces_candidates_from_the_pool(self):
+        """A candidate whose cached DNA lists a dealbreaker makes way for the next one, unanalyzed."""
+        flagged = make_book_dna(title="Book 1")
+        flagged.dealbreakers = ["Heavy info-dumping"]
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                MockAgent.return_value = make_mock_agent(RankingOutput(candidates=[]))
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    mock_analyzer_instance.cached_dna = MagicMock(
+                        side_effect=lambda title, author, scope=None: flagged if title == "Book 1" else None
+                    )
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        pool = make_candidate_list(n=5)
+        await ranker.rank_candidates(make_book_dna(), pool, ["theme"], ["Info dumps"])
+
+        analyzed = [call.kwargs["title"] for call in mock_analyzer_instance.analyze.call_args_list]
+        assert analyzed == ["Book 2", "Book 3", "Book 4"]
+        assert ranker.funnel_order(make_book_dna(), pool, ["theme"], ["Info dumps"]).candidates[-1].title == "Book 1"
+
+        ranker.dealbreaker_filter = "drop"
+        order = ranker.funnel_order(make_book_dna(), pool, ["theme"], ["Info dumps"])
+        assert "Book 1" not in [c.title for c in order.candidates]
+
+        # A pool no bigger than the batch is screened too
+        mock_analyzer_instance.analyze.reset_mock()
+        await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=3), ["theme"], ["Info dumps"])
+        analyzed = [call.kwargs["title"] for call in mock_analyzer_instance.analyze.call_args_list]
+        assert sorted(analyzed) == ["Book 2", "Book 3"]
+
+    def test_funnel_order_drops_other_editions(self):
+        """Editions of the seed, and repeat editions of a candidate, are left out of the pool."""
+        from librarian.shared.works import works
+
+        works.register(make_book_metadata(book_id="seed-vol", title="Book 0", author="Author 0"))
+        pool = make_candidate_list(n=3)
+        pool.candidates[1].title = "Book 0 (Anniversary Edition)"
+        pool.candidates[2].title = "Book 1: A Novel"
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent"):
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        order = ranker.funnel_order(make_book_dna(book_id="seed-vol"), pool, ["theme"], [])
+
+        assert [c.title for c in order.candidates] == ["Book 1"]
+
+    @pytest.mark.asyncio
+    async def test_rank_candidates_resolves_volumes_alongside_analysis(self):
+        """Candidates are resolved in one batch while they are analyzed, and matches get ids and covers."""
+        started = asyncio.Event()
+
+        async def analyze(title, author, **kwargs):
+            await started.wait()  # Resolution must already be under way
+            return make_book_dna(book_id="candidate_placeholder", title=title)
+
+        async def resolve_many(books):
+            started.set()
+            return [
+                make_book_metadata(book_id=f"vol-{title[-1]}", title=title, author=author, thumbnail=f"http://{title[-1]}.jpg")
+                if title != "Book 2" else None
+                for title, author in books
+            ]
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                MockAgent.return_value = make_mock_agent(None)
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(side_effect=analyze)
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    books_api = MagicMock()
+                    books_api.resolve_many = AsyncMock(side_effect=resolve_many)
+                    ranker = BookRanker(books_api=books_api)
+
+        result = await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=2), ["theme"], [], mode="fast")
+
+        books_api.resolve_many.assert_awaited_once_with([("Book 1", "Author 1"), ("Book 2", "Author 2")])
+        by_title = {c.title: c for c in result.candidates}
+        assert by_title["Book 1"].book_id == "vol-1"
+        assert by_title["Book 1"].thumbnail == "http://1.jpg"
+        assert by_title["Book 1"].dna.book_id == "vol-1"
+        assert by_title["Book 2"].book_id is None
+
+    def test_rank_from_snippets_skips_analysis_and_llm(self):
+        """Snippet ranking uses the finder's explanations and only DNA that is already cached."""
+        pool = make_candidate_list(n=3)
+        pool.candidates[2].source_snippet = "Identity and belonging explored with quiet depth"
+        cached = make_book_dna(title="Book 2")
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(None)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock()
+                    mock_analyzer_instance.cached_dna = MagicMock(
+                        side_effect=lambda title, author, scope=None: cached if title == "Book 2" else None
+                    )
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        result = ranker.rank_from_snippets(make_book_dna(), pool, ["theme"], [])
+
+        # Cached DNA like the seed's outscores the snippets
+        assert result.candidates[0].title == "Book 2"
+        assert result.candidates[0].dna is cached
+        assert [c.rank for c in result.candidates] == [1, 2, 3]
+        book_3 = next(c for c in result.candidates if c.title == "Book 3")
+        assert book_3.reasoning == "Identity and belonging explored with quiet depth"
+        assert book_3.dna is None
+        assert result.total_analyzed == 1
+        mock_analyzer_instance.analyze.assert_not_called()
+        mock_agent.invoke_async.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fast_mode_ranks_by_local_similarity(self):
+        """Fast mode orders analyzed candidates by DNA similarity without calling the LLM."""
+        seed_dna = make_book_dna()
+        close = make_book_dna(title="Book 2")
+        far = make_book_dna(title="Book 1")
+        far.prose_texture = make_dna_pillar("Ornate gothic maximalism", "Ornate")
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(None)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(side_effect=[far, close])
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        result = await ranker.rank_candidates(seed_dna, make_candidate_list(n=2), ["prose_texture"], [], mode="fast")
+
+        assert [c.title for c in result.candidates] == ["Book 2", "Book 1"]
+        assert result.candidates[0].confidence_score > result.candidates[1].confidence_score
+        assert result.candidates[0].reasoning == "Match reason 2"
+        mock_agent.invoke_async.assert_not_called()
+        assert len(ranker.match_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_prefilter_limits_candidates_sent_to_llm(self):
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=1, confidence_score=90.0, reasoning="Match"),
+        ])
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        ranker.analysis_top_k = 4
+        ranker.prefilter_top_k = 2
+        result = await ranker.rank_candidates(make_book_dna(), make_candidate_list(n=4), ["theme"], [])
+
+        prompt = mock_agent.invoke_async.call_args.args[0]
+        assert prompt.count("Candidate ") == 2
+        assert result.total_analyzed == 4
+
+    @pytest.mark.asyncio
+    async def test_stream_matches_settles_clear_leader_early(self):
+        """In fast mode a candidate far ahead is yielded while the others are still being analyzed."""
+        seed_dna = make_book_dna()
+        weak = make_book_dna(title="Book 2")
+        weak.theme = make_dna_pillar("Space trade wars", "Trade wars")
+        release = asyncio.Event()
+        events = []
+
+        async def analyze(title, author, **kwargs):
+            events.append(f"analyze {title}")
+            if title == "Book 1":
+                return make_book_dna(title=title)
+            await release.wait()
+            events.append(f"analyzed {title}")
+            return weak
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(None)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(side_effect=analyze)
+                    mock_analyzer_instance.cached_dna = MagicMock(return_value=None)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        ranking = RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+        async for match in ranker.stream_matches(seed_dna, make_candidate_list(n=2), ["theme"], [], ranking=ranking, mode="fast"):
+            events.append(f"match {match.rank} {match.title}")
+            release.set()
+
+        # Both analyses start at once
+        assert events == ["analyze Book 1", "analyze Book 2", "match 1 Book 1", "analyzed Book 2", "match 2 Book 2"]
+        assert ranking.total_analyzed == 2
+        assert [c.title for c in ranking.candidates] == ["Book 1", "Book 2"]
+        mock_agent.invoke_async.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_matches_feeds_concurrent_analyses_to_the_llm_ranker(self):
+        """In llm mode every analysis runs at once and the LLM ranks them without analyzing again."""
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 2", author="Author 2", rank=1, confidence_score=80.0, reasoning="Closer"),
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=2, confidence_score=60.0, reasoning="Further"),
+        ])
+        running = 0
+        peak = 0
+
+        async def analyze(title, author, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return None if title == "Book 3" else make_book_dna(title=title)
+
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(side_effect=analyze)
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        ranking = RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+        matches = [
+            match async for match in ranker.stream_matches(
+                make_book_dna(), make_candidate_list(n=3), ["theme"], [], ranking=ranking, funnel=False, mode="llm"
+            )
+        ]
+
+        assert peak == 3
+        assert mock_analyzer_instance.analyze.await_count == 3
+        assert [(m.rank, m.title, m.reasoning) for m in matches] == [(1, "Book 2", "Closer"), (2, "Book 1", "Further")]
+        assert "Book 3" not in mock_agent.invoke_async.call_args.args[0]
+        assert ranking.total_analyzed == 2 and ranking.failed_analyses == 1
+
+    @pytest.mark.asyncio
+    async def test_match_cache_is_keyed_by_selection(self):
+        """Changing the dealbreakers invalidates cached match scores."""
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=1, confidence_score=70.0, reasoning="Match"),
+        ])
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        seed_dna = make_book_dna()
+        await ranker.rank_candidates(seed_dna, make_candidate_list(n=1), ["theme"], [])
+        await ranker.rank_candidates(seed_dna, make_candidate_list(n=1), ["theme"], ["Info dumps"])
+
+        assert mock_agent.invoke_async.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_match_cache_uses_the_pipeline_seed_key(self):
+        """Scores stay cached once the seed's volume is forgotten by the work registry."""
+        from librarian.shared.works import works
+
+        ranking_output = RankingOutput(candidates=[
+            RankedCandidateOutput(title="Book 1", author="Author 1", rank=1, confidence_score=70.0, reasoning="Match"),
+        ])
+        with patch("librarian.ranking.book_ranker.create_gemini_model"):
+            with patch("librarian.ranking.book_ranker.Agent") as MockAgent:
+                mock_agent = make_mock_agent(ranking_output)
+                MockAgent.return_value = mock_agent
+
+                with patch("librarian.ranking.book_ranker.BookAnalyzer") as MockAnalyzer:
+                    mock_analyzer_instance = MagicMock()
+                    mock_analyzer_instance.analyze = AsyncMock(return_value=make_book_dna())
+                    MockAnalyzer.return_value = mock_analyzer_instance
+
+                    from librarian.ranking.book_ranker import BookRanker
+                    ranker = BookRanker()
+
+        seed_dna = make_book_dna(book_id="b1").model_copy(update={"author": "Andy Weir"})
+        works.register(make_book_metadata(book_id="b1", title=seed_dna.title, author="Andy Weir"))
+        await ranker.rank_candidates(seed_dna, make_candidate_list(n=1), ["theme"], [])
+        works.reset()
+        await ranker.rank_candidates(seed_dna, make_candidate_list(n=1), ["theme"], [])
+
+        assert mock_agent.invoke_async.call_count == 1
+
+
 # ---------------------------------------------------------------------------
 # RecommendationsWriter
 # ---------------------------------------------------------------------------
@@ -390,4 +1179,149 @@ class TestRecommendationsWriter:
 
         summaries = writer._build_candidate_summaries(ranking)
         assert "No DNA Book" in summaries
-        assert "Analysis failed" in summaries
+        assert "DNA: Not available" in summaries
+
+    @pytest.mark.asyncio
+    async def test_write_card_uses_ranking_for_title_and_score(self):
+        llm_card = LLMRecommendation(
+            title="Wrong", author="Wrong", rank=9, confidence_score=1.0,
+            why_it_matches="Warm copy", what_is_fresh="Fresh angle"
+        )
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                mock_agent = make_mock_agent(llm_card)
+                MockAgent.return_value = mock_agent
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+        candidate = make_ranking_response(n=2).candidates[1]
+        card = await writer.write_card(make_book_dna(), candidate, ["theme"], [])
+
+        assert (card.title, card.rank, card.confidence_score) == ("Ranked Book 2", 2, 80.0)
+        assert card.why_it_matches == "Warm copy"
+        assert 'This book is ranked second because' in mock_agent.invoke_async.call_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_write_card_returns_none_on_failure(self):
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                mock_agent = MagicMock()
+                mock_agent.invoke_async = AsyncMock(side_effect=StructuredOutputException("failed"))
+                MockAgent.return_value = mock_agent
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+        candidate = make_ranking_response(n=1).candidates[0]
+        assert await writer.write_card(make_book_dna(), candidate, ["theme"], []) is None
+        assert writer.fallback_card(candidate).why_it_matches == "Strong pillar match"
+
+    @pytest.mark.asyncio
+    async def test_per_card_mode_isolates_failures_and_caches_cards(self):
+        async def invoke(prompt, **kwargs):
+            if "Ranked Book 2" in prompt:
+                raise StructuredOutputException("failed")
+            return FakeAgentResult(LLMRecommendation(
+                title="x", author="x", rank=1, confidence_score=0.0,
+                why_it_matches="Warm copy", what_is_fresh="Fresh angle"
+            ))
+
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                mock_agent = MagicMock()
+                mock_agent.invoke_async = AsyncMock(side_effect=invoke)
+                MockAgent.return_value = mock_agent
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+                # Per-card agents beyond the first are created on demand
+                ranking = make_ranking_response(n=3)
+                result = await writer.write_recommendations(make_book_dna(), ranking, ["theme"], [], mode="per_card")
+
+                assert [card.rank for card in result.recommendations] == [1, 2, 3]
+                assert result.recommendations[0].why_it_matches == "Warm copy"
+                assert result.recommendations[1].why_it_matches == "Strong pillar match"
+                assert result.partial is True
+
+                # Written cards are reused; only the failed one is retried
+                mock_agent.invoke_async.reset_mock()
+                await writer.write_recommendations(make_book_dna(), ranking, ["theme"], [], mode="per_card")
+                assert mock_agent.invoke_async.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_card_splits_sections_across_chunks(self):
+        chunks = ["Sure!\nWHY IT", " MATCHES:\nWarm ", "copy.\n\nWHAT IS FR", "ESH:\nFresh angle"]
+
+        async def stream_async(prompt):
+            for chunk in chunks:
+                yield {"data": chunk}
+
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                mock_agent = MagicMock()
+                mock_agent.stream_async = MagicMock(side_effect=stream_async)
+                MockAgent.return_value = mock_agent
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+        candidate = make_ranking_response(n=1).candidates[0]
+        parts = [part async for part in writer.stream_card(make_book_dna(), candidate, ["theme"], [])]
+
+        why = "".join(text for section, text in parts if section == "why_it_matches")
+        fresh = "".join(text for section, text in parts if section == "what_is_fresh")
+        assert (why.strip(), fresh) == ("Warm copy.", "Fresh angle")
+        assert "WHY IT MATCHES:" in mock_agent.stream_async.call_args.args[0]
+
+        # The finished card is cached and replayed without another call
+        replayed = [part async for part in writer.stream_card(make_book_dna(), candidate, ["theme"], [])]
+        assert replayed == [("why_it_matches", "Warm copy."), ("what_is_fresh", "Fresh angle")]
+        assert mock_agent.stream_async.call_count == 1
+
+    def test_build_candidate_summaries_compacts_unselected_pillars(self):
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                MockAgent.return_value = MagicMock()
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+        ranking = make_ranking_response(n=1)
+        compact = writer._build_candidate_summaries(ranking, ["theme"])
+        full = writer._build_candidate_summaries(ranking, ["theme"], compact=False)
+
+        assert "- Theme: Identity and belonging" in compact
+        assert "- Prose Texture (in brief): Sparse prose" in compact
+        assert "Sparse, precise prose" not in compact
+        assert "Sparse, precise prose" in full
+        assert len(compact) < len(full)
+
+    def test_compact_dna_omits_pillars_skipped_by_scoped_analysis(self):
+        from librarian.analysis.models import merge_partial_dna, partial_dna_model
+        from librarian.shared.utils import format_dna_for_prompt
+
+        partial = partial_dna_model(("theme",))(
+            genre="Fantasy", theme=make_dna_pillar("Power and grief", "Power"), dealbreakers=["Info dumps"]
+        )
+        text = format_dna_for_prompt(merge_partial_dna(partial, "id", "Book"), ["theme"])
+
+        assert text.splitlines() == ["- Genre: Fantasy", "- Theme: Power and grief", "- Dealbreakers: Info dumps"]
+
+
+    @pytest.mark.asyncio
+    async def test_write_recommendations_falls_back_to_reasoning_at_deadline(self):
+        with patch("librarian.writing.recommendations_writer.create_gemini_model"):
+            with patch("librarian.writing.recommendations_writer.Agent") as MockAgent:
+                MockAgent.return_value = make_mock_agent(None)
+
+                from librarian.writing.recommendations_writer import RecommendationsWriter
+                writer = RecommendationsWriter()
+
+        ranking = make_ranking_response(n=2)
+        result = await writer.write_recommendations(make_book_dna(), ranking, ["theme"], [], deadline=Deadline(0.0))
+
+        assert result.partial is True
+        assert [r.title for r in result.recommendations] == ["Ranked Book 1", "Ranked Book 2"]
+        assert result.recommendations[0].why_it_matches == "Strong pillar match"
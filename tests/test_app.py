@@ -1,5 +1,8 @@
 """Tests for FastAPI application endpoints."""
 
+import asyncio
+import json
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -11,6 +14,12 @@ from helpers import (
     make_candidate_list,
     make_ranking_response,
 )
+from librarian.analysis import DNAPrefetcher
+from librarian.pipeline import RecommendationPipeline
+from librarian.ranking import CandidatePrefetcher
+from librarian.shared.cache.artifact_store import ArtifactStore
+from librarian.shared.exceptions import DeadlineExceededError, ProviderUnavailableError
+from librarian.shared.resilience.speculation import speculator
 from librarian.ranking.models import CandidateList, CandidateBook
 from librarian.writing.models import (
     RecommendationCard,
@@ -33,6 +42,8 @@ def app_with_mocks():
     mock_book_analyzer = MagicMock()
     mock_candidates_finder = MagicMock()
     mock_book_ranker = MagicMock()
+    mock_book_ranker.funnel_order = lambda seed_dna, candidates, selected_pillars, dealbreakers: candidates
+    mock_book_ranker.analysis_batch_size = MagicMock(return_value=3)
     mock_recommendations_writer = MagicMock()
 
     app_module.books_api = mock_books_api
@@ -40,6 +51,12 @@ def app_with_mocks():
     app_module.candidates_finder = mock_candidates_finder
     app_module.book_ranker = mock_book_ranker
     app_module.recommendations_writer = mock_recommendations_writer
+    app_module.artifact_store = ArtifactStore()
+    app_module.dna_prefetcher = DNAPrefetcher(mock_book_analyzer)
+    app_module.candidate_prefetcher = CandidatePrefetcher(mock_candidates_finder, app_module.dna_prefetcher)
+    app_module.recommendation_pipeline = RecommendationPipeline(
+        mock_candidates_finder, mock_book_ranker, mock_recommendations_writer, app_module.render_recommendations
+    )
 
     return {
         "app": app_module.app,
@@ -64,6 +81,26 @@ class TestHomePage:
         assert response.status_code == 200
 
 
+# ---------------------------------------------------------------------------
+# API: Provider health
+# ---------------------------------------------------------------------------
+
+class TestAPIProviderHealth:
+    @pytest.mark.asyncio
+    async def test_exposes_breaker_state(self, app_with_mocks):
+        from librarian.shared.resilience.circuit_breaker import get_breaker
+        get_breaker("tavily")
+
+        app = app_with_mocks["app"]
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/health/providers")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["breakers"]["tavily"]["state"] == "closed"
+        assert "limiters" in data
+
+
 # ---------------------------------------------------------------------------
 # API: Book search
 # ---------------------------------------------------------------------------
@@ -160,6 +197,525 @@ class TestAPIAnalyze:
 
         assert response.status_code == 500
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error, status", [
+        (ProviderUnavailableError("gemini"), 503),
+        (DeadlineExceededError("analysis"), 504),
+    ])
+    async def test_analyze_maps_breaker_and_deadline_errors(self, app_with_mocks, error, status):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["books_api"].get_book = AsyncMock(return_value=make_book_metadata())
+        mocks["book_analyzer"].analyze = AsyncMock(side_effect=error)
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/books/book-1/analyze")
+
+        assert response.status_code == status
+
+
+class TestAnalyzePage:
+    @pytest.mark.asyncio
+    async def test_page_streams_shell_then_pillars(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+        dna = make_book_dna()
+
+        async def stream_analysis(title, author, book_id, deadline=None):
+            yield "theme", dna.theme
+            yield "dealbreakers", dna.dealbreakers
+            yield "dna", dna
+
+        mocks["books_api"].get_book = AsyncMock(return_value=make_book_metadata())
+        mocks["book_analyzer"].stream_analysis = stream_analysis
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/book/book-1/analyze")
+
+        assert response.status_code == 200
+        html = response.text
+        # Shell first, with placeholders, then the streamed fragments, then the page script
+        assert html.index("Analyzing…") < html.index('fillDna("theme")') < html.index("Deus ex machina")
+        assert html.index('fillDna("dealbreakers")') < html.index("selectedPillars = new Set()")
+        assert "getElementById('dna-status').remove()" in html
+        assert "</html>" in html
+
+    @pytest.mark.asyncio
+    async def test_page_reports_failed_analysis_in_place(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        async def stream_analysis(title, author, book_id, deadline=None):
+            return
+            yield
+
+        mocks["books_api"].get_book = AsyncMock(return_value=make_book_metadata())
+        mocks["book_analyzer"].stream_analysis = stream_analysis
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/book/book-1/analyze")
+
+        assert "Book analysis failed" in response.text
+        assert "getElementById('dna-status').remove()" not in response.text
+
+    @pytest.mark.asyncio
+    async def test_page_stops_waiting_for_a_warm_up_it_cannot_afford(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+        book = make_book_metadata(book_id="b0", title="Book 0")
+        dna = make_book_dna()
+        foreground = []
+
+        async def analyze(title, author, book_id, priority=None, deadline=None):
+            await asyncio.sleep(5)  # Queued behind real traffic
+
+        async def stream_analysis(title, author, book_id, deadline=None):
+            foreground.append(book_id)
+            yield "dna", dna
+
+        mocks["books_api"].search = AsyncMock(return_value=[book])
+        mocks["books_api"].get_book = AsyncMock(return_value=book)
+        mocks["book_analyzer"].cached_dna = MagicMock(return_value=None)
+        mocks["book_analyzer"]._dna_key = lambda title, author, book_id=None: f"{title}|{author}"
+        mocks["book_analyzer"].analyze = analyze
+        mocks["book_analyzer"].stream_analysis = stream_analysis
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/search?q=novel")
+            assert speculator.snapshot()["running"] == 1
+            # The page's budget leaves no time to wait for the warm-up
+            with patch.dict("os.environ", {"LIBRARIAN_ANALYZE_BUDGET_SECONDS": "20"}):
+                page = await asyncio.wait_for(client.get("/book/b0/analyze"), timeout=2)
+
+        assert page.status_code == 200
+        assert foreground == ["b0"]
+        assert speculator.snapshot()["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_search_prefetches_top_results_and_page_joins_them(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+        books = [make_book_metadata(book_id=f"b{i}", title=f"Book {i}") for i in range(5)]
+        dna = make_book_dna()
+        release = asyncio.Event()
+        prefetched = []
+
+        async def analyze(title, author, book_id, priority=None, deadline=None):
+            prefetched.append(book_id)
+            await release.wait()
+            return dna
+
+        async def stream_analysis(title, author, book_id, deadline=None):
+            yield "dna", dna
+
+        mocks["books_api"].search = AsyncMock(return_value=books)
+        mocks["books_api"].get_book = AsyncMock(return_value=books[0])
+        mocks["book_analyzer"].cached_dna = MagicMock(return_value=None)
+        mocks["book_analyzer"]._dna_key = lambda title, author, book_id=None: f"{title}|{author}"
+        mocks["book_analyzer"].analyze = analyze
+        mocks["book_analyzer"].stream_analysis = stream_analysis
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/search?q=novel")
+            assert response.status_code == 200
+            assert "librarian_speculation" in response.cookies
+            await asyncio.sleep(0)
+            assert prefetched == ["b0", "b1", "b2"]
+
+            # Opening the first result drops the other warm-ups and waits for its own
+            page = asyncio.ensure_future(client.get("/book/b0/analyze"))
+            await asyncio.sleep(0.05)
+            assert speculator.snapshot()["cancelled"] == 2
+            release.set()
+            assert (await page).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_page_book_not_found(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        app_with_mocks["books_api"].get_book = AsyncMock(return_value=None)
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/book/nonexistent/analyze")
+
+        assert response.status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# API: Artifact handles
+# ---------------------------------------------------------------------------
+
+class TestAPIArtifactHandles:
+    @pytest.mark.asyncio
+    async def test_find_candidates_accepts_dna_id_from_analyze(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["books_api"].get_book = AsyncMock(return_value=make_book_metadata())
+        mocks["book_analyzer"].analyze = AsyncMock(return_value=make_book_dna())
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            analyze = await client.get("/api/books/book-1/analyze")
+            dna_id = analyze.headers["X-Artifact-Id"]
+            response = await client.post("/api/books/book-1/find-candidates", json={
+                "selected_pillars": ["theme"],
+                "dna_id": dna_id,
+            })
+
+        assert dna_id.startswith("dna_")
+        assert response.status_code == 200
+        assert response.headers["X-Artifact-Id"].startswith("candidates_")
+        seed_dna = mocks["candidates_finder"].find_candidates.call_args[0][0]
+        assert seed_dna.genre == "Literary fiction"
+
+    @pytest.mark.asyncio
+    async def test_unknown_artifact_id_returns_410(self, app_with_mocks):
+        app = app_with_mocks["app"]
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/rank-candidates", json={
+                "selected_pillars": ["theme"],
+                "seed_dna_id": "dna_expired",
+                "candidates_id": "candidates_expired",
+            })
+
+        assert response.status_code == 410
+
+
+# ---------------------------------------------------------------------------
+# API: Full pipeline
+# ---------------------------------------------------------------------------
+
+class TestAPIRecommend:
+    @pytest.mark.asyncio
+    async def test_recommend_html_runs_pipeline_once_per_selection(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].rank_candidates = AsyncMock(return_value=make_ranking_response(n=1))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(return_value=RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 1", author="Auth 1", rank=1, confidence_score=90.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=1,
+            failed_analyses=0,
+        ))
+
+        body = {
+            "selected_pillars": ["prose_texture", "theme"],
+            "dealbreakers": [],
+            "dna": make_book_dna().model_dump(),
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.post("/api/books/book-1/recommend-html", json=body)
+            body["selected_pillars"] = ["theme", "prose_texture"]
+            second = await client.post("/api/books/book-1/recommend-html", json=body)
+
+        assert first.status_code == 200
+        assert "Rec 1" in first.text
+        assert second.text == first.text
+        mocks["candidates_finder"].find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_recommend_html_snippet_mode_marks_pending_upgrade(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].rank_from_snippets = MagicMock(return_value=make_ranking_response(n=1))
+        mocks["book_ranker"].rank_candidates = AsyncMock(return_value=make_ranking_response(n=1))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(side_effect=lambda *args, **kwargs: RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 1", author="Auth 1", rank=1, confidence_score=90.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=1,
+            failed_analyses=0,
+        ))
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump(), "mode": "snippet"}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            quick = await client.post("/api/books/book-1/recommend-html", json=body)
+            body["mode"] = "full"
+            full = await client.post("/api/books/book-1/recommend-html", json=body)
+            body["mode"] = "turbo"
+            invalid = await client.post("/api/books/book-1/recommend-html", json=body)
+
+        assert quick.status_code == 200
+        assert "data-upgrade-pending" in quick.text
+        assert full.status_code == 200
+        assert "data-upgrade-pending" not in full.text
+        mocks["book_ranker"].rank_candidates.assert_awaited_once()
+        assert invalid.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_recommend_more_writes_next_batch_only(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=5))
+        mocks["book_ranker"].rank_candidates = AsyncMock(return_value=make_ranking_response(n=2))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(return_value=RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 4", author="Auth 4", rank=4, confidence_score=80.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=2,
+            failed_analyses=0,
+        ))
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump(), "offset": 3}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommend-more", json=body)
+            body["offset"] = -1
+            invalid = await client.post("/api/books/book-1/recommend-more", json=body)
+
+        assert response.status_code == 200
+        assert response.json()["recommendations"][0]["title"] == "Rec 4"
+        assert response.json()["next_offset"] is None
+        batch = mocks["book_ranker"].rank_candidates.call_args.args[1]
+        assert [c.title for c in batch.candidates] == ["Book 4", "Book 5"]
+        assert invalid.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_recommend_more_html_renders_cards_and_next_button(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=5))
+        mocks["book_ranker"].rank_candidates = AsyncMock(return_value=make_ranking_response(n=2))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(return_value=RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 1", author="Auth 1", rank=1, confidence_score=80.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=2,
+            failed_analyses=0,
+        ))
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump(), "offset": 0}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.post("/api/books/book-1/recommend-more-html", json=body)
+            body["offset"] = 3
+            last = await client.post("/api/books/book-1/recommend-more-html", json=body)
+
+        assert first.status_code == 200
+        assert "Rec 1" in first.text
+        assert 'class="secondary-btn load-more-btn" data-next-offset="3"' in first.text
+        assert "recommendations-grid" not in first.text  # Cards only, for the grid already shown
+        assert last.status_code == 200
+        assert "load-more-btn" not in last.text
+
+    @pytest.mark.asyncio
+    async def test_recommend_stream_sends_one_card_per_line(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        async def stream_matches(seed_dna, candidates, selected_pillars, dealbreakers, deadline=None, ranking=None, funnel=True, analyses=None):
+            for match in make_ranking_response(n=2).candidates:
+                ranking.candidates.append(match)
+                yield match
+
+        async def write_card(seed_dna, match, selected_pillars, dealbreakers, deadline=None):
+            return RecommendationCard(
+                title=match.title, author=match.author, rank=match.rank, confidence_score=match.confidence_score,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].stream_matches = stream_matches
+        mocks["recommendations_writer"].write_card = AsyncMock(side_effect=write_card)
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump()}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommend-stream", json=body)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["title"] for line in lines] == ["Ranked Book 1", "Ranked Book 2"]
+
+    @pytest.mark.asyncio
+    async def test_recommend_stream_validates_and_honours_mode(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].rank_from_snippets = MagicMock(return_value=make_ranking_response(n=1))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(return_value=RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 1", author="Auth 1", rank=1, confidence_score=90.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=0,
+            failed_analyses=0,
+        ))
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump()}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            invalid = await client.post("/api/books/book-1/recommend-stream", json={**body, "mode": "bogus"})
+            snippet = await client.post("/api/books/book-1/recommend-stream", json={**body, "mode": "snippet"})
+
+        assert invalid.status_code == 400
+        assert snippet.status_code == 200
+        assert [json.loads(line)["title"] for line in snippet.text.splitlines()] == ["Rec 1"]
+        mocks["book_ranker"].rank_from_snippets.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_recommend_stream_maps_search_failure_to_status(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        app_with_mocks["candidates_finder"].find_candidates = AsyncMock(return_value=None)
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump()}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommend-stream", json=body)
+
+        assert response.status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_recommend_html_stream_flushes_first_card_before_the_rest_are_written(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+        release = asyncio.Event()
+
+        async def stream_matches(seed_dna, candidates, selected_pillars, dealbreakers, deadline=None, ranking=None, funnel=True, analyses=None):
+            for match in make_ranking_response(n=2).candidates:
+                ranking.candidates.append(match)
+                yield match
+
+        async def write_card(seed_dna, match, selected_pillars, dealbreakers, deadline=None):
+            if match.rank == 2:
+                await release.wait()
+            return RecommendationCard(
+                title=match.title, author=match.author, rank=match.rank, confidence_score=match.confidence_score,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].stream_matches = stream_matches
+        mocks["recommendations_writer"].write_card = AsyncMock(side_effect=write_card)
+
+        # Drive the ASGI app directly: httpx's ASGI transport buffers the whole body
+        body = json.dumps({"selected_pillars": ["theme"], "dna": make_book_dna().model_dump()}).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+            "path": "/api/books/book-1/recommend-html-stream", "raw_path": b"/api/books/book-1/recommend-html-stream",
+            "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        requested = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        messages: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(app(scope, receive, messages.put))
+        try:
+            start = await asyncio.wait_for(messages.get(), timeout=5)
+            assert start["status"] == 200
+            first = ""
+            while "Ranked Book 1" not in first:
+                first += (await asyncio.wait_for(messages.get(), timeout=5))["body"].decode()
+            # The second card's copy is still being written
+            assert "Ranked Book 2" not in first
+            assert not release.is_set()
+
+            release.set()
+            rest = ""
+            while (message := await asyncio.wait_for(messages.get(), timeout=5)).get("more_body"):
+                rest += message["body"].decode()
+            rest += message["body"].decode()
+            assert "Ranked Book 2" in rest
+            await asyncio.wait_for(task, timeout=5)
+        finally:
+            disconnected.set()
+            release.set()
+            task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_recommend_html_stream_sends_explicit_mode_whole(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        mocks = app_with_mocks
+
+        mocks["candidates_finder"].find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+        mocks["book_ranker"].rank_candidates = AsyncMock(return_value=make_ranking_response(n=1))
+        mocks["recommendations_writer"].write_recommendations = AsyncMock(return_value=RecommendationResponse(
+            recommendations=[RecommendationCard(
+                title="Rec 1", author="Auth 1", rank=1, confidence_score=90.0,
+                why_it_matches="Because", what_is_fresh="Fresh", dna=None
+            )],
+            total_analyzed=1,
+            failed_analyses=0,
+        ))
+
+        body = {"selected_pillars": ["theme"], "dna": make_book_dna().model_dump(), "mode": "full"}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommend-html-stream", json=body)
+
+        assert response.status_code == 200
+        assert "Rec 1" in response.text
+        assert "1 books analyzed" in response.text
+
+    @pytest.mark.asyncio
+    async def test_recommendations_html_stream_renders_cards_in_rank_order(self, app_with_mocks):
+        app = app_with_mocks["app"]
+
+        async def stream_card(seed_dna, candidate, selected_pillars, dealbreakers, deadline=None):
+            if candidate.rank == 2:
+                raise RuntimeError("provider down")
+            yield "why_it_matches", "Because <it> "
+            yield "why_it_matches", "fits"
+            yield "what_is_fresh", "Fresh"
+
+        app_with_mocks["recommendations_writer"].stream_card = stream_card
+
+        body = {
+            "ranking": make_ranking_response(n=2).model_dump(),
+            "selected_pillars": ["theme"],
+            "seed_dna": make_book_dna().model_dump(),
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommendations-html-stream", json=body)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/html")
+        html = response.text
+        assert html.index("Ranked Book 1") < html.index("Ranked Book 2")
+        assert "Because &lt;it&gt; fits" in html
+        assert "What Is Fresh" in html
+        # The failed card falls back to the ranking reasoning and the result is marked partial
+        assert "Strong pillar match" in html
+        assert "some steps were shortened" in html
+
+    @pytest.mark.asyncio
+    async def test_recommendations_html_stream_validates_before_streaming(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        body = {"ranking": make_ranking_response(n=1).model_dump(), "selected_pillars": []}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommendations-html-stream", json=body)
+
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_recommend_rejects_too_many_pillars(self, app_with_mocks):
+        app = app_with_mocks["app"]
+        body = {
+            "selected_pillars": ["prose_texture", "theme", "setting", "narrative_engine"],
+            "dna": make_book_dna().model_dump(),
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/books/book-1/recommend", json=body)
+
+        assert response.status_code == 400
+
 
 # ---------------------------------------------------------------------------
 # API: Find candidates
@@ -6,6 +6,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from librarian.seed.books_api import BooksAPI
 from librarian.seed.models import ParsedBookQuery
 from librarian.shared.models.book_metadata import BookMetadata
+from librarian.shared.works import works
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +65,17 @@ class TestParseBook:
         assert book is not None
         assert book.author == "Author A, Author B"
 
+    def test_collects_isbns_as_isbn13(self):
+        api = self._make_api()
+        item = self._make_item()
+        item["volumeInfo"]["industryIdentifiers"] = [
+            {"type": "ISBN_10", "identifier": "0441172717"},
+            {"type": "ISBN_13", "identifier": "9780441172719"},
+            {"type": "OTHER", "identifier": "UOM:39015"},
+        ]
+        book = api._parse_book(item)
+        assert book.isbns == ["9780441172719"]
+
     def test_defaults_unknown_for_missing_fields(self):
         api = self._make_api()
         item = {
@@ -160,6 +172,47 @@ class TestBooksAPISearch:
 
         await api.close()
 
+    @pytest.mark.asyncio
+    async def test_search_deduplicates_editions_of_one_work(self):
+        """Editions with edition asides, inverted author names or a shared ISBN count as one work."""
+        with patch.dict("os.environ", {"GOOGLE_BOOKS_API_KEY": "fake"}):
+            api = BooksAPI(use_llm_parser=False)
+
+        def item(volume_id, title, author, isbn):
+            return {
+                "id": volume_id,
+                "volumeInfo": {
+                    "title": title,
+                    "authors": [author],
+                    "description": "A desert planet and its spice.",
+                    "imageLinks": {"thumbnail": "http://img.jpg"},
+                    "industryIdentifiers": [{"type": "ISBN_13", "identifier": isbn}],
+                },
+            }
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = MagicMock()
+        mock_response.json.return_value = {
+            "items": [
+                item("b1", "Dune", "Frank Herbert", "9780441172719"),
+                item("b2", "Dune (Deluxe Edition)", "Herbert, Frank", "9780593099322"),
+                item("b3", "Dune Chronicles 1", "Frank Herbert", "9780441172719"),
+                item("b4", "Dune Messiah", "Frank Herbert", "9780593098233"),
+            ]
+        }
+        api.client = MagicMock()
+        api.client.get = AsyncMock(return_value=mock_response)
+        api.client.aclose = AsyncMock()
+
+        books = await api.search("dune")
+
+        assert [book.book_id for book in books] == ["b1", "b4"]
+        assert works.book_key("b2") == works.book_key("b3") == works.book_key("b1")
+        assert works.book_key("b4") != works.book_key("b1")
+
+        await api.close()
+
     @pytest.mark.asyncio
     async def test_search_respects_max_results(self):
         """Search should return at most max_results books."""
@@ -251,6 +304,34 @@ class TestBooksAPISearch:
         await api.close()
 
 
+    @pytest.mark.asyncio
+    async def test_search_skips_parser_when_gemini_breaker_open(self):
+        """Search should use the raw query without waiting on a degraded LLM."""
+        with patch.dict("os.environ", {"GOOGLE_BOOKS_API_KEY": "fake", "GEMINI_API_KEY": "fake"}):
+            with patch("librarian.seed.books_api.QueryParser") as MockParser:
+                mock_parser = MagicMock()
+                mock_parser.parse = AsyncMock()
+                MockParser.return_value = mock_parser
+                api = BooksAPI(use_llm_parser=True)
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.raise_for_status = MagicMock()
+        mock_response.json.return_value = {"items": []}
+
+        api.client = MagicMock()
+        api.client.get = AsyncMock(return_value=mock_response)
+        api.client.aclose = AsyncMock()
+
+        with patch("librarian.seed.books_api.provider_available", return_value=False):
+            await api.search("andy weir martian")
+
+        mock_parser.parse.assert_not_awaited()
+        assert api.client.get.call_args[1]["params"]["q"] == "andy weir martian"
+
+        await api.close()
+
+
 # ---------------------------------------------------------------------------
 # get_book() tests
 # ---------------------------------------------------------------------------
@@ -300,3 +381,51 @@ class TestBooksAPIGetBook:
         assert book is None
 
         await api.close()
+
+
+# ---------------------------------------------------------------------------
+# resolve() tests
+# ---------------------------------------------------------------------------
+
+class TestBooksAPIResolve:
+    def _volume(self, volume_id, title, author):
+        return {
+            "id": volume_id,
+            "volumeInfo": {
+                "title": title,
+                "authors": [author],
+                "description": "An English description of the book.",
+                "imageLinks": {"thumbnail": f"http://{volume_id}.jpg"},
+            },
+        }
+
+    @pytest.mark.asyncio
+    async def test_resolve_prefers_same_work_and_caches(self):
+        with patch.dict("os.environ", {"GOOGLE_BOOKS_API_KEY": "fake"}):
+            api = BooksAPI(use_llm_parser=False)
+
+        mock_response = MagicMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.json.return_value = {"items": [
+            self._volume("guide", "Study Guide: Piranesi", "Guide Writer"),
+            self._volume("companion", "Jonathan Strange & Mr Norrell", "Susanna Clarke"),
+            self._volume("vol-p", "Piranesi", "Susanna Clarke"),
+        ]}
+        api.client = MagicMock()
+        api.client.get = AsyncMock(return_value=mock_response)
+
+        volumes = await api.resolve_many([("Piranesi: A Novel", "Clarke, Susanna"), ("Piranesi", "Susanna Clarke")])
+
+        assert [volume.book_id for volume in volumes] == ["vol-p", "vol-p"]
+        assert volumes[0].thumbnail == "http://vol-p.jpg"
+        api.client.get.assert_awaited_once()  # Both name one work, so they share one lookup
+        assert works.book_key("vol-p") == works.key("Piranesi", "Susanna Clarke")
+
+    @pytest.mark.asyncio
+    async def test_resolve_failure_returns_none(self):
+        with patch.dict("os.environ", {"GOOGLE_BOOKS_API_KEY": "fake"}):
+            api = BooksAPI(use_llm_parser=False)
+        api.client = MagicMock()
+        api.client.get = AsyncMock(side_effect=RuntimeError("network down"))
+
+        assert await api.resolve("Piranesi", "Susanna Clarke") is None
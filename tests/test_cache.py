@@ -0,0 +1,473 @@
+"""Tests for the TTL cache, artifact store and the cached recommendation pipeline."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from librarian.pipeline import RecommendationPipeline
+from librarian.shared.cache.artifact_store import ArtifactStore
+from librarian.shared.cache.ttl_cache import TTLCache
+from librarian.ranking.models import CandidateList, RankingResponse
+from librarian.shared.exceptions import CandidateSearchFailedError, RecommendationFailedError
+from librarian.shared.works import works
+from librarian.writing.models import RecommendationCard, RecommendationResponse
+
+from helpers import make_book_dna, make_book_metadata, make_candidate_list, make_ranked_candidate, make_ranking_response
+
+
+def _recommendations(partial: bool = False) -> RecommendationResponse:
+    card = RecommendationCard(
+        title="Rec 1", author="Auth 1", rank=1, confidence_score=90.0,
+        why_it_matches="Because", what_is_fresh="Fresh", dna=None
+    )
+    return RecommendationResponse(recommendations=[card], total_analyzed=1, failed_analyses=0, partial=partial)
+
+
+# ---------------------------------------------------------------------------
+# TTLCache
+# ---------------------------------------------------------------------------
+
+class TestTTLCache:
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_are_coalesced(self):
+        cache = TTLCache("test", ttl_seconds=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+        assert results == ["value"] * 5
+        assert len(calls) == 1
+        assert cache.snapshot()["coalesced"] == 4
+        assert await cache.get_or_compute("k", compute) == "value"
+        assert cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_refreshing(self):
+        cache = TTLCache("test", ttl_seconds=0.0, stale_seconds=60)
+        cache.set("k", "old")
+
+        result = await cache.get_or_compute("k", AsyncMock(return_value="new"))
+        assert result == "old"
+
+        await asyncio.sleep(0)  # Let the background refresh finish
+        await asyncio.sleep(0)
+        assert cache.get("k") == "new"
+
+    @pytest.mark.asyncio
+    async def test_rejected_results_are_not_cached(self):
+        cache = TTLCache("test", ttl_seconds=60)
+        await cache.get_or_compute("k", AsyncMock(return_value="partial"), should_cache=lambda v: False)
+        assert cache.get("k") is None
+
+    @pytest.mark.asyncio
+    async def test_shared_computation_survives_one_cancelled_waiter(self):
+        cache = TTLCache("test", ttl_seconds=60)
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "value"
+
+        first = asyncio.create_task(cache.get_or_compute("k", compute))
+        second = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "value"
+
+    def test_lru_eviction(self):
+        cache = TTLCache("test", ttl_seconds=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+
+# ---------------------------------------------------------------------------
+# ArtifactStore
+# ---------------------------------------------------------------------------
+
+class TestArtifactStore:
+    def test_round_trip_by_opaque_id(self):
+        store = ArtifactStore()
+        dna = make_book_dna()
+        dna_id = store.put("dna", dna)
+
+        assert dna_id.startswith("dna_")
+        assert store.get(dna_id, type(dna)) is dna
+
+    def test_wrong_type_or_expired_returns_none(self):
+        store = ArtifactStore(ttl_seconds=0.0)
+        dna_id = store.put("dna", make_book_dna())
+        assert store.get(dna_id, RecommendationResponse) is None
+        assert store.get("dna_missing", RecommendationResponse) is None
+
+
+# ---------------------------------------------------------------------------
+# RecommendationPipeline
+# ---------------------------------------------------------------------------
+
+def _make_ranker() -> MagicMock:
+    ranker = MagicMock()
+    ranker.funnel_order = lambda seed_dna, candidates, selected_pillars, dealbreakers: candidates
+    ranker.analysis_batch_size = MagicMock(return_value=3)
+    return ranker
+
+
+def _make_pipeline(recommendations: RecommendationResponse):
+    finder = MagicMock()
+    finder.find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+    ranker = _make_ranker()
+    ranker.rank_candidates = AsyncMock(return_value=make_ranking_response(n=1))
+    writer = MagicMock()
+    writer.write_recommendations = AsyncMock(return_value=recommendations)
+    return RecommendationPipeline(finder, ranker, writer, render=lambda recs: "<div>cards</div>")
+
+
+class TestRecommendationPipeline:
+    def test_cache_key_ignores_selection_order(self):
+        key_a = RecommendationPipeline.cache_key("b1", ["theme", "setting"], ["Info dumps", "Love triangles"])
+        key_b = RecommendationPipeline.cache_key("b1", ["setting", "theme"], ["Love triangles", "Info dumps"])
+        assert key_a == key_b
+
+    @pytest.mark.asyncio
+    async def test_repeat_selection_is_served_from_cache(self):
+        pipeline = _make_pipeline(_recommendations())
+        seed_dna = make_book_dna()
+
+        first = await pipeline.recommend("b1", seed_dna, ["theme", "setting"], [])
+        second = await pipeline.recommend("b1", seed_dna, ["setting", "theme"], [])
+
+        assert first.html == "<div>cards</div>"
+        assert second == first
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_results_for_altered_inline_dna_are_kept_apart(self):
+        pipeline = _make_pipeline(_recommendations())
+        seed_dna = make_book_dna()
+        altered = seed_dna.model_copy(update={"genre": "Something else entirely"})
+
+        await pipeline.recommend("b1", seed_dna, ["theme"], [])
+        await pipeline.recommend("b1", altered, ["theme"], [])
+        # A copy of the same analysis for another request is still a hit
+        await pipeline.recommend("b1", seed_dna.model_copy(), ["theme"], [])
+
+        assert pipeline.candidates_finder.find_candidates.await_count == 2
+        assert RecommendationPipeline.seed_key(seed_dna, "b1") != RecommendationPipeline.seed_key(altered, "b1")
+
+    @pytest.mark.asyncio
+    async def test_partial_results_are_not_cached(self):
+        pipeline = _make_pipeline(_recommendations(partial=True))
+
+        await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+        await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+
+        assert pipeline.book_ranker.rank_candidates.await_count == 2
+        # The candidate pool is kept either way
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_no_candidates_raises(self):
+        pipeline = _make_pipeline(_recommendations())
+        pipeline.candidates_finder.find_candidates = AsyncMock(return_value=None)
+
+        with pytest.raises(CandidateSearchFailedError):
+            await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+        assert len(pipeline.cache) == 0
+
+
+def _make_paging_pipeline(pool_size: int):
+    """Pipeline whose ranker and writer echo back whichever batch they are given."""
+    async def rank_candidates(seed_dna, candidates, selected_pillars, dealbreakers, deadline=None, funnel=True, analyses=None):
+        return RankingResponse(
+            candidates=[
+                make_ranked_candidate(title=c.title, author=c.author, rank=i)
+                for i, c in enumerate(candidates.candidates, 1)
+            ],
+            total_analyzed=len(candidates.candidates),
+            failed_analyses=0
+        )
+
+    async def write_recommendations(seed_dna, ranking, selected_pillars, dealbreakers, deadline=None):
+        return RecommendationResponse(
+            recommendations=[
+                RecommendationCard(
+                    title=c.title, author=c.author, rank=c.rank, confidence_score=c.confidence_score,
+                    why_it_matches="Why", what_is_fresh="Fresh", dna=None
+                )
+                for c in ranking.candidates
+            ],
+            total_analyzed=ranking.total_analyzed,
+            failed_analyses=0
+        )
+
+    finder = MagicMock()
+    finder.find_candidates = AsyncMock(return_value=make_candidate_list(n=pool_size))
+    ranker = _make_ranker()
+    ranker.rank_candidates = AsyncMock(side_effect=rank_candidates)
+    writer = MagicMock()
+    writer.write_recommendations = AsyncMock(side_effect=write_recommendations)
+    return RecommendationPipeline(finder, ranker, writer, render=lambda recs: "<div>cards</div>")
+
+
+class TestMoreRecommendations:
+    @pytest.mark.asyncio
+    async def test_pages_through_kept_pool_without_searching_again(self):
+        pipeline = _make_paging_pipeline(pool_size=7)
+        seed_dna = make_book_dna()
+
+        first = await pipeline.recommend("b1", seed_dna, ["theme"], [])
+        assert [card.title for card in first.recommendations.recommendations] == ["Book 1", "Book 2", "Book 3"]
+        assert first.recommendations.next_offset == 3
+
+        more = await pipeline.more("b1", seed_dna, ["theme"], [], offset=3)
+        assert [card.title for card in more.recommendations] == ["Book 4", "Book 5", "Book 6"]
+        assert [card.rank for card in more.recommendations] == [4, 5, 6]
+        assert more.next_offset == 6
+        assert pipeline.book_ranker.rank_candidates.call_args.kwargs["funnel"] is False
+
+        last = await pipeline.more("b1", seed_dna, ["theme"], [], offset=6)
+        assert [card.title for card in last.recommendations] == ["Book 7"]
+        assert last.next_offset is None
+
+        past_end = await pipeline.more("b1", seed_dna, ["theme"], [], offset=7)
+        assert past_end.recommendations == []
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_expired_pool_is_searched_for_again(self):
+        pipeline = _make_paging_pipeline(pool_size=5)
+
+        more = await pipeline.more("b1", make_book_dna(), ["theme"], [], offset=3)
+
+        assert [card.title for card in more.recommendations] == ["Book 4", "Book 5"]
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_result_pool_and_checkpoints_share_one_seed_key(self):
+        """Forgetting the seed's volume in the work registry doesn't lose the pool or the cached result."""
+        pipeline = _make_paging_pipeline(pool_size=7)
+        seed_dna = make_book_dna(book_id="b1").model_copy(update={"author": "Andy Weir"})
+        works.register(make_book_metadata(book_id="b1", title=seed_dna.title, author="Andy Weir"))
+
+        await pipeline.recommend("b1", seed_dna, ["theme"], [])
+        works.reset()  # The edition's registry entry expires
+        more = await pipeline.more("b1", seed_dna, ["theme"], [], offset=3)
+        again = await pipeline.recommend("b1", seed_dna, ["theme"], [])
+
+        assert [card.title for card in more.recommendations] == ["Book 4", "Book 5", "Book 6"]
+        assert [card.title for card in again.recommendations.recommendations] == ["Book 1", "Book 2", "Book 3"]
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+        assert pipeline.book_ranker.rank_candidates.await_count == 2
+
+
+class TestSnippetMode:
+    @pytest.mark.asyncio
+    async def test_snippet_result_is_upgraded_in_the_background(self):
+        pipeline = _make_paging_pipeline(pool_size=5)
+        release = asyncio.Event()
+        rank_fully = pipeline.book_ranker.rank_candidates.side_effect
+
+        async def slow_rank(*args, **kwargs):
+            await release.wait()
+            return await rank_fully(*args, **kwargs)
+
+        pipeline.book_ranker.rank_candidates.side_effect = slow_rank
+        pipeline.book_ranker.rank_from_snippets = lambda seed_dna, candidates, selected_pillars, dealbreakers: RankingResponse(
+            candidates=[
+                make_ranked_candidate(title=c.title, author=c.author, rank=i)
+                for i, c in enumerate(candidates.candidates, 1)
+            ],
+            total_analyzed=0,
+            failed_analyses=0
+        )
+        seed_dna = make_book_dna()
+
+        quick = await pipeline.recommend("b1", seed_dna, ["theme"], [], mode="snippet")
+
+        assert quick.recommendations.snippet_only is True
+        assert [card.title for card in quick.recommendations.recommendations] == ["Book 1", "Book 2", "Book 3"]
+        assert quick.recommendations.next_offset == 3
+        assert len(pipeline.cache) == 0
+
+        # A request for the full result joins the background run
+        upgrade = asyncio.ensure_future(pipeline.recommend("b1", seed_dna, ["theme"], [], mode="full"))
+        release.set()
+        full = await upgrade
+
+        assert full.recommendations.snippet_only is False
+        pipeline.book_ranker.rank_candidates.assert_awaited_once()
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+        assert (await pipeline.recommend("b1", seed_dna, ["theme"], [], mode="snippet")) == full
+
+    def test_snippet_mode_is_chosen_when_gemini_calls_queue(self):
+        pipeline = _make_pipeline(_recommendations())
+        limiter = MagicMock()
+
+        with patch("librarian.pipeline.recommendation_pipeline.get_limiter", return_value=limiter):
+            with patch.dict("os.environ", {"LIBRARIAN_SNIPPET_MODE_QUEUE_DEPTH": "4"}):
+                limiter.snapshot.return_value = {"queued": 3}
+                assert pipeline.use_snippets(None) is False
+                limiter.snapshot.return_value = {"queued": 4}
+                assert pipeline.use_snippets(None) is True
+                assert pipeline.use_snippets("full") is False
+            with patch.dict("os.environ", {"LIBRARIAN_SNIPPET_MODE_QUEUE_DEPTH": "0"}):
+                assert pipeline.use_snippets(None) is False
+
+
+class TestRunCheckpoints:
+    @pytest.mark.asyncio
+    async def test_retry_after_writer_failure_reuses_checkpointed_ranking(self):
+        pipeline = _make_pipeline(_recommendations())
+        written = pipeline.recommendations_writer.write_recommendations
+        written.side_effect = [RecommendationResponse(recommendations=[], total_analyzed=1, failed_analyses=0), _recommendations()]
+
+        with pytest.raises(RecommendationFailedError):
+            await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+        assert len(pipeline.checkpoints) == 1
+
+        result = await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+
+        assert result.recommendations.recommendations[0].title == "Rec 1"
+        pipeline.book_ranker.rank_candidates.assert_awaited_once()
+        assert written.await_count == 2
+        assert len(pipeline.checkpoints) == 0  # Dropped once the run completed
+
+    @pytest.mark.asyncio
+    async def test_retry_after_ranking_failure_passes_checkpointed_analyses(self):
+        pipeline = _make_pipeline(_recommendations())
+        seen = []
+
+        async def rank_candidates(seed_dna, candidates, selected_pillars, dealbreakers, deadline=None, funnel=True, analyses=None):
+            seen.append(analyses)
+            if len(seen) == 1:
+                analyses["book 1|author 1"] = make_book_dna(title="Book 1")
+                return RankingResponse(candidates=[], total_analyzed=0, failed_analyses=0)
+            return make_ranking_response(n=1)
+
+        pipeline.book_ranker.rank_candidates = AsyncMock(side_effect=rank_candidates)
+
+        with pytest.raises(RecommendationFailedError):
+            await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+        await pipeline.recommend("b1", make_book_dna(), ["theme"], [])
+
+        assert seen[1] is seen[0] and "book 1|author 1" in seen[1]
+
+
+def _make_streaming_pipeline(release: asyncio.Event, fail_rank: int | None = None):
+    from librarian.writing.recommendations_writer import RecommendationsWriter
+
+    matches = make_ranking_response(n=2)
+
+    async def stream_matches(seed_dna, candidates, selected_pillars, dealbreakers, deadline=None, ranking=None, funnel=True, analyses=None):
+        out = ranking
+        out.total_analyzed = 2
+        for match in matches.candidates:
+            out.candidates.append(match)
+            yield match
+            await release.wait()  # The rest of the analyses are still running
+
+    async def write_card(seed_dna, match, selected_pillars, dealbreakers, deadline=None):
+        if match.rank == fail_rank:
+            return None
+        return RecommendationCard(
+            title=match.title, author=match.author, rank=match.rank, confidence_score=match.confidence_score,
+            why_it_matches=f"Why {match.rank}", what_is_fresh="Fresh", dna=None
+        )
+
+    finder = MagicMock()
+    finder.find_candidates = AsyncMock(return_value=make_candidate_list(n=3))
+    ranker = _make_ranker()
+    ranker.stream_matches = stream_matches
+    writer = MagicMock()
+    writer.write_card = AsyncMock(side_effect=write_card)
+    writer.fallback_card = RecommendationsWriter.fallback_card
+    return RecommendationPipeline(finder, ranker, writer, render=lambda recs: "<div>cards</div>")
+
+
+class TestStreamingPipeline:
+    @pytest.mark.asyncio
+    async def test_first_card_arrives_before_ranking_finishes(self):
+        release = asyncio.Event()
+        pipeline = _make_streaming_pipeline(release)
+        cards = []
+
+        async for card in pipeline.stream("b1", make_book_dna(), ["theme"], []):
+            cards.append(card)
+            if card.rank == 1:
+                assert not release.is_set()
+                release.set()
+
+        assert [card.rank for card in cards] == [1, 2]
+        assert cards[0].why_it_matches == "Why 1"
+
+        # A complete run is cached and replayed without new work
+        replayed = [card async for card in pipeline.stream("b1", make_book_dna(), ["theme"], [])]
+        assert replayed == cards
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_card_falls_back_to_reasoning(self):
+        release = asyncio.Event()
+        release.set()
+        pipeline = _make_streaming_pipeline(release, fail_rank=2)
+
+        cards = [card async for card in pipeline.stream("b1", make_book_dna(), ["theme"], [])]
+
+        assert cards[1].why_it_matches == "Strong pillar match"
+        assert cards[1].what_is_fresh == ""
+        assert len(pipeline.cache) == 0  # Partial results are not cached
+
+    @pytest.mark.asyncio
+    async def test_concurrent_streams_share_one_run(self):
+        release = asyncio.Event()
+        pipeline = _make_streaming_pipeline(release)
+
+        async def collect():
+            return [card async for card in pipeline.stream("b1", make_book_dna(), ["theme"], [])]
+
+        first = asyncio.ensure_future(collect())
+        second = asyncio.ensure_future(collect())
+        await asyncio.sleep(0.01)
+        release.set()
+        first_cards, second_cards = await asyncio.gather(first, second)
+
+        assert first_cards == second_cards
+        assert [card.rank for card in first_cards] == [1, 2]
+        pipeline.candidates_finder.find_candidates.assert_awaited_once()
+        assert pipeline.recommendations_writer.write_card.await_count == 2
+        assert pipeline.cache.snapshot()["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_snippet_mode_streams_the_snippet_result(self):
+        pipeline = _make_streaming_pipeline(asyncio.Event())
+        pipeline.book_ranker.rank_from_snippets = MagicMock(return_value=make_ranking_response(n=1))
+        pipeline.recommendations_writer.write_recommendations = AsyncMock(return_value=_recommendations())
+        summary = RecommendationResponse(recommendations=[], total_analyzed=0, failed_analyses=0)
+
+        cards = [card async for card in pipeline.stream("b1", make_book_dna(), ["theme"], [], summary, mode="snippet")]
+
+        assert [card.title for card in cards] == ["Rec 1"]
+        assert summary.snippet_only is True
+        pipeline.book_ranker.rank_from_snippets.assert_called_once()
+        pipeline.recommendations_writer.write_card.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_no_candidates_raises(self):
+        pipeline = _make_streaming_pipeline(asyncio.Event())
+        pipeline.candidates_finder.find_candidates = AsyncMock(return_value=CandidateList(candidates=[]))
+
+        with pytest.raises(CandidateSearchFailedError):
+            async for _ in pipeline.stream("b1", make_book_dna(), ["theme"], []):
+                pass
@@ -3,7 +3,14 @@
 import pytest
 from pydantic import ValidationError
 
-from librarian.analysis.models import BookDNAResponse, DNAPillar, DNASettingPillar, BookDNA
+from librarian.analysis.models import (
+    BookDNAResponse,
+    DNAPillar,
+    DNASettingPillar,
+    BookDNA,
+    merge_partial_dna,
+    partial_dna_model,
+)
 from librarian.ranking.models import (
     CandidateBook,
     CandidateList,
@@ -19,6 +26,8 @@ from librarian.writing.models import (
     RecommendationResponse,
 )
 from librarian.seed.models import ParsedBookQuery
+from librarian.shared.ai.json_repair import close_truncated_json, coerce_to_model, parse_lenient
+from librarian.shared.ai.partial_json import PartialObjectParser
 from librarian.shared.models.book_metadata import BookMetadata
 
 from helpers import make_book_dna, make_dna_pillar, make_setting_pillar
@@ -140,6 +149,83 @@ class TestBookDNAResponse:
             assert pillar is not None
             assert hasattr(pillar, "full_text")
 
+    def test_analyzed_pillars_not_in_llm_schema(self):
+        assert "analyzed_pillars" not in BookDNAResponse.model_json_schema()["properties"]
+        assert make_book_dna().covers(["theme"])
+        assert make_book_dna().covers(None)
+
+
+class TestPartialDNA:
+    def test_schema_has_only_requested_pillars(self):
+        model = partial_dna_model(("theme", "setting"))
+        assert set(model.model_json_schema()["properties"]) == {"genre", "theme", "setting", "dealbreakers"}
+
+    def test_merge_fills_remaining_pillars(self):
+        partial = partial_dna_model(("theme",))(
+            genre="Fantasy", theme=make_dna_pillar("Power and grief", "Power"), dealbreakers=["Info dumps"]
+        )
+        dna = merge_partial_dna(partial, "id-1", "Book")
+
+        assert dna.theme.summary == "Power"
+        assert dna.prose_texture.full_text == ""
+        assert dna.analyzed_pillars == ["theme"]
+        assert dna.covers(["theme"])
+        assert not dna.covers(["theme", "prose_texture"])
+        assert not dna.covers(None)
+
+    def test_merge_keeps_earlier_partial_pillars(self):
+        first = merge_partial_dna(
+            partial_dna_model(("theme",))(genre="Fantasy", theme=make_dna_pillar(), dealbreakers=[]), "id-1", "Book"
+        )
+        second = partial_dna_model(("prose_texture",))(
+            genre="Fantasy", prose_texture=make_dna_pillar("Lyrical", "Lyrical"), dealbreakers=[]
+        )
+        dna = merge_partial_dna(second, "id-1", "Book", base=first)
+
+        assert dna.analyzed_pillars == ["prose_texture", "theme"]
+        assert dna.theme.full_text == "Test pillar"
+
+
+class TestPartialObjectParser:
+    def test_members_are_returned_once_each_is_complete(self):
+        parser = PartialObjectParser()
+        assert parser.feed('{"genre": "Sci') == {}
+        assert parser.feed('-fi", "theme": {"full_text": "a, b", ') == {"genre": "Sci-fi"}
+        assert parser.feed('"summary": "c}"}, "dealbreakers": ["x"') == {"theme": {"full_text": "a, b", "summary": "c}"}}
+        assert parser.feed(']}') == {"dealbreakers": ["x"]}
+
+    def test_escaped_quotes_do_not_end_strings(self):
+        parser = PartialObjectParser()
+        assert parser.feed('{"title": "The \\"Book\\"", "genre": "x"}') == {"title": 'The "Book"', "genre": "x"}
+
+
+class TestJsonRepair:
+    def test_truncated_list_drops_the_incomplete_item(self):
+        text = '```json\n{"candidates": [{"title": "A", "author": "B", "source_snippet": "x"}, {"title": "C", "auth'
+        data = parse_lenient(text)
+        repaired, missing = coerce_to_model(data, CandidateList)
+
+        assert [c.title for c in repaired.candidates] == ["A"]
+        assert missing == []
+
+    def test_types_are_coerced(self):
+        data = {"candidates": [{"title": "A", "author": "B", "rank": "1", "confidence_score": "85%", "reasoning": ["a", "b"]}]}
+        repaired, _ = coerce_to_model(data, RankingOutput)
+
+        assert repaired.candidates[0].confidence_score == 85.0
+        assert repaired.candidates[0].reasoning == "a, b"
+
+    def test_missing_required_fields_are_reported(self):
+        data = parse_lenient('{"recommendations": [], "total_analyzed": 3, "failed_anal')
+        repaired, missing = coerce_to_model(data, RecommendationResponse)
+
+        assert repaired is None
+        assert missing == ["failed_analyses"]
+
+    def test_unrecoverable_text_returns_none(self):
+        assert close_truncated_json("no json here") is None
+        assert close_truncated_json('{"a": tru') is None
+
 
 # ---------------------------------------------------------------------------
 # Candidate models
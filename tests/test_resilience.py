@@ -0,0 +1,573 @@
+"""Tests for latency tracking, hedging and other resilience helpers."""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pydantic import BaseModel
+from strands.types.exceptions import MaxTokensReachedException, StructuredOutputException
+
+from librarian.ranking.models import CandidateList
+from librarian.seed.models import ParsedBookQuery
+from librarian.shared.ai.agent_pool import AgentPool
+from librarian.shared.ai.invocation import invoke_agent
+from librarian.shared.exceptions import (
+    DeadlineExceededError,
+    ProviderUnavailableError,
+    RequestCancelledError,
+)
+from librarian.shared.resilience.circuit_breaker import BreakerState, CircuitBreaker
+from librarian.shared.resilience.deadline import Deadline, current_deadline, deadline_scope
+from librarian.shared.resilience.disconnect import cancel_on_disconnect
+from librarian.shared.resilience.provider_calls import call_provider
+from librarian.shared.resilience.latency import LatencyTracker, latency_tracker
+from librarian.shared.resilience.hedging import HedgeBudget, _executor, hedged, hedged_sync
+from librarian.shared.resilience.rate_limiter import (
+    Priority,
+    ProviderLimiter,
+    TokenBucket,
+    current_priority,
+    get_limiter,
+    is_throttle_error,
+    priority_scope,
+)
+from librarian.shared.resilience.speculation import Speculator
+
+from helpers import FakeAgentResult
+
+
+def _warm_up(stage: str, seconds: float, n: int = 20):
+    for _ in range(n):
+        latency_tracker.record(stage, seconds)
+
+
+# ---------------------------------------------------------------------------
+# LatencyTracker
+# ---------------------------------------------------------------------------
+
+class TestLatencyTracker:
+    def test_percentile_requires_min_samples(self):
+        tracker = LatencyTracker()
+        tracker.record("analysis", 1.0)
+        assert tracker.percentile("analysis", 0.9, min_samples=2) is None
+        assert tracker.percentile("analysis", 0.9) == 1.0
+
+    def test_percentiles_per_stage(self):
+        tracker = LatencyTracker()
+        for i in range(1, 11):
+            tracker.record("ranking", float(i))
+        tracker.record("writing", 0.5)
+
+        assert tracker.percentile("ranking", 0.9) == 9.0
+        assert tracker.percentile("ranking", 0.5) in (5.0, 6.0)
+        assert tracker.snapshot()["writing"]["count"] == 1
+
+    def test_window_drops_old_samples(self):
+        tracker = LatencyTracker(window_size=3)
+        for seconds in (100.0, 1.0, 1.0, 1.0):
+            tracker.record("exa", seconds)
+        assert tracker.percentile("exa", 1.0) == 1.0
+
+
+# ---------------------------------------------------------------------------
+# Hedging
+# ---------------------------------------------------------------------------
+
+class TestHedgeBudget:
+    def test_caps_hedge_rate(self):
+        budget = HedgeBudget(max_rate=0.1)
+        for _ in range(9):
+            budget.record_call()
+        assert budget.try_acquire() is True
+        assert budget.try_acquire() is False
+        assert budget.hedge_rate() <= 0.1
+
+
+class TestHedged:
+    @pytest.mark.asyncio
+    async def test_disabled_stage_runs_single_attempt(self):
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            return "ok"
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": ""}):
+            result = await hedged("analysis", attempt)
+
+        assert result == "ok"
+        assert len(calls) == 1
+        assert latency_tracker.count("analysis") == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self):
+        _warm_up("analysis", 0.01)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            # First attempt hangs, the duplicate returns quickly
+            await asyncio.sleep(5 if len(calls) == 1 else 0)
+            return f"attempt-{len(calls)}"
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": "analysis"}):
+            with patch("librarian.shared.resilience.hedging.hedge_budget", HedgeBudget(max_rate=1.0)):
+                result = await asyncio.wait_for(hedged("analysis", attempt), timeout=2)
+
+        assert result == "attempt-2"
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_budget_exhausted_waits_for_primary(self):
+        _warm_up("ranking", 0.01)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "primary"
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": "all"}):
+            with patch("librarian.shared.resilience.hedging.hedge_budget", HedgeBudget(max_rate=0.0)):
+                result = await hedged("ranking", attempt)
+
+        assert result == "primary"
+        assert len(calls) == 1
+
+    def test_hedged_sync_returns_first_success(self):
+        _warm_up("exa", 0.01)
+        calls = []
+
+        def attempt():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": "exa"}):
+            with patch("librarian.shared.resilience.hedging.hedge_budget", HedgeBudget(max_rate=1.0)):
+                result = hedged_sync("exa", attempt)
+
+        assert result == "fast"
+
+    def test_hedged_sync_times_attempts_from_admission(self):
+        @contextmanager
+        def admit():
+            time.sleep(0.2)  # Queued for a limiter slot
+            yield
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": ""}):
+            assert hedged_sync("tavily", lambda: "ok", admit=admit) == "ok"
+
+        assert latency_tracker.percentile("tavily", 0.5) < 0.1
+
+    @pytest.mark.asyncio
+    async def test_losing_attempt_is_recorded_as_at_least_its_run_time(self):
+        _warm_up("writing", 0.01)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            await asyncio.sleep(5 if len(calls) == 1 else 0.05)
+            return f"attempt-{len(calls)}"
+
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": "writing"}):
+            with patch("librarian.shared.resilience.hedging.hedge_budget", HedgeBudget(max_rate=1.0)):
+                result = await asyncio.wait_for(hedged("writing", attempt), timeout=2)
+        await asyncio.sleep(0)  # Let the cancelled primary record itself
+
+        assert result == "attempt-2"
+        assert latency_tracker.count("writing") == 22
+        # The abandoned primary ran for the hedge delay plus the backup's run time
+        assert latency_tracker.percentile("writing", 1.0) >= 0.06
+
+    def test_sync_providers_get_their_own_worker_pools(self):
+        assert _executor("exa") is not _executor("tavily")
+        assert _executor("exa")._max_workers == 2 * get_limiter("exa").max_concurrency
+
+
+# ---------------------------------------------------------------------------
+# AgentPool
+# ---------------------------------------------------------------------------
+
+class TestAgentPool:
+    @pytest.mark.asyncio
+    async def test_reuses_seed_and_creates_extra_when_busy(self):
+        seed = MagicMock()
+        factory = MagicMock(return_value=MagicMock())
+        pool = AgentPool(factory, seed=seed)
+
+        async with pool.acquire() as first:
+            async with pool.acquire() as second:
+                assert first is seed
+                assert second is factory.return_value
+
+        async with pool.acquire() as again:
+            assert again in (seed, factory.return_value)
+        seed.messages.clear.assert_called()
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+class TestTokenBucket:
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=10.0, burst=2)
+        bucket.take()
+        bucket.take()
+        assert bucket.time_until_available() > 0
+
+
+class TestProviderLimiter:
+    @pytest.mark.asyncio
+    async def test_interactive_jumps_ahead_of_bulk(self):
+        limiter = ProviderLimiter("gemini", rate=1000.0, burst=100, max_concurrency=1)
+        order = []
+
+        await limiter.acquire(Priority.STANDARD)  # Occupy the only slot
+
+        async def worker(name, priority):
+            async with limiter.slot(priority):
+                order.append(name)
+
+        bulk = asyncio.create_task(worker("bulk", Priority.BULK))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(worker("interactive", Priority.INTERACTIVE))
+        await asyncio.sleep(0.01)
+
+        limiter.release()
+        await asyncio.gather(bulk, interactive)
+        assert order == ["interactive", "bulk"]
+
+    @pytest.mark.asyncio
+    async def test_throttle_halves_concurrency(self):
+        limiter = ProviderLimiter("exa", rate=1000.0, burst=100, max_concurrency=8)
+
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("429 Too Many Requests")
+
+        assert limiter.concurrency_limit == 4
+        assert limiter.snapshot()["throttled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_success_grows_concurrency_back(self):
+        limiter = ProviderLimiter("tavily", rate=1000.0, burst=1000, max_concurrency=4)
+        limiter.acquire_sync()
+        limiter.release(RuntimeError("rate limit exceeded"))
+        assert limiter.concurrency_limit == 2
+
+        for _ in range(20):
+            async with limiter.slot():
+                pass
+        assert limiter.concurrency_limit == 4
+
+    def test_sync_slot_uses_context_priority(self):
+        limiter = ProviderLimiter("exa", rate=1000.0, burst=100, max_concurrency=2)
+        with priority_scope(Priority.BULK):
+            with limiter.slot_sync():
+                assert limiter.snapshot()["in_flight"] == 1
+        assert limiter.snapshot()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        limiter = ProviderLimiter("gemini", rate=1000.0, burst=100, max_concurrency=1)
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert limiter.snapshot()["queued"] == 0
+
+
+def test_is_throttle_error():
+    assert is_throttle_error(RuntimeError("HTTP 429"))
+    assert is_throttle_error(RuntimeError("RESOURCE_EXHAUSTED: quota"))
+    assert not is_throttle_error(RuntimeError("connection reset"))
+
+
+# ---------------------------------------------------------------------------
+# Circuit breakers
+# ---------------------------------------------------------------------------
+
+class TestCircuitBreaker:
+    def _fail(self, breaker, n):
+        for _ in range(n):
+            with pytest.raises(RuntimeError):
+                with breaker.guard():
+                    raise RuntimeError("provider down")
+
+    def test_trips_on_error_rate_and_fails_fast(self):
+        breaker = CircuitBreaker("exa", min_calls=4, open_seconds=60)
+        self._fail(breaker, 4)
+
+        assert breaker.state == BreakerState.OPEN
+        with pytest.raises(ProviderUnavailableError):
+            with breaker.guard():
+                pass
+
+    def test_trips_on_slow_calls(self):
+        breaker = CircuitBreaker("tavily", slow_call_seconds=1.0, min_calls=3)
+        for _ in range(3):
+            breaker.allow()
+            breaker.record(False, duration=5.0)
+        assert breaker.state == BreakerState.OPEN
+
+    def test_half_open_probe_closes_breaker(self):
+        breaker = CircuitBreaker("exa", min_calls=2, open_seconds=0.0)
+        self._fail(breaker, 2)
+
+        assert breaker.state == BreakerState.HALF_OPEN
+        with breaker.guard():
+            # Only one probe is let through while half-open
+            assert breaker.allow() is False
+        assert breaker.state == BreakerState.CLOSED
+
+    def test_structured_output_errors_do_not_count(self):
+        breaker = CircuitBreaker("gemini", min_calls=2)
+        for _ in range(3):
+            with pytest.raises(StructuredOutputException):
+                with breaker.guard():
+                    raise StructuredOutputException("bad json")
+        assert breaker.state == BreakerState.CLOSED
+        assert breaker.snapshot()["failure_rate"] == 0.0
+
+
+# ---------------------------------------------------------------------------
+# Deadlines
+# ---------------------------------------------------------------------------
+
+class TestDeadline:
+    def test_remaining_and_reserve(self):
+        deadline = Deadline(10.0)
+        assert 9.0 < deadline.remaining() <= 10.0
+        assert deadline.reserve(10.0).expired
+        assert not deadline.expired
+
+    def test_for_endpoint_reads_budget_setting(self):
+        with patch.dict("os.environ", {"LIBRARIAN_ANALYZE_BUDGET_SECONDS": "5"}):
+            assert Deadline.for_endpoint("analyze").budget_seconds == 5.0
+
+    def test_can_afford_uses_observed_latency(self):
+        deadline = Deadline(10.0)
+        assert deadline.can_afford("ranking", 5.0)
+        _warm_up("ranking", 30.0, n=5)
+        assert not deadline.can_afford("ranking", 5.0)
+
+    def test_check_raises_when_expired(self):
+        with pytest.raises(DeadlineExceededError):
+            Deadline(0.0).check("ranking")
+
+    @pytest.mark.asyncio
+    async def test_invoke_agent_times_out_at_deadline(self):
+        seen = []
+
+        async def slow_invoke(prompt, structured_output_model=None):
+            seen.append(current_deadline())
+            await asyncio.sleep(5)
+
+        agent = MagicMock()
+        agent.invoke_async = slow_invoke
+        deadline = Deadline(0.05)
+
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(
+                invoke_agent(AgentPool(MagicMock(), seed=agent), "prompt", ParsedBookQuery, "writing", deadline=deadline),
+                timeout=2
+            )
+        # Tools called by the agent see the request's deadline
+        assert seen == [deadline]
+
+
+# ---------------------------------------------------------------------------
+# Structured output repair
+# ---------------------------------------------------------------------------
+
+def _truncating_agent(tool_name: str, chunks: list[str]) -> MagicMock:
+    """Agent that streams a structured-output tool input, then stops at the token limit."""
+    agent = MagicMock()
+    agent.messages = []
+
+    async def invoke(prompt, structured_output_model=None):
+        for chunk in chunks:
+            agent.callback_handler(
+                type="tool_use_stream",
+                delta={"toolUse": {"input": chunk}},
+                current_tool_use={"toolUseId": "t1", "name": tool_name},
+            )
+        raise MaxTokensReachedException("max tokens")
+
+    agent.invoke_async = AsyncMock(side_effect=invoke)
+    return agent
+
+
+class TestStructuredOutputRepair:
+    @pytest.mark.asyncio
+    async def test_truncated_output_is_closed_locally(self):
+        agent = _truncating_agent("CandidateList", [
+            '{"candidates": [{"title": "A", "author": "B", "source_snippet": "x"}, ',
+            '{"title": "C", "author": "D", "sour',
+        ])
+
+        result = await invoke_agent(AgentPool(MagicMock(), seed=agent), "prompt", CandidateList, "candidates")
+
+        assert [c.title for c in result.structured_output.candidates] == ["A"]
+        agent.invoke_async.assert_awaited_once()  # No second generation
+
+    @pytest.mark.asyncio
+    async def test_only_missing_fields_are_requested(self):
+        class BookRef(BaseModel):
+            title: str
+            author: str
+
+        agent = _truncating_agent("BookRef", ['{"title": "Dune", "auth'])
+        truncate = agent.invoke_async.side_effect
+
+        async def invoke(prompt, structured_output_model=None):
+            if structured_output_model is BookRef:
+                return await truncate(prompt, structured_output_model)
+            assert list(structured_output_model.model_fields) == ["author"]
+            return FakeAgentResult(structured_output_model(author="Frank Herbert"))
+
+        agent.invoke_async.side_effect = invoke
+
+        result = await invoke_agent(AgentPool(MagicMock(), seed=agent), "prompt", BookRef, "analysis")
+
+        assert result.structured_output == BookRef(title="Dune", author="Frank Herbert")
+        follow_up = agent.invoke_async.call_args.args[0]
+        assert "Provide only the remaining fields: author" in follow_up
+        assert '"title": "Dune"' in follow_up
+
+    @pytest.mark.asyncio
+    async def test_unrepairable_output_still_raises(self):
+        agent = _truncating_agent("CandidateList", ['not json'])
+
+        with pytest.raises(MaxTokensReachedException):
+            await invoke_agent(AgentPool(MagicMock(), seed=agent), "prompt", CandidateList, "candidates")
+
+
+# ---------------------------------------------------------------------------
+# Cancellation on client disconnect
+# ---------------------------------------------------------------------------
+
+class TestCancellation:
+    def test_cancel_is_shared_with_reserved_deadlines(self):
+        deadline = Deadline(60.0)
+        child = deadline.reserve(10.0)
+        deadline.cancel()
+
+        assert child.cancelled and child.expired
+        with pytest.raises(RequestCancelledError):
+            child.check("analysis")
+
+    def test_provider_call_not_started_after_cancel(self):
+        deadline = Deadline(60.0)
+        deadline.cancel()
+        call = MagicMock()
+
+        with deadline_scope(deadline):
+            with pytest.raises(RequestCancelledError):
+                call_provider("exa", call)
+        call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_work_and_deadline(self):
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(return_value=True)
+        deadline = Deadline(60.0)
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with patch("librarian.shared.resilience.disconnect._POLL_SECONDS", 0.01):
+            with pytest.raises(RequestCancelledError):
+                await asyncio.wait_for(cancel_on_disconnect(request, deadline, work()), timeout=2)
+
+        assert cancelled.is_set()
+        assert deadline.cancelled
+
+    @pytest.mark.asyncio
+    async def test_connected_client_gets_result(self):
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(return_value=False)
+
+        async def work():
+            return "done"
+
+        assert await cancel_on_disconnect(request, Deadline(60.0), work()) == "done"
+
+
+# ---------------------------------------------------------------------------
+# Speculation
+# ---------------------------------------------------------------------------
+
+class TestSpeculator:
+    @pytest.mark.asyncio
+    async def test_runs_work_at_speculative_priority_once_per_key(self):
+        speculation = Speculator()
+        seen = []
+
+        async def work(deadline):
+            seen.append(current_priority())
+
+        assert speculation.schedule("a", "group-1", work)
+        assert speculation.schedule("a", "group-1", work)  # Already running
+        await speculation.running("a")
+
+        assert seen == [Priority.SPECULATIVE]
+        assert speculation.running("a") is None
+
+    @pytest.mark.asyncio
+    async def test_refuses_work_past_the_global_cap(self):
+        speculation = Speculator()
+        gate = asyncio.Event()
+
+        async def work(deadline):
+            await gate.wait()
+
+        with patch.dict("os.environ", {"LIBRARIAN_SPECULATIVE_MAX_CONCURRENCY": "2"}):
+            results = [speculation.schedule(key, "group-1", work) for key in "abc"]
+
+        assert results == [True, True, False]
+        assert speculation.snapshot()["refused"] == 1
+        gate.set()
+        speculation.cancel_all()
+
+    @pytest.mark.asyncio
+    async def test_cancel_group_keeps_the_chosen_task(self):
+        speculation = Speculator()
+        deadlines = {}
+
+        async def work(deadline, key):
+            deadlines[key] = deadline
+            await asyncio.sleep(5)
+
+        for key in ("a", "b"):
+            speculation.schedule(key, "group-1", lambda deadline, key=key: work(deadline, key))
+        speculation.schedule("c", "group-2", lambda deadline: work(deadline, "c"))
+        await asyncio.sleep(0)
+
+        assert speculation.cancel_group("group-1", keep="a") == 1
+        assert deadlines["b"].cancelled
+        assert speculation.running("a") is not None and speculation.running("c") is not None
+        speculation.cancel_all()
+
+    def test_speculative_calls_are_never_hedged(self):
+        from librarian.shared.resilience.hedging import hedging_enabled
+        with patch.dict("os.environ", {"LIBRARIAN_HEDGE_STAGES": "all"}):
+            with priority_scope(Priority.SPECULATIVE):
+                assert not hedging_enabled("analysis")
+            assert hedging_enabled("analysis")
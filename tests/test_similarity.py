@@ -0,0 +1,62 @@
+"""Tests for local DNA similarity scoring."""
+
+from librarian.ranking.similarity import dealbreaker_hits, similarity_scores, tokenize
+
+from helpers import make_book_dna, make_dna_pillar
+
+
+def make_dna_with(prose: str, theme: str = "Identity and belonging", dealbreakers: list[str] | None = None):
+    dna = make_book_dna()
+    dna.prose_texture = make_dna_pillar(prose, "Prose")
+    dna.theme = make_dna_pillar(theme, "Theme")
+    if dealbreakers is not None:
+        dna.dealbreakers = dealbreakers
+    return dna
+
+
+class TestSimilarity:
+    def test_tokenize_drops_stopwords(self):
+        assert tokenize("The sparse, precise prose of a novel") == ["sparse", "precise", "prose", "novel"]
+
+    def test_closer_pillar_text_scores_higher(self):
+        seed = make_dna_with("Sparse, precise prose with clipped sentences")
+        close = make_dna_with("Precise, sparse prose and clipped dialogue")
+        far = make_dna_with("Lush baroque maximalist digressions")
+
+        scores = similarity_scores(seed, [close, far], ["prose_texture"], [])
+
+        assert scores[0] > scores[1]
+        assert all(0 <= score <= 100 for score in scores)
+
+    def test_higher_priority_pillars_weigh_more(self):
+        seed = make_dna_with("Sparse precise prose", theme="Grief and memory")
+        prose_match = make_dna_with("Sparse precise prose", theme="Space trade wars")
+        theme_match = make_dna_with("Ornate gothic sentences", theme="Grief and memory")
+
+        # prose_texture (priority 6) outweighs theme (priority 4)
+        scores = similarity_scores(seed, [prose_match, theme_match], ["prose_texture", "theme"], [])
+
+        assert scores[0] > scores[1]
+
+    def test_dealbreakers_are_penalized(self):
+        seed = make_dna_with("Sparse precise prose")
+        clean = make_dna_with("Sparse precise prose", dealbreakers=["Slow pacing"])
+        flagged = make_dna_with("Sparse precise prose", dealbreakers=["Heavy love triangle"])
+
+        scores = similarity_scores(seed, [clean, flagged], ["prose_texture"], ["Love triangles"])
+
+        assert dealbreaker_hits(["Love triangles"], flagged) == ["Love triangles"]
+        assert dealbreaker_hits(["Love triangles"], clean) == []
+        assert scores[0] > scores[1]
+
+    def test_dealbreakers_match_spelling_variants(self):
+        dna = make_dna_with("Sparse precise prose", dealbreakers=["Info-dumping", "Instalove", "Slow burn romance"])
+
+        assert dealbreaker_hits(["Info dumps", "Insta-love", "Love triangles"], dna) == ["Info dumps", "Insta-love"]
+
+        # One shared word is not a match
+        dna = make_dna_with("Sparse precise prose", dealbreakers=["Slow-burn romance", "Insta-love", "Open ending", "Graphic violence"])
+        assert dealbreaker_hits(["Slow pacing", "Love triangles", "Ambiguous ending", "Sexual violence", "Graphic sex"], dna) == []
+
+    def test_no_candidates(self):
+        assert similarity_scores(make_book_dna(), [], ["theme"], []) == []
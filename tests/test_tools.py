@@ -30,6 +30,16 @@ class TestTavilyTool:
         assert "Book B" in result
         assert "Try these books." in result
 
+    def test_search_book_candidates_sizes_results_to_the_pool(self):
+        from librarian.ranking import tavily_tool
+
+        with patch.dict("os.environ", {"LIBRARIAN_CANDIDATE_POOL_SIZE": "15"}):
+            assert tavily_tool._max_results() == 15
+        with patch.dict("os.environ", {"LIBRARIAN_CANDIDATE_POOL_SIZE": "50"}):
+            assert tavily_tool._max_results() == tavily_tool.TAVILY_MAX_RESULTS
+        with patch.dict("os.environ", {"LIBRARIAN_CANDIDATE_POOL_SIZE": "5"}):
+            assert tavily_tool._max_results() == 10
+
     def test_search_book_candidates_no_api_key(self):
         with patch.dict("os.environ", {}, clear=True):
             # Remove TAVILY_API_KEY
@@ -53,6 +63,23 @@ class TestTavilyTool:
 
         assert "Search failed" in result
 
+    def test_search_book_candidates_reuses_cached_results(self):
+        with patch.dict("os.environ", {"TAVILY_API_KEY": "fake-key"}):
+            with patch("librarian.ranking.tavily_tool.TavilyClient") as MockClient:
+                mock_client = MagicMock()
+                mock_client.search.return_value = {
+                    "answer": "",
+                    "results": [{"title": "Book A", "url": "http://a.com", "content": "Space."}],
+                }
+                MockClient.return_value = mock_client
+
+                from librarian.ranking.tavily_tool import search_book_candidates
+                first = search_book_candidates._tool_func(query="Books like Dune")
+                second = search_book_candidates._tool_func(query="books like dune ")
+
+        assert first == second
+        assert mock_client.search.call_count == 1
+
 
 # ---------------------------------------------------------------------------
 # Exa tool - single search
@@ -130,6 +157,25 @@ class TestExaTool:
         assert "..." in result
 
 
+    def test_search_book_analysis_fails_fast_when_breaker_open(self):
+        from librarian.shared.resilience.circuit_breaker import get_breaker
+
+        breaker = get_breaker("exa")
+        for _ in range(breaker.min_calls):
+            breaker.allow()
+            breaker.record(True, duration=0.1)
+
+        with patch.dict("os.environ", {"EXA_API_KEY": "fake-key"}):
+            with patch("librarian.analysis.exa_tool.Exa") as MockExa:
+                from librarian.analysis.exa_tool import search_book_analysis
+                result = search_book_analysis._tool_func(query="any book")
+
+                MockExa.return_value.search.assert_not_called()
+
+        assert result.startswith("Error")
+        assert "temporarily unavailable" in result
+
+
 # ---------------------------------------------------------------------------
 # Exa tool - parallel search
 # ---------------------------------------------------------------------------
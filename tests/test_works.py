@@ -0,0 +1,35 @@
+"""Tests for canonical work identity."""
+
+from librarian.shared.works import normalize_author, normalize_isbn, normalize_title, work_key, works
+
+from helpers import make_book_metadata
+
+
+class TestWorkKeys:
+    def test_title_drops_edition_asides_and_article(self):
+        assert normalize_title("The Left Hand of Darkness (50th Anniversary Edition)") == "left hand of darkness"
+        assert normalize_title("Left Hand of Darkness: A Novel") == "left hand of darkness"
+        assert normalize_title("Dune - Deluxe Edition") == "dune"
+
+    def test_title_keeps_real_subtitles(self):
+        assert normalize_title("Star Wars: Heir to the Empire") != normalize_title("Star Wars: Dark Force Rising")
+
+    def test_author_is_first_surname(self):
+        assert normalize_author("Ursula K. Le Guin") == normalize_author("Le Guin, Ursula K.") == "guin"
+        assert normalize_author("Neil Gaiman & Terry Pratchett") == "gaiman"
+        assert work_key("Good Omens", "Neil Gaiman, Terry Pratchett") == work_key("Good Omens", "Neil Gaiman")
+
+    def test_isbn10_is_converted(self):
+        assert normalize_isbn("0-441-17271-7") == "9780441172719"
+        assert normalize_isbn("UOM:39015") is None
+
+    def test_volumes_sharing_an_isbn_share_a_work(self):
+        first = make_book_metadata(book_id="v1", title="Dune", author="Frank Herbert")
+        first.isbns = ["9780441172719"]
+        reissue = make_book_metadata(book_id="v2", title="Dune Chronicles 1", author="Frank Herbert")
+        reissue.isbns = ["9780441172719"]
+
+        assert works.register(first) == work_key("Dune", "Frank Herbert")
+        assert works.register(reissue) == works.book_key("v1")
+        assert works.key("Dune Chronicles 1", "Frank Herbert", "v2") == work_key("Dune", "Frank Herbert")
+        assert works.book_key("unseen") == "unseen"